@@ -0,0 +1,175 @@
+"""
+Benchmark the client end to end against a local fake NeuvueQueue server.
+
+    python benchmarks/bench_client.py --sizes 1000,100000 --output benchmarks/results.jsonl
+    python benchmarks/bench_client.py --compare benchmarks/results.jsonl
+
+Each scenario runs against a server (neuvueclient.testing) started in a separate
+process, so that serving does not compete with the client for the GIL. The
+best of `--repeat` runs is reported. `--output` appends one JSON line per
+scenario (with the commit it ran on) so that results can be tracked over time.
+`--compare` reports the change from the latest recorded result of each scenario
+and exits with status 1 if any got slower by more than `--threshold`.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from neuvueclient import NeuvueQueue
+
+
+class Server:
+    """
+    A fake server populated with `tasks` tasks, running in a child process.
+    """
+    def __init__(self, tasks: int, points_per_task: int = 0, states: int = 0, latency: float = 0) -> None:
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "neuvueclient.testing",
+                "--tasks", str(tasks), "--points-per-task", str(points_per_task),
+                "--states", str(states), "--latency", str(latency),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.url = self.process.stdout.readline().strip()
+
+    def client(self, **kwargs) -> NeuvueQueue:
+        return NeuvueQueue(
+            self.url, local=True, json_state_server=f"{self.url}/nglstate/post",
+            json_state_server_token="bench", **kwargs
+        )
+
+    def __enter__(self) -> "Server":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+def best(run: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """
+    Time `run` (which returns the number of records it handled) `repeat` times.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        records = run()
+        times.append(time.perf_counter() - started)
+    seconds = min(times)
+    return {"seconds": seconds, "records": records, "records_per_second": records / seconds if seconds else 0}
+
+
+def scenarios(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in args.sizes:
+        with Server(size) as server:
+            C = server.client()
+            for name, kwargs in [
+                ("offset", {}),
+                ("offset-4-workers", {"max_workers": 4}),
+                ("cursor", {"pagination": "cursor"}),
+                ("stream", {"stream": True}),
+            ]:
+                results[f"depaginate/{name}/{size}"] = best(
+                    lambda: len(C.depaginate("tasks", {}, **kwargs)), args.repeat
+                )
+            results[f"get_tasks/{size}"] = best(
+                lambda: len(C.get_tasks(convert_states_to_json=False)), args.repeat
+            )
+            results[f"get_tasks/compact/{size}"] = best(
+                lambda: len(server.client(compact_frames=True).get_tasks(convert_states_to_json=False)),
+                args.repeat,
+            )
+
+    with Server(args.writes) as server:
+        C = server.client()
+        coordinates = [[i, i, i] for i in range(args.writes)]
+        results[f"post_points/{args.writes}"] = best(
+            lambda: len(C.post_points(coordinates, "bench", "bench", "bench")), args.repeat
+        )
+        ids = list(C.get_tasks(convert_states_to_json=False).index)
+        results[f"patch_tasks/{args.writes}"] = best(
+            lambda: len(C.patch_tasks(ids, author="bench", priority=1)), args.repeat
+        )
+
+    # Every task shares one of `--states` states, each fetched once per query
+    with Server(args.writes, states=args.states, latency=args.latency) as server:
+        results[f"convert_states/{args.states}"] = best(
+            lambda: len(server.client().get_tasks(convert_states_to_json=True)), args.repeat
+        )
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def latest(path: str) -> Dict[str, dict]:
+    recorded: Dict[str, dict] = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    recorded[result["name"]] = result
+    return recorded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[1000, 100000],
+                        help="Comma-separated task counts for the read scenarios (e.g. 1000,100000,1000000)")
+    parser.add_argument("--writes", type=int, default=2000, help="Documents posted and patched")
+    parser.add_argument("--states", type=int, default=50, help="Distinct states to convert")
+    parser.add_argument("--latency", type=float, default=0.01, help="Server latency for state conversion")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Append results to this JSON lines file")
+    parser.add_argument("--compare", help="Compare with the latest results recorded in this file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    baseline = latest(args.compare) if args.compare else {}
+    results = scenarios(args)
+
+    commit = git_commit()
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    regressions: List[str] = []
+    print(f"{'scenario':<36}{'seconds':>10}{'records/s':>14}{'change':>10}")
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            ratio = result["seconds"] / baseline[name]["seconds"] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > args.threshold:
+                regressions.append(name)
+        print(f"{name:<36}{result['seconds']:>10.3f}{result['records_per_second']:>14,.0f}{change:>10}")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            for name, result in results.items():
+                f.write(json.dumps(dict(
+                    result, name=name, commit=commit, timestamp=timestamp, python=platform.python_version()
+                )) + "\n")
+
+    if regressions:
+        print(f"\nRegressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the JSON codecs on a page of tasks with embedded neuroglancer states.
+
+    python benchmarks/bench_codec.py --tasks 15000
+
+"baseline" is what `requests.Response.json()` does: decode the bytes to text,
+then parse the text with the standard library; its encode column is
+`json.dumps(...).encode()`, what a request body cost before codecs. "auto" is
+the codec `NeuvueQueue` picks by default. Speedups are against the baseline.
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+from neuvueclient.codec import CODECS, get_codec
+
+
+def make_page(n_tasks: int, state_bytes: int) -> list:
+    state = json.dumps({"layers": [{"source": "precomputed://" + "x" * state_bytes}]})
+    return [
+        {
+            "_id": f"{i:024x}",
+            "active": True,
+            "assignee": f"user{i % 50}",
+            "author": "bench",
+            "namespace": f"ns{i % 5}",
+            "status": random.choice(["pending", "open", "closed"]),
+            "priority": i % 10,
+            "duration": 0,
+            "created": 1600000000000 + i,
+            "opened": None,
+            "closed": None,
+            "points": [f"{j:024x}" for j in range(3)],
+            "instructions": {"prompt": "Proofread this segment"},
+            "metadata": {"provenance": [{"status": "pending", "createdAt": 1600000000000}]},
+            "seg_id": str(864691135000000000 + i),
+            "ng_state": state,
+            "__v": 0,
+        }
+        for i in range(n_tasks)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=15000)
+    parser.add_argument("--state-bytes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_page(args.tasks, args.state_bytes)
+    body = json.dumps(page).encode("utf-8")
+    print(f"{args.tasks} tasks, {len(body) / 1e6:.1f} MB per page\n")
+
+    def best(stmt) -> float:
+        return min(timeit.repeat(stmt, number=1, repeat=args.repeat))
+
+    baseline = best(lambda: json.loads(body.decode("utf-8")))
+    baseline_encode = best(lambda: json.dumps(page).encode("utf-8"))
+    print(f"{'codec':<10}{'decode ms':>12}{'speedup':>10}{'encode ms':>12}{'speedup':>10}")
+    print(f"{'baseline':<10}{baseline * 1000:>12.1f}{1:>9.1f}x{baseline_encode * 1000:>12.1f}{1:>9.1f}x")
+    for name in [*CODECS, "auto"]:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print(f"{name:<10}{'not installed':>12}")
+            continue
+        decode = best(lambda: codec.loads(body))
+        encode = best(lambda: codec.dumps(page))
+        print(
+            f"{name:<10}{decode * 1000:>12.1f}{baseline / decode:>9.1f}x"
+            f"{encode * 1000:>12.1f}{baseline_encode / encode:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
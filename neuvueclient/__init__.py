@@ -28,20 +28,36 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import http
 import ast
-from typing import Any, Callable, Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 
+import collections
+import contextlib
+import copy
 import datetime
+import itertools
 import json
 import configparser
 import os
+import threading
+import time
 
+import numpy as np
 import pandas as pd
 import requests
 
+from . import arrow
+from . import metrics
 from . import utils
 from . import version
+from .cache import EntityCache, StateCache, StateUploadIndex
+from .codec import get_codec
+from .paging import PageSizer
+from .stream import JSONArrayParser, iter_json_array
+from .store import LocalStore
+from .sync import TaskMirror
+from .prefetch import TaskQueue
 
 __version__ = version.__version__
 
@@ -52,21 +68,78 @@ class NeuvueQueue:
     See neuvueclient/__init__.py for more documentation.
 
     """
+    # Bytes read from the socket at a time when streaming pages
+    stream_chunk_size = 65536
+
     def __init__(self, url: str, **kwargs) -> None:
         """
         Create a new neuvuequeue client.
 
         Arguments:
             url (str): The qualified location (including protocol) of the server.
+            session (requests.Session: None): A preconfigured session to use for every
+                request. If omitted, a pooled session is created from the options below.
+            pool_connections (int: 10): Number of per-host connection pools to keep
+            pool_maxsize (int: 10): Maximum number of connections kept alive per host
+            pool_block (bool: False): Block when a host's pool is exhausted instead of
+                opening a throwaway connection
+            keep_alive (bool: True): Reuse connections between requests
+            state_cache (bool or str or StateCache: None): Cache neuroglancer states by URL.
+                True caches under ~/.neuvuequeue/state_cache, a string names another
+                directory, and a StateCache instance is used as is.
+            state_upload_index (bool or str or StateUploadIndex: None): Reuse the URL of
+                a previous upload when posting an identical state. True records uploads
+                in ~/.neuvuequeue/state_uploads.sqlite, a string names another database
+                file, and a StateUploadIndex instance is used as is.
+            local_store (bool or str or LocalStore: None): Answer `get_*` queries from an
+                offline SQLite mirror when it holds every matching document. True stores
+                documents in ~/.neuvuequeue/store.sqlite, a string names another database
+                file, and a LocalStore instance is used as is.
+            entity_cache (bool or EntityCache: None): Serve repeated get_task, get_point,
+                get_differ_stack and get_agent_job calls from memory, revalidating them
+                with the server's ETag once they are older than the cache's `ttl`. True
+                creates an EntityCache holding up to 10000 documents for 60 seconds.
+            compact_frames (bool: False): Build get_* DataFrames with categorical status,
+                author, assignee and namespace columns, pyarrow strings for string IDs
+                (when pyarrow is installed) and downcast numbers, including integer IDs. The bytes saved are reported
+                in `frame.attrs["memory_saved"]`.
+            json_codec (str or JSONCodec: "auto"): Library used to encode request bodies
+                and decode responses: "msgspec", "orjson", "json", or "auto" for the
+                fastest one installed.
+            refresh_margin (float: 60): Refresh the access token this many seconds before
+                its `exp` claim, instead of waiting for the server to reject it.
+            on_event (callable or List[callable]: None): Hooks called with a dict for every
+                request, token refresh, page decode, state conversion and DataFrame build
+                (see `metrics.py`). Nothing is timed when there are no hooks.
+            metrics (bool or MetricsAggregator: None): Aggregate events in memory, as
+                `self.metrics`. True creates a new MetricsAggregator.
 
         """
         self.config = configparser.ConfigParser()
         self._url = url.rstrip("/")
         self.queue_address = self._url.split('//')[1]
+        # Every request (including auth and state server calls) goes through this
+        # session so that TCP/TLS connections are pooled and reused.
+        self._session = kwargs.get('session') or utils.create_session(
+            pool_connections=kwargs.get('pool_connections', 10),
+            pool_maxsize=kwargs.get('pool_maxsize', 10),
+            pool_block=kwargs.get('pool_block', False),
+            keep_alive=kwargs.get('keep_alive', True),
+        )
         # JSON State Server Info
         self._json_state_server = kwargs.get('json_state_server', "https://global.daf-apis.com/nglstate/post")
         self._json_state_server_token = kwargs.get('json_state_server_token', utils.get_caveclient_token())
+        self.state_cache = self._make_state_cache(kwargs.get('state_cache'))
+        self.state_upload_index = self._make_state_upload_index(kwargs.get('state_upload_index'))
+        self.local_store = self._make_local_store(kwargs.get('local_store'))
+        self.entity_cache = self._make_entity_cache(kwargs.get('entity_cache'))
+        self.compact_frames = kwargs.get('compact_frames', False)
+        self._codec = get_codec(kwargs.get('json_codec', "auto"))
+        self._hooks, self.metrics = metrics.make_hooks(kwargs.get('on_event'), kwargs.get('metrics'))
         self._local = False
+        # Only one thread refreshes the access token at a time; the others wait for it
+        self._refresh_lock = threading.Lock()
+        self._refresh_margin = kwargs.get('refresh_margin', 60)
         if "token" in kwargs:
             self.auth_method = "Inline Arguments"
             self._refresh_token = kwargs["refresh_token"]
@@ -96,9 +169,53 @@ class NeuvueQueue:
 
         print(f"Auth method: {self.auth_method}")
         self._custom_headers: dict = {}
+        # Whether the server accepts every field in one PATCH /tasks/{id} (None until known)
+        self._combined_patch_supported = None
+        # Whether DELETE /{endpoint}?q=... is supported, per endpoint
+        self._bulk_delete_supported: Dict[str, bool] = {}
+        self._task_mirrors: Dict[str, TaskMirror] = {}
+        self._task_queues: Dict[Tuple[str, str], TaskQueue] = {}
         if "headers" in kwargs:
             self._custom_headers.update(kwargs["headers"])
     
+    @staticmethod
+    def _make_state_cache(state_cache: Any) -> StateCache:
+        if state_cache is None or state_cache is False:
+            return None
+        if state_cache is True:
+            return StateCache()
+        if isinstance(state_cache, str):
+            return StateCache(state_cache)
+        return state_cache
+
+    @staticmethod
+    def _make_state_upload_index(index: Any) -> StateUploadIndex:
+        if index is None or index is False:
+            return None
+        if index is True:
+            return StateUploadIndex()
+        if isinstance(index, str):
+            return StateUploadIndex(index)
+        return index
+
+    @staticmethod
+    def _make_local_store(store: Any) -> LocalStore:
+        if store is None or store is False:
+            return None
+        if store is True:
+            return LocalStore()
+        if isinstance(store, str):
+            return LocalStore(store)
+        return store
+
+    @staticmethod
+    def _make_entity_cache(cache: Any) -> EntityCache:
+        if cache is None or cache is False:
+            return None
+        if cache is True:
+            return EntityCache()
+        return cache
+
     def login(self):
         """
         Generates a new authorization token and saves it to a config file.
@@ -110,56 +227,87 @@ class NeuvueQueue:
         code = input(f"Go to this link: \n {link} \n and log in using your google account, then copy the text the Token page here: ")
         
         # Make a request to neuvuequeue to get the authorization token
-        conn = http.client.HTTPSConnection(self.queue_address)
-
         payload = "{\"code\":\"" + code + "\",\"code_type\":\"authorization\"}"
 
         headers = { 'content-type': "application/json" }
-        conn.request("POST", "/auth/tokens", payload, headers)
+        res = self._session.post(self.url("/auth/tokens"), data=payload, headers=headers)
 
-        res = conn.getresponse()
-        data = res.read()
-        response = data.decode("utf-8")
-        response_dict = ast.literal_eval(response)
+        response_dict = self._parse_tokens(res.content)
         self.config['CONFIG'] = {'refresh_token': response_dict.get("refresh_token", ""),
                                  'access_token': response_dict.get("access_token", "")}
-        try:
-             os.mkdir(os.path.expanduser("~/.neuvuequeue"))
-        except OSError:
-            pass
+        utils.write_config(self.config, "~/.neuvuequeue/neuvuequeue.cfg")
 
-        with open(os.path.expanduser("~/.neuvuequeue/neuvuequeue.cfg"), 'w') as configfile:
-            self.config.write(configfile)
-            
         print(f"Credentials saved to file at ~/.neuvuequeue/neuvuequeue.cfg, which will be read from now on \n \nNote:If your token doesn't work, you may be a first time user. If this is the case, please give your email to the Neuvue team, and they will give your account the necessary permission to make a token.")
         self._access_token = response_dict["access_token"]
         self._refresh_token = response_dict["refresh_token"]
 
-    def _refresh_authorization_token(self, refresh: str):
+    def _parse_tokens(self, content: bytes) -> dict:
+        try:
+            return self._codec.loads(content)
+        except ValueError:
+            # Older servers answered with a Python dict repr
+            return ast.literal_eval(content.decode("utf-8"))
+
+    def _refresh_authorization_token(self, refresh: str, stale_token: str = None) -> bool:
         """
         Use the refresh token to generate a new one. 
-        """
-        conn = http.client.HTTPSConnection(self.queue_address)
-        payload = "{\"code\":\"" + refresh + "\",\"code_type\":\"refresh\"}"
 
-        headers = { 'content-type': "application/json" }
-        conn.request("POST", "/auth/tokens", payload, headers)
+        Refreshes are single-flight: callers pass the access token they found
+        stale, and if another thread replaced it while they waited for the
+        lock, they use that token instead of refreshing again.
+
+        Returns:
+            bool: Whether this call refreshed the token
+        """
+        with self._refresh_lock:
+            if stale_token is not None and getattr(self, "_access_token", None) != stale_token:
+                return False
+            started = time.perf_counter()
+            payload = "{\"code\":\"" + refresh + "\",\"code_type\":\"refresh\"}"
+
+            headers = { 'content-type': "application/json" }
+            res = self._session.post(self.url("/auth/tokens"), data=payload, headers=headers)
+
+            response_dict = self._parse_tokens(res.content)
+            if "access_token" not in response_dict:
+                raise RuntimeError(f"Unable to refresh the access token: {res.status_code} {res.text}")
+            self._store_access_token(response_dict["access_token"])
+            if self._hooks:
+                self._emit({"kind": "refresh", "seconds": time.perf_counter() - started})
+            return True
+
+    def _token_expiring(self) -> bool:
+        """
+        Whether the access token expires within `refresh_margin` seconds.
+        Tokens without an `exp` claim are never considered expiring.
+        """
+        if self._local:
+            return False
+        expiry = utils.token_expiry(getattr(self, "_access_token", None))
+        return expiry is not None and time.time() >= expiry - self._refresh_margin
 
-        res = conn.getresponse()
-        data = res.read()
-        response = data.decode("utf-8")
-        response_dict = ast.literal_eval(response)
-        access_token = response_dict["access_token"]
+    def _refresh_on(self, status_code: int) -> bool:
+        """
+        Whether a response means the access token must be refreshed.
+        """
+        if self._local:
+            return False
+        if status_code == 401:
+            return True
+        # The server reports some auth failures as 500s; that can only be an
+        # expired token if the token's expiry is unknown (or already passed)
+        if status_code == 500:
+            expiry = utils.token_expiry(self._access_token)
+            return expiry is None or time.time() >= expiry
+        return False
+
+    def _store_access_token(self, access_token: str) -> None:
+        """
+        Persist a freshly issued access token according to the auth method.
+        """
         if self.auth_method == "Config File":
             self.config["CONFIG"]["access_token"] = access_token
-            
-            try:
-                os.mkdir(os.path.expanduser("~/.neuvuequeue"))
-            except OSError:
-                pass
-
-            with open(os.path.expanduser("~/.neuvuequeue/neuvuequeue.cfg"), 'w') as configfile:
-                self.config.write(configfile)
+            utils.write_config(self.config, "~/.neuvuequeue/neuvuequeue.cfg")
 
         elif self.auth_method == "Environment Variables":
             os.environ["NEUVUEQUEUE_ACCESS_TOKEN"] = access_token
@@ -179,6 +327,35 @@ class NeuvueQueue:
         headers.update(self._custom_headers)
         return headers
 
+    def pool_stats(self) -> Dict[str, dict]:
+        """
+        Get connection pool statistics for every host this client has talked to.
+
+        `requests` counts every request sent through a pool, while `connections`
+        counts every new TCP (and TLS) connection it had to open; the difference
+        is the number of requests that reused a kept-alive connection.
+
+        Returns:
+            Dict[str, dict]: Statistics keyed by `scheme://host:port`
+
+        """
+        return utils.session_pool_stats(self._session)
+
+    def close(self) -> None:
+        """
+        Close every pooled connection held by this client, and stop prefetching
+        for its task queues.
+        """
+        for queue in self._task_queues.values():
+            queue.close()
+        self._session.close()
+
+    def __enter__(self) -> "NeuvueQueue":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
     def url(self, suffix: str = "") -> str:
         """
         Construct a FQ URL.
@@ -246,13 +423,71 @@ class NeuvueQueue:
             ]
         }[datatype]
 
-    def _try_request(self, send_req: Callable[[], Any]) -> Any:
+    def _try_request(self, send_req: Callable[[], Any], stream: bool = False) -> Any:
+        started = time.perf_counter() if self._hooks else None
+        refreshes = retries = 0
+        if self._token_expiring():
+            refreshes += self._refresh_authorization_token(self._refresh_token, self._access_token)
+        token = getattr(self, "_access_token", None)
         res = send_req()
-        if (res.status_code == 401 or res.status_code == 500) and not self._local:
-            self._refresh_authorization_token(self._refresh_token)
+        if self._refresh_on(res.status_code):
+            refreshes += self._refresh_authorization_token(self._refresh_token, token)
+            res.close()
             res = send_req()
+            retries = 1
+        if started is not None:
+            self._emit_request(res, time.perf_counter() - started, retries, refreshes, stream)
         return res
 
+    def _emit(self, event: dict) -> None:
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"WARNING: Event hook {hook!r} failed: {e}")
+
+    def _emit_request(
+        self, res: requests.Response, seconds: float, retries: int, refreshes: int, stream: bool = False
+    ) -> None:
+        length = res.headers.get("Content-Length")
+        if length is not None:
+            bytes_in = int(length)
+        else:
+            # Streamed bodies have not been read yet, and their size is unknown
+            bytes_in = None if stream else len(res.content)
+        body = res.request.body
+        self._emit({
+            "kind": "request",
+            "endpoint": metrics.endpoint_of(res.request.url),
+            "method": res.request.method,
+            "status": res.status_code,
+            "seconds": seconds,
+            "elapsed": res.elapsed.total_seconds(),
+            "bytes_in": bytes_in,
+            "bytes_out": len(body) if body else 0,
+            "retries": retries,
+            "refreshes": refreshes,
+        })
+
+    def _timed(self, kind: str, endpoint: str = None, **fields) -> contextlib.AbstractContextManager:
+        """
+        Time a block as an event of the given kind, if any hook is installed.
+        """
+        if not self._hooks:
+            return contextlib.nullcontext()
+        return self._timing(dict(fields, kind=kind, endpoint=endpoint))
+
+    @contextlib.contextmanager
+    def _timing(self, event: dict) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        event["seconds"] = time.perf_counter() - started
+        self._emit(event)
+
+    def _decode_page(self, datatype: str, res: requests.Response) -> list:
+        with self._timed("decode", datatype, bytes_in=len(res.content)):
+            return self._codec.loads(res.content)
+
     def depaginate(
         self,
         datatype: str,
@@ -261,23 +496,237 @@ class NeuvueQueue:
         select: List[str] = None,
         sort: List[str] = None,
         limit: int = None,
+        max_workers: int = None,
+        pagination: str = "offset",
+        page_bytes: int = None,
+        page_seconds: float = None,
+        stream: bool = False,
         **kwargs
     ) -> list:
+        """
+        Collect every page of results for a query into a single list.
+
+        Arguments:
+            datatype (str): The collection to query, e.g. "tasks"
+            sieve (dict): See sieve documentation.
+            populate (List[str]: None): Fields to populate
+            select (List[str]: None): Fields to return
+            sort (List[str]: None): Fields to sort by
+            limit (int: None): The maximum number of items to return.
+            max_workers (int: None): Number of pages to keep in flight at once. Pages
+                are still returned in order. Values above the client's `pool_maxsize`
+                will open connections that are not kept alive.
+            pagination (str: "offset"): "offset" requests numbered pages. "cursor" sorts
+                by `_id` and asks for the records after the last one received, which
+                keeps deep pages as cheap as the first and does not skip or repeat
+                records inserted meanwhile. Cursor pages are fetched one at a time, and
+                only the default (`_id`) sort order is supported.
+            page_bytes (int: None): Resize pages to aim for responses of about this many
+                bytes, based on the size of the records received so far. Applies when
+                pages are fetched one at a time.
+            page_seconds (float: None): Likewise, resize pages to aim for responses that
+                take about this many seconds
+            stream (bool: False): Parse records off the socket as each response arrives
+                instead of reading whole pages into memory first (see `stream.py`).
+                Pages are fetched one at a time.
+            pageSize (int: 15000): Number of entries to return per page (the first page's
+                size when resizing). No page asks for more records than `limit`.
+
+        Returns:
+            list
+
+        """
+        if stream:
+            return list(itertools.islice(self._iter_records(
+                datatype, sieve, populate=populate, select=select, sort=sort,
+                limit=limit, max_workers=max_workers, pagination=pagination,
+                page_bytes=page_bytes, page_seconds=page_seconds, **kwargs
+            ), limit))
         depaginated: list = []
-        page = 0
-        data_remaining = True
-        while data_remaining:
-            new = self._get_data_by_page(
-                datatype, sieve, page, populate=populate, select=select, sort=sort, **kwargs
-            )
-            page += 1
-            if not new:
-                data_remaining = False
+        for new in self._iter_pages(
+            datatype, sieve, populate=populate, select=select, sort=sort,
+            limit=limit, max_workers=max_workers, pagination=pagination,
+            page_bytes=page_bytes, page_seconds=page_seconds, **kwargs
+        ):
             depaginated += new
             if limit and len(depaginated) >= limit:
                 return depaginated[:limit]
         return depaginated
 
+    def _iter_pages(
+        self,
+        datatype: str,
+        sieve: dict,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        max_workers: int = None,
+        pagination: str = "offset",
+        page_bytes: int = None,
+        page_seconds: float = None,
+        **kwargs
+    ) -> Iterator[list]:
+        """
+        Yield non-empty pages in page order, stopping at the first empty page
+        or once `limit` records have been yielded.
+        """
+        cursor = self._check_pagination(pagination, sort, max_workers) == "cursor"
+        if cursor or not max_workers or max_workers <= 1:
+            sizer = PageSizer(
+                kwargs.pop("pageSize", 15000), limit, page_bytes, page_seconds, offset=not cursor
+            )
+            last_id = None
+            while True:
+                page, size = sizer.next_page()
+                res = self._request_page(
+                    datatype, self._after(sieve, last_id) if cursor else sieve, page,
+                    populate=populate, select=select, sort=["_id"] if cursor else sort,
+                    pageSize=size, **kwargs
+                )
+                new = self._decode_page(datatype, res)
+                if not new:
+                    return
+                yield new
+                sizer.observe(len(new), len(res.content), res.elapsed.total_seconds())
+                if sizer.done:
+                    return
+                last_id = new[-1]["_id"] if cursor else None
+
+        if limit:
+            # Do not ask for more than the limit in every in-flight page
+            kwargs["pageSize"] = min(kwargs.get("pageSize", 15000), limit)
+
+        def fetch(page: int) -> list:
+            return self._get_data_by_page(
+                datatype, sieve, page, populate=populate, select=select, sort=sort, **kwargs
+            )
+
+        received = 0
+        # Pages may come back shorter than the requested pageSize (the server can
+        # cap it), so estimate how many records an in-flight page will bring from
+        # the largest page seen so far.
+        expected_page_size = kwargs.get("pageSize", 15000)
+        observed = False
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending: Deque[Future] = collections.deque()
+        next_page = 0
+
+        def fill() -> None:
+            nonlocal next_page
+            while len(pending) < max_workers and (
+                not limit or received + len(pending) * expected_page_size < limit
+            ):
+                pending.append(executor.submit(fetch, next_page))
+                next_page += 1
+
+        try:
+            fill()
+            while pending:
+                new = pending.popleft().result()
+                if not new:
+                    return
+                yield new
+                received += len(new)
+                if limit and received >= limit:
+                    return
+                if observed:
+                    expected_page_size = max(expected_page_size, len(new))
+                else:
+                    expected_page_size, observed = len(new), True
+                fill()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_records(
+        self,
+        datatype: str,
+        sieve: dict,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        max_workers: int = None,
+        pagination: str = "offset",
+        page_bytes: int = None,
+        page_seconds: float = None,
+        **kwargs
+    ) -> Iterator[dict]:
+        """
+        Yield records one at a time as they are parsed off each response,
+        fetching pages one at a time.
+        """
+        cursor = self._check_pagination(pagination, sort, max_workers) == "cursor"
+        if max_workers and max_workers > 1:
+            raise ValueError("Streaming fetches one page at a time; max_workers is not supported.")
+        sizer = PageSizer(
+            kwargs.pop("pageSize", 15000), limit, page_bytes, page_seconds, offset=not cursor
+        )
+        last_id = None
+        while True:
+            page, size = sizer.next_page()
+            started = time.monotonic()
+            res = self._request_page(
+                datatype, self._after(sieve, last_id) if cursor else sieve, page,
+                populate=populate, select=select, sort=["_id"] if cursor else sort,
+                pageSize=size, stream=True, **kwargs
+            )
+            parser = JSONArrayParser()
+            received = 0
+            try:
+                for record in iter_json_array(res.iter_content(self.stream_chunk_size), parser):
+                    received += 1
+                    last_id = record.get("_id") if cursor else None
+                    yield record
+                    if limit and sizer.received + received >= limit:
+                        return
+            finally:
+                res.close()
+            if not received:
+                return
+            sizer.observe(received, parser.nbytes, time.monotonic() - started)
+            if sizer.done:
+                return
+
+    def _iter_batches(self, datatype: str, sieve: dict, stream: bool = False, **kwargs) -> Iterator[list]:
+        """
+        Yield pages of records; when streaming, records are grouped into lists of
+        (at most) `pageSize` as they are parsed.
+        """
+        if not stream:
+            yield from self._iter_pages(datatype, sieve, **kwargs)
+            return
+        size = kwargs.get("pageSize", 15000)
+        records = self._iter_records(datatype, sieve, **kwargs)
+        while True:
+            batch = list(itertools.islice(records, size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _check_pagination(pagination: str, sort: List[str], max_workers: int) -> str:
+        if pagination not in ("offset", "cursor"):
+            raise ValueError(f"Unknown pagination [{pagination}]; expected 'offset' or 'cursor'.")
+        if pagination == "cursor":
+            if any(field not in ("", "_id", "+_id") for field in sort or []):
+                raise ValueError("Cursor pagination only supports sorting by _id.")
+            if max_workers and max_workers > 1:
+                raise ValueError("Cursor pagination fetches one page at a time; max_workers is not supported.")
+        return pagination
+
+    @staticmethod
+    def _after(sieve: dict, last_id: str) -> dict:
+        """
+        Narrow a sieve to the records after `last_id` in `_id` order.
+        """
+        if last_id is None:
+            return sieve
+        after = {"_id": {"$gt": last_id}}
+        if "_id" in sieve:
+            return {"$and": [sieve, after]}
+        return dict(sieve, **after)
+
     def _get_data_by_page(
         self,
         datatype: str,
@@ -288,6 +737,22 @@ class NeuvueQueue:
         sort: List[str] = None,
         **kwargs
     ):
+        res = self._request_page(
+            datatype, sieve, page, populate=populate, select=select, sort=sort, **kwargs
+        )
+        return self._decode_page(datatype, res)
+
+    def _request_page(
+        self,
+        datatype: str,
+        sieve: dict,
+        page: int = 0,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        stream: bool = False,
+        **kwargs
+    ) -> requests.Response:
 
         # Get page size if user set it, otherwise set to 15000
         pageSize = kwargs.get("pageSize", 15000)
@@ -301,9 +766,10 @@ class NeuvueQueue:
             "pageSize": pageSize
         }
         res = self._try_request(
-            lambda: requests.get(
-                self.url(datatype), headers=self._headers, params=params
-            )
+            lambda: self._session.get(
+                self.url(datatype), headers=self._headers, params=params, stream=stream
+            ),
+            stream=stream,
         )
         try:
             self._raise_for_status(res)
@@ -311,14 +777,14 @@ class NeuvueQueue:
             raise RuntimeError(
                 f"Unable to retrieve from page {page} of type {datatype}"
             ) from e
-        return res.json()
+        return res
 
     def _raise_for_status(self, res) -> None:
         try:
             res.raise_for_status()
         except requests.exceptions.HTTPError as e:
             try:
-                body = res.json()
+                body = self._codec.loads(res.content)
             except Exception as ee:
                 raise ee from e
             else:
@@ -326,6 +792,317 @@ class NeuvueQueue:
                     raise RuntimeError(body["message"]) from e
                 raise e
 
+    def _prepare_sieve(self, sieve: dict, active_default: bool) -> dict:
+        if sieve is None:
+            sieve = {"active": active_default}
+        if "active" not in sieve:
+            sieve["active"] = active_default
+        return sieve
+
+    def _prepare_time_queries(self, sieve: dict) -> dict:
+        time_queries = [key for key in sieve.keys() if key in ['created', 'opened', 'closed']]
+        if time_queries:
+            for key in time_queries:
+                if len(sieve[key]) > 1:
+                    assert sieve[key]['$gt'] < sieve[key]['$lt'], "$gt argument must be less than $lt if both are used."
+                for query in sieve[key].keys():
+                    assert type(sieve[key][query]) == datetime.datetime, "Please enter a datetime.datetime object."
+                    sieve[key][query] = round(sieve[key][query].timestamp()*1000)
+        return sieve
+
+    _datetime_columns = {
+        "point": ["created", "submitted"],
+        "task": ["created", "opened", "closed"],
+    }
+
+    # Columns stored compactly when `compact_frames` is set
+    _categorical_columns = {
+        "point": ["author", "namespace", "type", "agents_status"],
+        "task": ["assignee", "author", "namespace", "status"],
+        "agents": ["namespace"],
+    }
+    _id_columns = {
+        "task": ["seg_id"],
+        "differ_stack": ["task_id"],
+        "agents": ["seg_id", "nucleus_id"],
+    }
+    _numeric_columns = {
+        "point": ["__v", "resolution"],
+        "task": ["__v", "priority", "duration"],
+    }
+
+    def _build_frame(self, datatype: str, records: list, select: List[str] = None) -> pd.DataFrame:
+        """
+        Build the DataFrame returned by the get_* methods from a list of records.
+        """
+        # If an empty response, then return an empty dataframe:
+        if len(records) == 0:
+            if select:
+                return pd.DataFrame([], columns=[c for c in select if c != "_id"])
+            return pd.DataFrame([], columns=self.dtype_columns(datatype))
+
+        if self.compact_frames:
+            return self._build_compact_frame(datatype, records)
+
+        res = pd.DataFrame(records)
+
+        res.set_index("_id", inplace=True)
+        for column in self._datetime_columns.get(datatype, []):
+            if column in res.columns:
+                res[column] = pd.to_datetime(res[column], unit="ms")
+        return res
+
+    def _build_output(
+        self,
+        datatype: str,
+        records: list,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
+    ) -> Any:
+        """
+        Format query results as requested by the `output` and `dtype_backend`
+        arguments of the get_* methods.
+        """
+        with self._timed("frame", datatype, records=len(records)):
+            return self._format_output(datatype, records, select, output, dtype_backend)
+
+    def _format_output(
+        self,
+        datatype: str,
+        records: list,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
+    ) -> Any:
+        if output not in ("pandas", "arrow"):
+            raise ValueError(f"Unknown output [{output}]; expected 'pandas' or 'arrow'.")
+        if dtype_backend not in (None, "numpy", "pyarrow"):
+            raise ValueError(f"Unknown dtype_backend [{dtype_backend}]; expected 'numpy' or 'pyarrow'.")
+        if output == "pandas" and dtype_backend != "pyarrow":
+            return self._build_frame(datatype, records, select)
+
+        columns = [c for c in select if c != "_id"] if select else self.dtype_columns(datatype)
+        table = arrow.records_to_table(records, self._datetime_columns.get(datatype), columns)
+        if output == "arrow":
+            return table
+        if not records:
+            return self._build_frame(datatype, records, select)
+        return table.to_pandas(types_mapper=pd.ArrowDtype).set_index("_id")
+
+    def _build_compact_frame(self, datatype: str, records: list) -> pd.DataFrame:
+        """
+        Build a get_* DataFrame column by column with compact dtypes, recording
+        the bytes saved over the default dtypes in `frame.attrs["memory_saved"]`.
+        """
+        keys: dict = {}
+        for record in records:
+            keys.update(dict.fromkeys(record))
+        keys.pop("_id", None)
+
+        categorical = self._categorical_columns.get(datatype, [])
+        ids = self._id_columns.get(datatype, [])
+        numeric = self._numeric_columns.get(datatype, [])
+        datetimes = self._datetime_columns.get(datatype, [])
+        columns, saved = {}, 0
+        for key in keys:
+            values = [record.get(key) for record in records]
+            if key in datetimes:
+                ms = np.array([np.nan if v is None else v for v in values], dtype="float64")
+                columns[key] = pd.to_datetime(ms, unit="ms")
+                continue
+            column = pd.Series(values)
+            if key in categorical or key in ids or key in numeric:
+                before = column.memory_usage(index=False, deep=True)
+                try:
+                    if key in categorical and column.nunique() <= len(column) // 2:
+                        column = column.astype("category")
+                    elif key in ids:
+                        column = self._compact_ids(column)
+                    elif key in numeric:
+                        column = pd.to_numeric(column, downcast="integer")
+                except (TypeError, ValueError):
+                    # Unhashable or non-numeric values stay as they are
+                    pass
+                saved += before - column.memory_usage(index=False, deep=True)
+            columns[key] = column.array
+
+        index = self._compact_strings(pd.Series([record["_id"] for record in records]))
+        res = pd.DataFrame(columns, index=pd.Index(index, name="_id"))
+        res.attrs["memory_saved"] = int(saved)
+        return res
+
+    @staticmethod
+    def _compact_strings(column: pd.Series) -> pd.Series:
+        try:
+            return column.astype("string[pyarrow]")
+        except ImportError:
+            return column
+
+    @classmethod
+    def _compact_ids(cls, column: pd.Series) -> pd.Series:
+        """
+        Downcast integer IDs, and store string IDs as pyarrow strings. Other
+        columns (such as IDs of mixed types) are left as they are.
+        """
+        if pd.api.types.is_integer_dtype(column.dtype):
+            return pd.to_numeric(column, downcast="integer")
+        if all(isinstance(value, str) for value in column.dropna()):
+            return cls._compact_strings(column)
+        return column
+
+    def _convert_state(self, state: Any) -> Any:
+        try:
+            return utils.get_from_state_server(state, self._json_state_server_token, session=self._session, cache=self.state_cache)
+        except:
+            return state
+
+    def _convert_states(self, states: pd.Series, max_workers: int = 8) -> pd.Series:
+        """
+        Resolve a column of state URLs, fetching each distinct URL once and
+        up to `max_workers` of them concurrently. Rows that fail keep their URL.
+        """
+        unique = list({s for s in states if isinstance(s, str)})
+        if not unique:
+            return states
+        with self._timed("states", records=len(unique)):
+            converted = dict(zip(unique, self._map(self._convert_state, unique, max_workers)))
+        return states.map(lambda s: converted.get(s, s) if isinstance(s, str) else s)
+
+    def _convert_record_states(self, records: List[dict], max_workers: int = 8) -> List[dict]:
+        """
+        Resolve the `ng_state` URLs of raw records, like `_convert_states`.
+        """
+        if not any("ng_state" in r for r in records):
+            return records
+        states = self._convert_states(pd.Series([r.get("ng_state") for r in records], dtype=object), max_workers)
+        return [dict(r, ng_state=s) if "ng_state" in r else r for r, s in zip(records, states)]
+
+    def _query(
+        self,
+        endpoint: str,
+        sieve: dict,
+        populate: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        select: List[str] = None,
+        use_store: bool = True,
+        **kwargs
+    ) -> List[dict]:
+        """
+        Get every document matching a sieve, from the local store when it can
+        answer the query and from the server otherwise. Complete results fetched
+        from the server are loaded into the store.
+        """
+        store = self.local_store if use_store else None
+        # Populated documents embed other collections, which the store does not join
+        if store is not None and not populate:
+            local = store.query(endpoint, sieve, select=select, sort=sort, limit=limit)
+            if local is not None:
+                return local
+
+        records = self.depaginate(
+            endpoint, sieve, populate=populate, select=select, sort=sort, limit=limit, **kwargs
+        )
+        if store is not None and not populate and not limit and not select:
+            store.load(endpoint, sieve, records)
+        return records
+
+    def _store_documents(self, endpoint: str, docs: List[Any]) -> None:
+        """
+        Add documents returned by the server after a post to the local store.
+        """
+        if self.local_store is not None:
+            self.local_store.upsert(endpoint, [d for d in docs if isinstance(d, dict)])
+
+    def _invalidate_documents(self, endpoint: str, ids: List[str] = None) -> None:
+        """
+        Drop documents that were patched or deleted from the local store and
+        the entity cache.
+        """
+        if self.local_store is not None:
+            self.local_store.invalidate(endpoint, ids)
+        if self.entity_cache is not None:
+            self.entity_cache.invalidate(endpoint, ids)
+
+    def _get_entity(self, endpoint: str, _id: str, error: str, populate: str = None) -> dict:
+        """
+        Get a single document, from the entity cache while it is fresh, and
+        with a conditional request once it is stale.
+        """
+        cache = self.entity_cache
+        key = (endpoint, _id, populate)
+        entry = None
+        if cache is not None:
+            doc, entry = cache.get(key)
+            if doc is not None:
+                return doc
+        conditional = EntityCache.conditional_headers(entry)
+        res = self._try_request(
+            lambda: self._session.get(
+                self.url(f"/{endpoint}/{_id}"),
+                headers=dict(self._headers, **conditional),
+                params={"populate": populate},
+            )
+        )
+        if res.status_code == 304 and entry is not None:
+            return cache.revalidated(key, entry)
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError(error) from e
+        doc = self._codec.loads(res.content)
+        if cache is not None:
+            cache.put(key, doc, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+        return doc
+
+    def _iter_results(
+        self,
+        endpoint: str,
+        datatype: str,
+        sieve: dict,
+        limit: int = None,
+        as_frames: bool = False,
+        **kwargs
+    ) -> Iterator:
+        if kwargs.get("stream") and not as_frames:
+            kwargs.pop("stream")
+            yield from itertools.islice(self._iter_records(endpoint, sieve, limit=limit, **kwargs), limit)
+            return
+        remaining = limit or None
+        for page in self._iter_batches(endpoint, sieve, limit=limit, **kwargs):
+            if remaining is not None:
+                page = page[:remaining]
+                remaining -= len(page)
+            if as_frames:
+                yield self._build_frame(datatype, page, kwargs.get("select"))
+            else:
+                yield from page
+
+    def _export(
+        self,
+        endpoint: str,
+        datatype: str,
+        path: str,
+        sieve: dict,
+        partition_by: List[str],
+        convert_states: bool = False,
+        state_workers: int = 8,
+        **kwargs
+    ) -> int:
+        arrow.require_pyarrow()
+        schema = arrow.export_schema(
+            datatype, kwargs.get("select") or self.dtype_columns(datatype), kwargs.get("populate")
+        )
+        written = 0
+        for page in self._iter_batches(endpoint, sieve, **kwargs):
+            if convert_states:
+                page = self._convert_record_states(page, state_workers)
+            table = arrow.records_to_table(page, schema=schema)
+            arrow.write_parquet_dataset(arrow.add_date_column(table), path, list(partition_by or []))
+            written += len(page)
+        return written
+
     """
     ██████╗  ██████╗ ██╗███╗   ██╗████████╗███████╗
     ██╔══██╗██╔═══██╗██║████╗  ██║╚══██╔══╝██╔════╝
@@ -345,17 +1122,7 @@ class NeuvueQueue:
             dict
 
         """
-        res = self._try_request(
-            lambda: requests.get(
-                self.url(f"/points/{point_id}"),
-                headers=self._headers,
-            )
-        )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError(f"Failed to get point {point_id}") from e
-        return res.json()
+        return self._get_entity("points", point_id, f"Failed to get point {point_id}")
 
     def get_points(
         self,
@@ -363,6 +1130,9 @@ class NeuvueQueue:
         limit: int = None,
         sort: str = "",
         active_default: bool = True,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
         **kwargs
     ):
         """
@@ -374,35 +1144,94 @@ class NeuvueQueue:
             sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
                         sort in descending order.
             active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            select (List[str]: None): Fields to return, projected server-side
+            output (str: "pandas"): "pandas" for a DataFrame, or "arrow" for a pyarrow.Table
+                with nested fields kept as list/struct columns
+            dtype_backend (str: None): "pyarrow" for a DataFrame backed by Arrow arrays
             pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+            use_store (bool: True): Answer from the local store, if any, when it can
 
         Returns:
-            pd.DataFrame
+            pd.DataFrame or pyarrow.Table
 
         """
-        if sieve is None:
-            sieve = {"active": active_default}
-        if "active" not in sieve:
-            sieve["active"] = active_default
+        sieve = self._prepare_sieve(sieve, active_default)
 
         try:
-            depaginated_points = self.depaginate(
-                "points", sieve, limit=limit, sort=[sort], **kwargs
+            depaginated_points = self._query(
+                "points", sieve, limit=limit, sort=[sort], select=select, **kwargs
             )
         except Exception as e:
             raise RuntimeError("Failed to get points") from e
         else:
-            res = pd.DataFrame(depaginated_points)
+            return self._build_output("point", depaginated_points, select, output, dtype_backend)
+
+    def iter_points(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ) -> Iterator:
+        """
+        Iterate over points as their pages arrive, without holding the whole
+        collection in memory.
+
+        Arguments:
+            sieve (dict): See sieve documentation.
+            limit (int: None): The maximum number of items to return.
+            sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
+                        sort in descending order.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            as_frames (bool: False): Yield one DataFrame per page (formatted like `get_points`)
+                instead of one raw point dict at a time
+            select (List[str]: None): Fields to return, projected server-side
+            pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+
+        Returns:
+            Iterator[dict] or Iterator[pd.DataFrame]
+
+        """
+        sieve = self._prepare_sieve(sieve, active_default)
+        yield from self._iter_results(
+            "points", "point", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        )
 
-            # If an empty response, then return an empty dataframe:
-            if len(res) == 0:
-                return pd.DataFrame([], columns=self.dtype_columns("point"))
+    def export_points(
+        self,
+        path: str,
+        sieve: dict = None,
+        partition_by: List[str] = ("namespace", "date"),
+        active_default: bool = True,
+        **kwargs
+    ) -> int:
+        """
+        Stream points into a Parquet dataset, one page at a time, without building
+        a DataFrame.
+
+        Arguments:
+            path (str): Root directory of the dataset
+            sieve (dict): See sieve documentation.
+            partition_by (List[str]: ("namespace", "date")): Columns to partition by.
+                `date` is the day the point was created.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            kwargs: Passed on to `depaginate` (e.g. `select`, `pageSize`, `pagination`)
 
-            res.set_index("_id", inplace=True)
-            res.created = pd.to_datetime(res.created, unit="ms")
-            res.submitted = pd.to_datetime(res.submitted, unit="ms")
+        Returns:
+            int: Number of points written
 
-            return res
+        """
+        sieve = self._prepare_sieve(sieve, active_default)
+        return self._export("points", "point", path, sieve, partition_by, **kwargs)
 
     def post_point(
         self,
@@ -447,15 +1276,133 @@ class NeuvueQueue:
         }
 
         res = self._try_request(
-            lambda: requests.post(
-                self.url("/points"), data=json.dumps(point), headers=self._headers
+            lambda: self._session.post(
+                self.url("/points"), data=self._codec.dumps(point), headers=self._headers
             )
         )
         try:
             self._raise_for_status(res)
         except Exception as e:
             raise RuntimeError("Unable to post point") from e
-        return res.json()
+        inserted = self._codec.loads(res.content)
+        self._store_documents("points", [inserted])
+        return inserted
+
+    def post_points(
+        self,
+        coordinates: Any,
+        author: str = None,
+        namespace: str = None,
+        type: str = None,
+        resolution: int = 0,
+        metadata: dict = None,
+        chunk_size: int = 1000,
+        max_workers: int = 4,
+    ) -> pd.Series:
+        """
+        Post many points at once, as JSON arrays of `chunk_size` points sent
+        concurrently.
+
+        Arguments:
+            coordinates (np.ndarray or pd.DataFrame): An (N, 3) array of coordinates, or a
+                DataFrame with either a `coordinate` column or `x`, `y` and `z` columns.
+                A DataFrame may also carry per-row `author`, `namespace`, `type`,
+                `resolution` and `metadata` columns, which take precedence.
+            author (str)
+            namespace (str)
+            type (str)
+            resolution (int = 0)
+            metadata (dict = None)
+            chunk_size (int: 1000): Number of points per request
+            max_workers (int: 4): Number of requests in flight at once
+
+        Returns:
+            pd.Series: The inserted IDs, aligned to the input rows. Rows in a chunk
+                that failed to post are None.
+
+        """
+        index, points = self._new_points(coordinates, author, namespace, type, resolution, metadata)
+        chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+
+        def post(chunk: list) -> list:
+            try:
+                return self._post_point_chunk(chunk)
+            except Exception as e:
+                print(f"WARNING: Unable to post {len(chunk)} points: {self._describe_error(e)}")
+                return [None] * len(chunk)
+
+        ids = [i for chunk_ids in self._map(post, chunks, max_workers) for i in chunk_ids]
+        return pd.Series(ids, index=index, name="_id", dtype=object)
+
+    def _new_points(
+        self,
+        coordinates: Any,
+        author: str,
+        namespace: str,
+        type: str,
+        resolution: int,
+        metadata: dict,
+    ) -> Tuple[pd.Index, List[dict]]:
+        """
+        Build the point documents for `post_points`.
+        """
+        if isinstance(coordinates, pd.DataFrame):
+            frame = coordinates
+            if "coordinate" in frame.columns:
+                coords = [list(c) for c in frame["coordinate"]]
+            elif {"x", "y", "z"}.issubset(frame.columns):
+                coords = frame[["x", "y", "z"]].to_numpy().tolist()
+            else:
+                raise ValueError("Coordinates DataFrame must have a `coordinate` column or `x`, `y` and `z` columns.")
+            index = frame.index
+            # Empty cells (NaN, None) fall back to the shared arguments
+            rows = [
+                {k: v for k, v in row.items() if not (pd.api.types.is_scalar(v) and pd.isna(v))}
+                for row in frame.to_dict("records")
+            ]
+        else:
+            array = np.asarray(coordinates)
+            if array.ndim != 2 or array.shape[1] != 3:
+                raise ValueError(f"Coordinates must be an (N, 3) array, not {array.shape}.")
+            coords = array.tolist()
+            index = pd.RangeIndex(len(coords))
+            rows = [{}] * len(coords)
+
+        created = utils.date_to_ms()
+        points = []
+        for coordinate, row in zip(coords, rows):
+            point = {
+                "active": True,
+                "coordinate": [int(c) for c in coordinate],
+                "author": row.get("author", author),
+                "namespace": row.get("namespace", namespace),
+                "type": row.get("type", type),
+                "resolution": int(row.get("resolution", resolution)),
+                "metadata": row.get("metadata", metadata if metadata is not None else {}),
+                "created": created,
+                "__v": 1,
+            }
+            for key in ["author", "namespace", "type"]:
+                if not isinstance(point[key], str):
+                    raise ValueError(f"Every point needs a string `{key}`, got [{point[key]}].")
+            points.append(point)
+        return index, points
+
+    def _post_point_chunk(self, chunk: List[dict]) -> List[str]:
+        res = self._try_request(
+            lambda: self._session.post(
+                self.url("/points"), data=self._codec.dumps(chunk), headers=self._headers
+            )
+        )
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError("Unable to post points") from e
+        inserted = self._codec.loads(res.content)
+        if not isinstance(inserted, list) or len(inserted) != len(chunk):
+            raise RuntimeError(f"Expected {len(chunk)} inserted points in the response")
+        self._store_documents("points", inserted)
+        return [p.get("_id") for p in inserted]
 
     def patch_point(self, point_id: str, **kwargs):
         """
@@ -474,26 +1421,29 @@ class NeuvueQueue:
             return 
 
         valid_kwargs = ['agents_status']
-        for key, value in kwargs.items():
-            if key not in valid_kwargs:
-                print("WARNING: Key {key} does not exist in point attributes.")
-            # Append metadata to existing entries
+        try:
+            for key, value in kwargs.items():
+                if key not in valid_kwargs:
+                    print("WARNING: Key {key} does not exist in point attributes.")
+                # Append metadata to existing entries
 
-            stri = f"/points/{point_id}/{key}"
+                stri = f"/points/{point_id}/{key}"
             
-            # Include flag for status updates, if needed. 
-            data = {key:value}
+                # Include flag for status updates, if needed. 
+                data = {key:value}
 
-            res = self._try_request( 
-                lambda: requests.patch(
-                    self.url(stri), 
-                    data=json.dumps(data),
-                    headers=self._headers)
-            )
-            try:
-                self._raise_for_status(res)
-            except Exception as e:
-                raise RuntimeError(f"Unable to patch point {point_id}") from e
+                res = self._try_request( 
+                    lambda: self._session.patch(
+                        self.url(stri), 
+                        data=self._codec.dumps(data),
+                        headers=self._headers)
+                )
+                try:
+                    self._raise_for_status(res)
+                except Exception as e:
+                    raise RuntimeError(f"Unable to patch point {point_id}") from e
+        finally:
+            self._invalidate_documents("points", [point_id])
 
 
     """
@@ -517,23 +1467,13 @@ class NeuvueQueue:
             dict
 
         """
-        res = self._try_request(
-            lambda: requests.get(
-                self.url(f"/tasks/{task_id}"), 
-                headers=self._headers,
-                params={"populate": "points" if populate_points else None}
-            )
+        task = self._get_entity(
+            "tasks", task_id, f"Unable to get task {task_id}",
+            populate="points" if populate_points else None
         )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError(f"Unable to get task {task_id}") from e
         if convert_states_to_json: 
-            task = res.json()
-            task['ng_state'] = utils.get_from_state_server(task['ng_state'], self._json_state_server_token)
-            return task
-        else:
-            return res.json()
+            task['ng_state'] = utils.get_from_state_server(task['ng_state'], self._json_state_server_token, session=self._session, cache=self.state_cache)
+        return task
 
     def get_next_task(self, assignee: str, namespace: str) -> dict:
         """
@@ -578,6 +1518,29 @@ class NeuvueQueue:
 
         return res[0] if res else None
 
+    def task_queue(self, assignee: str, namespace: str, **kwargs) -> TaskQueue:
+        """
+        Get the prefetching task queue of a user.
+
+        `next()` on the queue hands out tasks in the same order as
+        `get_next_task` (open tasks first, then by highest priority), but from
+        a buffer refilled in the background, with their states already resolved.
+        There is one queue per assignee and namespace for the life of this client.
+
+        Arguments:
+            assignee (str): The username of the assignee
+            namespace (str): The app/sprint for which the tasks were assigned
+            kwargs: Passed on to `TaskQueue` when the queue is created (e.g. `size`)
+
+        Returns:
+            TaskQueue
+
+        """
+        key = (assignee, namespace)
+        if key not in self._task_queues:
+            self._task_queues[key] = TaskQueue(self, assignee, namespace, **kwargs)
+        return self._task_queues[key]
+
     def delete_task(self, task_id: str) -> str:
         """
         Delete a single task.
@@ -590,7 +1553,7 @@ class NeuvueQueue:
 
         """
         res = self._try_request(
-            lambda: requests.delete(
+            lambda: self._session.delete(
                 self.url(f"/tasks/{task_id}"), headers=self._headers
             )
         )
@@ -598,8 +1561,45 @@ class NeuvueQueue:
             self._raise_for_status(res)
         except Exception as e:
             raise RuntimeError(f"Unable to delete task {task_id}") from e
+        self._invalidate_documents("tasks", [task_id])
         return task_id
 
+    def delete_tasks(
+        self,
+        task_ids: Any = None,
+        sieve: dict = None,
+        bulk: bool = False,
+        chunk_size: int = 1000,
+        max_workers: int = 8,
+        active_default: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Delete many tasks concurrently.
+
+        Arguments:
+            task_ids (List[str] or pd.Index or pd.DataFrame: None): The tasks to delete.
+                A DataFrame from `get_tasks` is deleted by its index.
+            sieve (dict: None): Delete every task matching this sieve instead
+            bulk (bool: False): Delete `chunk_size` tasks per request with a
+                `DELETE /tasks?q={"_id": {"$in": [...]}}`. Only use this with a server
+                known to apply `q` to collection deletes: one that ignores it deletes
+                every task. The first request is sent alone, and bulk deletes are only
+                kept up if its response reports a `deletedCount` no larger than the
+                chunk. Otherwise the remaining tasks are deleted one request at a time.
+            chunk_size (int: 1000): Number of tasks per bulk request
+            max_workers (int: 8): Number of requests in flight at once
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+
+        Returns:
+            pd.DataFrame: One row per task ID with `success` and `error` columns
+
+        """
+        if sieve is not None:
+            sieve = self._prepare_time_queries(self._prepare_sieve(sieve, active_default))
+        report = self._bulk_delete("tasks", task_ids, sieve, bulk, chunk_size, max_workers)
+        self._invalidate_documents("tasks", list(report.index))
+        return report
+
     def get_tasks(
         self, 
         sieve: dict = None, 
@@ -608,6 +1608,10 @@ class NeuvueQueue:
         populate_points: bool = False,
         sort: str = '',
         convert_states_to_json: bool = True,
+        state_workers: int = 8,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
         **kwargs
     ):
         """
@@ -621,56 +1625,234 @@ class NeuvueQueue:
             sort (str): attribute to sort by, default is task_id. Add `-` to the beginning of the attribute name to
                         sort in descending order.
             convert_states_to_json (bool): whether to convert ng_states to json strings
+            state_workers (int: 8): Number of distinct states to fetch concurrently
+            select (List[str]: None): Fields to return, projected server-side. States are
+                only converted if `ng_state` is selected.
+            output (str: "pandas"): "pandas" for a DataFrame, or "arrow" for a pyarrow.Table
+                with nested fields kept as list/struct columns
+            dtype_backend (str: None): "pyarrow" for a DataFrame backed by Arrow arrays
             pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+            use_store (bool: True): Answer from the local store, if any, when it can
         Returns:
-            pd.DataFrame
+            pd.DataFrame or pyarrow.Table
 
         """
-        if sieve is None:
-            sieve = {"active": active_default}
-        if "active" not in sieve:
-            sieve["active"] = active_default
-        time_queries = [key for key in sieve.keys() if key in ['created', 'opened', 'closed']]
-        if time_queries:
-            for key in time_queries:
-                if len(sieve[key]) > 1:
-                    assert sieve[key]['$gt'] < sieve[key]['$lt'], "$gt argument must be less than $lt if both are used."
-                for query in sieve[key].keys():
-                    assert type(sieve[key][query]) == datetime.datetime, "Please enter a datetime.datetime object."
-                    sieve[key][query] = round(sieve[key][query].timestamp()*1000)
+        sieve = self._prepare_time_queries(self._prepare_sieve(sieve, active_default))
         
         populate = ["points"] if populate_points else None
         try:
-            depaginated_tasks = self.depaginate("tasks", sieve, populate=populate, limit=limit, sort=[sort], **kwargs)
+            depaginated_tasks = self._query("tasks", sieve, populate=populate, limit=limit, sort=[sort], select=select, **kwargs)
         except Exception as e:
             raise RuntimeError("Unable to get tasks") from e
         else:
-            res = pd.DataFrame(depaginated_tasks)
-
-            # If an empty response, then return an empty dataframe:
-            if len(res) == 0:
-                return pd.DataFrame([], columns=self.dtype_columns("task"))
-            res.set_index("_id", inplace=True)
-            if 'created' in res.columns:
-                res.created = pd.to_datetime(res.created, unit="ms")
-            if 'opened' in res.columns:
-                res.opened = pd.to_datetime(res.opened, unit="ms")
-            if 'closed' in res.columns:
-                res.closed = pd.to_datetime(res.closed, unit="ms")
-
             # Convert states to JSON if they are in URL format 
-            if convert_states_to_json and 'ng_state' in res.columns:
-                
-                def _convert_state(x):
-                    try:
-                        return utils.get_from_state_server(x, self._json_state_server_token)
-                    except: 
-                        return x
+            if convert_states_to_json:
+                depaginated_tasks = self._convert_record_states(depaginated_tasks, state_workers)
+            return self._build_output("task", depaginated_tasks, select, output, dtype_backend)
+
+    def iter_tasks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        active_default: bool = True,
+        populate_points: bool = False,
+        sort: str = '',
+        convert_states_to_json: bool = True,
+        as_frames: bool = False,
+        state_workers: int = 8,
+        select: List[str] = None,
+        **kwargs
+    ) -> Iterator:
+        """
+        Iterate over tasks as their pages arrive, without holding the whole
+        collection in memory.
+
+        Arguments:
+            sieve (dict): See sieve documentation.
+            limit (int: None): The maximum number of items to return.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            populate_points (bool): Whether to populate the tasks' point ids with their corresponding point object.
+            sort (str): attribute to sort by, default is task_id. Add `-` to the beginning of the attribute name to
+                        sort in descending order.
+            convert_states_to_json (bool): whether to convert ng_states to json strings
+            as_frames (bool: False): Yield one DataFrame per page (formatted like `get_tasks`)
+                instead of one raw task dict at a time
+            state_workers (int: 8): Number of distinct states to fetch concurrently per page
+            select (List[str]: None): Fields to return, projected server-side. States are
+                only converted if `ng_state` is selected.
+            pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+        Returns:
+            Iterator[dict] or Iterator[pd.DataFrame]
+
+        """
+        sieve = self._prepare_time_queries(self._prepare_sieve(sieve, active_default))
+        populate = ["points"] if populate_points else None
+        for item in self._iter_results(
+            "tasks", "task", sieve, limit=limit, as_frames=as_frames, populate=populate, sort=[sort], select=select, **kwargs
+        ):
+            if convert_states_to_json:
+                if as_frames and len(item) and 'ng_state' in item.columns:
+                    item['ng_state'] = self._convert_states(item['ng_state'], max_workers=state_workers)
+                elif not as_frames and 'ng_state' in item:
+                    item['ng_state'] = self._convert_state(item['ng_state'])
+            yield item
+
+    def export_tasks(
+        self,
+        path: str,
+        sieve: dict = None,
+        partition_by: List[str] = ("namespace", "date"),
+        active_default: bool = True,
+        convert_states_to_json: bool = False,
+        state_workers: int = 8,
+        **kwargs
+    ) -> int:
+        """
+        Stream tasks into a Parquet dataset, one page at a time, without building
+        a DataFrame.
+
+        Arguments:
+            path (str): Root directory of the dataset
+            sieve (dict): See sieve documentation.
+            partition_by (List[str]: ("namespace", "date")): Columns to partition by.
+                `date` is the day the task was created.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            convert_states_to_json (bool: False): whether to convert ng_states to json strings
+            state_workers (int: 8): Number of distinct states to fetch concurrently per page
+            kwargs: Passed on to `depaginate` (e.g. `select`, `pageSize`, `pagination`)
+
+        Returns:
+            int: Number of tasks written
+
+        """
+        sieve = self._prepare_time_queries(self._prepare_sieve(sieve, active_default))
+        return self._export(
+            "tasks", "task", path, sieve, partition_by,
+            convert_states=convert_states_to_json, state_workers=state_workers, **kwargs
+        )
+
+    def sync_tasks(
+        self, sieve: dict = None, path: str = None, full: bool = False, reconcile: bool = False, **kwargs
+    ) -> pd.DataFrame:
+        """
+        Get the tasks matching a sieve, downloading only what changed since the
+        last call with the same sieve.
+
+        The mirror for each sieve (and set of other arguments) lives as long as this
+        client (or in `path`, across sessions). See `neuvueclient.TaskMirror` for
+        what counts as a change.
+
+        Arguments:
+            sieve (dict): See sieve documentation.
+            path (str: None): File to persist the mirror to between sessions
+            full (bool: False): Download every task instead of only recent changes
+            reconcile (bool: False): Also drop mirrored tasks that were deleted on the
+                server or left the sieve without a timestamp change
+            kwargs: Passed on to `TaskMirror` and `get_tasks`
 
-                res['ng_state'] = res['ng_state'].apply( _convert_state)
-            return res
+        Returns:
+            pd.DataFrame
+
+        """
+        key = json.dumps([sieve, path, kwargs], sort_keys=True, default=str)
+        if key not in self._task_mirrors:
+            self._task_mirrors[key] = TaskMirror(self, sieve, path=path, **kwargs)
+        return self._task_mirrors[key].refresh(full=full, reconcile=reconcile)
+
+    def post_task(
+        self,
+        author: str,
+        assignee: str,
+        priority: int,
+        namespace: str,
+        instructions: dict,
+        points: List[str] = None,
+        duration: int = 0,
+        metadata: dict = None,
+        seg_id: str = None,
+        ng_state: str = None,
+        version: int = 1,
+        post_state: bool = True,
+        **kwargs
+    ):
+        """
+        Post a new task to the database.
+
+        Arguments:
+            points List(str)
+            author (str)
+            assignee (str)
+            priority (int)
+            namespace (str)
+            instructions (dict)
+            metadata (dict = None)
+            seg_id (str = None)
+            post_state (bool = True)
+
+        Returns:
+            dict
+
+        """
+        task = self._new_task(
+            author, assignee, priority, namespace, instructions, points=points,
+            duration=duration, metadata=metadata, seg_id=seg_id, ng_state=ng_state, version=version
+        )
+        if self._should_post_state(post_state, ng_state):
+            ng_state_url = self._post_state(ng_state)
+
+            task['metadata']['base_state'] = ng_state_url
+            if ng_state_url:
+                task['ng_state'] = ng_state_url
+
+        res = self._try_request(
+            lambda: self._session.post(
+                self.url("/tasks"), data=self._codec.dumps(task), headers=self._headers
+            )
+        )
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError("Failed to post task") from e
+        inserted = self._codec.loads(res.content)
+        self._store_documents("tasks", inserted if isinstance(inserted, list) else [inserted])
+        return inserted
+
+    def _post_state(self, ng_state: str) -> str:
+        """
+        Upload a state, or reuse the URL of an earlier upload of identical content.
+        """
+        index = self.state_upload_index
+        if index is not None:
+            ng_state_url = index.get(ng_state, self._json_state_server)
+            if ng_state_url:
+                return ng_state_url
+
+        ng_state_url = utils.post_to_state_server(
+            ng_state, 
+            self._json_state_server, 
+            self._json_state_server_token,
+            session=self._session,
+            cache=self.state_cache,
+            codec=self._codec)
+        if ng_state_url and index is not None:
+            index.put(ng_state, ng_state_url, self._json_state_server)
+        return ng_state_url
+
+    def _should_post_state(self, post_state: bool, ng_state: str) -> bool:
+        return bool(
+            post_state and 
+            ng_state is not None and 
+            utils.is_json(ng_state) and
+            self._json_state_server_token is not None
+        )
 
-    def post_task(
+    def _new_task(
         self,
         author: str,
         assignee: str,
@@ -683,26 +1865,9 @@ class NeuvueQueue:
         seg_id: str = None,
         ng_state: str = None,
         version: int = 1,
-        post_state: bool = True,
-        **kwargs
-    ):
+    ) -> dict:
         """
-        Post a new task to the database.
-
-        Arguments:
-            points List(str)
-            author (str)
-            assignee (str)
-            priority (int)
-            namespace (str)
-            instructions (dict)
-            metadata (dict = None)
-            seg_id (str = None)
-            post_state (bool = True)
-
-        Returns:
-            dict
-
+        Validate the arguments of `post_task` and build the task document.
         """
         if metadata is None:
             metadata = {}
@@ -731,23 +1896,8 @@ class NeuvueQueue:
         
         if not isinstance(namespace, str):
             raise ValueError(f"Namespace [{namespace}] must be a string.")
-        
-        if (post_state and 
-            ng_state is not None and 
-            utils.is_json(ng_state) and
-            self._json_state_server_token is not None
-            ):
-
-            ng_state_url = utils.post_to_state_server(
-                ng_state, 
-                self._json_state_server, 
-                self._json_state_server_token)
 
-            metadata['base_state'] = ng_state_url
-        else:
-            ng_state_url = None
-        
-        task = {
+        return {
             "active": True,
             "closed": None,
             "metadata": metadata,
@@ -762,19 +1912,9 @@ class NeuvueQueue:
             "instructions": instructions,
             "created": utils.date_to_ms(),
             "seg_id": seg_id,
-            "ng_state": ng_state_url if ng_state_url else ng_state,
+            "ng_state": ng_state,
             "__v": version,
         }
-        res = self._try_request(
-            lambda: requests.post(
-                self.url("/tasks"), data=json.dumps(task), headers=self._headers
-            )
-        )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError("Failed to post task") from e
-        return res.json()
 
     def post_task_broadcast(
         self,
@@ -808,6 +1948,49 @@ class NeuvueQueue:
         Returns:
             List[dict]
 
+        """
+        tasks = self._new_broadcast_tasks(
+            author, assignees, priority, namespace, instructions, points=points,
+            duration=duration, metadata=metadata, seg_id=seg_id, ng_state=ng_state, post_state=post_state
+        )
+        if self._should_post_state(post_state, ng_state):
+            ng_state_url = self._post_state(ng_state)
+            if ng_state_url:
+                for task in tasks:
+                    task["ng_state"] = ng_state_url
+
+        res = self._try_request(
+            lambda: self._session.post(
+                self.url("/tasks"),
+                data=self._codec.dumps(tasks),
+                headers=self._headers,
+            )
+        )
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError("Failed to post task") from e
+        inserted = self._codec.loads(res.content)
+        self._store_documents("tasks", inserted if isinstance(inserted, list) else [inserted])
+        return inserted
+
+    def _new_broadcast_tasks(
+        self,
+        author: str,
+        assignees: List[str],
+        priority: int,
+        namespace: str,
+        instructions: dict,
+        points: List[str] = None,
+        duration: int = 0,
+        metadata: dict = None,
+        seg_id: str = None,
+        ng_state: str = None,
+        post_state: bool = True
+    ) -> List[dict]:
+        """
+        Validate the arguments of `post_task_broadcast` and build one task
+        document per assignee.
         """
         if metadata is None:
             metadata = {}
@@ -839,18 +2022,6 @@ class NeuvueQueue:
         if not isinstance(post_state, bool):
             raise ValueError(f"Post_state [{post_state}] must be a bool.")
 
-        if (post_state and 
-            ng_state is not None and
-            utils.is_json(ng_state) and 
-            self._json_state_server_token is not None
-            ):
-            ng_state_url = utils.post_to_state_server(
-                ng_state, 
-                self._json_state_server, 
-                self._json_state_server_token)
-        else:
-            ng_state_url = None
-
         tasks = []
         created = utils.date_to_ms()
         for a in assignees:
@@ -870,25 +2041,21 @@ class NeuvueQueue:
                     "instructions": instructions,
                     "created": created,
                     "seg_id": seg_id,
-                    "ng_state": ng_state_url if ng_state_url else ng_state,
+                    "ng_state": ng_state,
                     "__v": 0,
                 }
             )
+        return tasks
 
-        res = self._try_request(
-            lambda: requests.post(
-                self.url("/tasks"),
-                data=json.dumps(tasks),
-                headers=self._headers,
-            )
-        )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError("Failed to post task") from e
-        return res.json()
-
-    def patch_task(self, task_id: str, author: str = None, overwrite_opened: bool = True, **kwargs):
+    def patch_task(
+        self,
+        task_id: str,
+        author: str = None,
+        overwrite_opened: bool = True,
+        task: dict = None,
+        combined: bool = False,
+        **kwargs
+    ):
         """
         Patch a single task. Iterates through each argument passed through kwargs and patches each.
         
@@ -901,9 +2068,16 @@ class NeuvueQueue:
             priority='100'
         )
         
+        Only the fields needed to record provenance and merge metadata are read
+        from the server beforehand, and nothing is read if `task` already holds them.
+
         Arguments:
             task_id (str): The ID of the question to delete
             overwrite_opened (bool): whether to update the opened time when patching status. 
+            task (dict or pd.Series: None): A copy of the task (e.g. from `get_task` or a row
+                of `get_tasks`) to take provenance and metadata from instead of fetching it
+            combined (bool: False): Send every field in a single PATCH to /tasks/{task_id}.
+                Falls back to one PATCH per field if the server does not support it.
             kwargs (dict or str or int): The fields to modify. Only supports 
                 - instruction
                 - priority 
@@ -919,8 +2093,325 @@ class NeuvueQueue:
             print("WARNING: No valid kwargs provided in patch_task().")
             return 
 
+        task = self._task_for_patch(task_id, kwargs, task)
+        patches = self._task_patches(task_id, task, author, overwrite_opened, kwargs)
+        try:
+            self._send_task_patches(task_id, patches, combined)
+        finally:
+            # Even a patch that failed part way may have changed the task
+            self._invalidate_documents("tasks", [task_id])
+
+    def _send_task_patches(self, task_id: str, patches: List[Tuple[str, dict]], combined: bool) -> None:
+        """
+        Send the patches built by `_task_patches`, in one request if `combined`.
+        """
+        if combined and self._combined_patch_supported is not False:
+            body = {}
+            for _, data in patches:
+                body.update(data)
+            res = self._try_request(
+                lambda: self._session.patch(
+                    self.url(f"/tasks/{task_id}"),
+                    data=self._codec.dumps(body),
+                    headers=self._headers)
+            )
+            if res.status_code not in self._unsupported_statuses:
+                try:
+                    self._raise_for_status(res)
+                except Exception as e:
+                    raise RuntimeError(f"Unable to patch task {task_id}") from e
+                self._combined_patch_supported = True
+                return
+            # A 404 may also mean the task does not exist, so only remember
+            # that the combined form is unsupported once a per-field PATCH works.
+
+        for stri, data in patches:
+            res = self._try_request( 
+                lambda: self._session.patch(
+                    self.url(stri), 
+                    data=self._codec.dumps(data),
+                    headers=self._headers)
+            )
+            try:
+                self._raise_for_status(res)
+            except Exception as e:
+                raise RuntimeError(f"Unable to patch task {task_id}") from e
+        if combined and self._combined_patch_supported is None:
+            self._combined_patch_supported = False
+
+    def patch_tasks(
+        self,
+        tasks: Any,
+        author: str = None,
+        overwrite_opened: bool = True,
+        combined: bool = False,
+        max_workers: int = 8,
+        **kwargs
+    ) -> pd.DataFrame:
+        """
+        Apply the same patch to many tasks concurrently.
+
+        Each task is patched exactly as `patch_task` would, including provenance.
+        A failing task does not stop the others; check the returned report.
+
+        Example:
+        > report = patch_tasks(C.get_tasks({"namespace": "split", "status": "open"}), "me", status="closed")
+        > report[~report.success]
+
+        Arguments:
+            tasks (List[str] or pd.DataFrame): Task IDs, or a DataFrame from `get_tasks`
+                whose rows are used as the cached copy of each task
+            author (str): Your username, recorded in provenance
+            overwrite_opened (bool): whether to update the opened time when patching status.
+            combined (bool: False): See `patch_task`
+            max_workers (int: 8): Number of tasks to patch concurrently
+            kwargs (dict or str or int): The fields to modify. See `patch_task`
+
+        Returns:
+            pd.DataFrame: One row per task ID with `success` and `error` columns
+
+        """
+        if isinstance(tasks, pd.DataFrame):
+            items = [(task_id, row) for task_id, row in tasks.iterrows()]
+        else:
+            items = [(task_id, None) for task_id in tasks]
+
+        def patch(item):
+            task_id, task = item
+            # patch_task adds provenance to the metadata it is given, so each
+            # task needs its own copy of the fields
+            self.patch_task(
+                task_id, author=author, overwrite_opened=overwrite_opened, task=task,
+                combined=combined, **copy.deepcopy(kwargs)
+            )
+
+        return self._run_bulk(patch, items, [task_id for task_id, _ in items], max_workers)
+
+    def _run_bulk(self, func: Callable[[Any], Any], items: list, ids: list, max_workers: int) -> pd.DataFrame:
+        """
+        Call `func` on every item on a thread pool, collecting a success/failure
+        report indexed by `ids` instead of stopping at the first exception.
+        """
+        def run(item):
+            try:
+                func(item)
+            except Exception as e:
+                return False, self._describe_error(e)
+            return True, None
+
+        results = self._map(run, items, max_workers)
+        return pd.DataFrame(
+            results, index=pd.Index(ids, name="_id"), columns=["success", "error"]
+        )
+
+    def _bulk_delete(
+        self,
+        endpoint: str,
+        ids: Any,
+        sieve: dict,
+        bulk: bool,
+        chunk_size: int,
+        max_workers: int,
+    ) -> pd.DataFrame:
+        """
+        Delete documents by ID, or every document matching `sieve`, reporting
+        success or failure per ID.
+        """
+        if ids is None and sieve is None:
+            raise ValueError("Either IDs or a sieve of documents to delete is required.")
+        if ids is None:
+            try:
+                ids = [d["_id"] for d in self.depaginate(endpoint, sieve, select=["_id"])]
+            except Exception as e:
+                raise RuntimeError(f"Unable to find {endpoint} to delete") from e
+        elif isinstance(ids, pd.DataFrame):
+            ids = ids.index
+        ids = list(ids)
+
+        def delete_one(_id: str) -> None:
+            res = self._try_request(
+                lambda: self._session.delete(self.url(f"/{endpoint}/{_id}"), headers=self._headers)
+            )
+            try:
+                self._raise_for_status(res)
+            except Exception as e:
+                raise RuntimeError(f"Unable to delete {endpoint} {_id}") from e
+
+        if not bulk or self._bulk_delete_supported.get(endpoint) is False or not ids:
+            return self._run_bulk(delete_one, ids, ids, max_workers)
+
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+        def delete_chunk(chunk: list) -> Tuple[Optional[pd.DataFrame], list]:
+            # The report for the chunk (None if bulk deletes are unsupported) and the IDs left to delete one by one
+            error = None
+            try:
+                res = self._try_request(
+                    lambda: self._session.delete(
+                        self.url(endpoint), headers=self._headers,
+                        params={"q": json.dumps({"_id": {"$in": chunk}})}
+                    )
+                )
+                if res.status_code in self._unsupported_statuses:
+                    return None, chunk
+                self._raise_for_status(res)
+            except Exception as e:
+                error = f"Unable to delete {len(chunk)} {endpoint}: {e}"
+            if error is None and not self._check_bulk_delete(endpoint, chunk, res.content):
+                # Deleted, but without a count: whatever is left is deleted one by one
+                left = [d["_id"] for d in self.depaginate(endpoint, {"_id": {"$in": chunk}}, select=["_id"])]
+                return self._bulk_report(chunk), left
+            return self._bulk_report(chunk, error=error), []
+
+        # Probe with the first chunk before sending the rest concurrently
+        results = [delete_chunk(chunks[0])]
+        if results[0][0] is None:
+            self._bulk_delete_supported[endpoint] = False
+        if self._bulk_delete_supported.get(endpoint):
+            results += self._map(delete_chunk, chunks[1:], max_workers)
+        else:
+            results += [(None, chunk) for chunk in chunks[1:]]
+        # One pool for every ID left over, rather than one per chunk
+        left = [_id for _, chunk_left in results for _id in chunk_left]
+        return self._chunk_reports(chunks, results, self._run_bulk(delete_one, left, left, max_workers))
+
+    def _check_bulk_delete(self, endpoint: str, chunk: list, content: bytes) -> bool:
+        """
+        Check that a bulk DELETE applied its sieve: the response must report a
+        `deletedCount` no larger than the number of IDs sent. Bulk deletes stay
+        enabled for the endpoint only while responses do.
+
+        Returns:
+            bool: Whether the response reported a count
+
+        Raises:
+            RuntimeError: If the server deleted more documents than it was sent IDs
+
+        """
+        try:
+            count = self._codec.loads(content).get("deletedCount")
+        except Exception:
+            count = None
+        if not isinstance(count, int) or isinstance(count, bool):
+            self._bulk_delete_supported[endpoint] = False
+            return False
+        if count > len(chunk):
+            self._bulk_delete_supported[endpoint] = False
+            raise RuntimeError(
+                f"Deleting {len(chunk)} {endpoint} by ID deleted {count}: the server ignored the sieve. "
+                f"Bulk deletes are now disabled for {endpoint}."
+            )
+        self._bulk_delete_supported[endpoint] = True
+        return True
+
+    @classmethod
+    def _chunk_reports(cls, chunks: list, results: list, deleted: pd.DataFrame) -> pd.DataFrame:
+        """
+        Combine the `(report, left)` result of each bulk-deleted chunk with the
+        report `deleted` for the IDs left over, which were deleted one by one.
+        """
+        reports = []
+        for chunk, (report, left) in zip(chunks, results):
+            if report is None:
+                report = cls._bulk_report(chunk)
+            if left:
+                report.loc[left, ["success", "error"]] = deleted.loc[left, ["success", "error"]].values
+            reports.append(report)
+        return pd.concat(reports)
+
+    @staticmethod
+    def _bulk_report(ids: list, deleted: pd.DataFrame = None, error: str = None) -> pd.DataFrame:
+        """
+        Build a delete report for `ids`: every ID failed with `error`, or
+        succeeded unless `deleted` (a report for some of them) says otherwise.
+        """
+        report = pd.DataFrame(
+            [(error is None, error)] * len(ids),
+            index=pd.Index(ids, name="_id"), columns=["success", "error"]
+        )
+        if deleted is not None and len(deleted):
+            report.loc[deleted.index, ["success", "error"]] = deleted[["success", "error"]].values
+        return report
+
+    def _map(self, func: Callable[[Any], Any], items: list, max_workers: int) -> list:
+        """
+        `map` over a thread pool of up to `max_workers` threads, preserving order.
+        """
+        if max_workers and max_workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+                return list(executor.map(func, items))
+        return [func(item) for item in items]
+
+    @staticmethod
+    def _describe_error(e: Exception) -> str:
+        # Our RuntimeErrors wrap the server's message as their cause
+        if e.__cause__ is not None:
+            return f"{e}: {e.__cause__}"
+        return str(e)
+
+    # Statuses with which a server rejects a route or method it does not implement
+    _unsupported_statuses = (404, 405, 501)
+
+    def _patch_fields(self, kwargs: dict) -> set:
+        """
+        Get the task fields that `_task_patches` reads: provenance fields when
+        status or assignee change, and metadata when it is merged.
+        """
+        fields = set()
+        if 'assignee' in kwargs or 'status' in kwargs:
+            fields |= {"author", "assignee", "status", "created", "metadata"}
+        if 'metadata' in kwargs:
+            fields.add("metadata")
+        return fields
+
+    def _task_for_patch(self, task_id: str, kwargs: dict, task: Any = None) -> dict:
+        """
+        Get the fields of a task needed to patch it, preferring a caller-supplied
+        copy and otherwise fetching only those fields.
+        """
+        fields = self._patch_fields(kwargs)
+        if task is not None:
+            task = self._task_record(task)
+            if fields.issubset(task.keys()):
+                return task
+        if not fields:
+            return {"_id": task_id, "metadata": {}}
+
+        try:
+            found = self.depaginate("tasks", {"_id": task_id}, select=sorted(fields), limit=1, pageSize=1)
+        except Exception:
+            found = []
+        task = found[0] if found else self.get_task(task_id)
+        task.setdefault("metadata", {})
+        return task
+
+    def _task_record(self, task: Any) -> dict:
+        """
+        Copy a task dict or `get_tasks` row into the raw form returned by the
+        server, so that it can be modified without affecting the caller.
+        """
+        if isinstance(task, pd.Series):
+            record = {"_id": task.name, **task.to_dict()}
+        else:
+            record = dict(task)
+        for key, value in record.items():
+            # Frames fill fields missing from some rows with NaT or NaN
+            if value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+                record[key] = None
+            elif isinstance(value, pd.Timestamp):
+                record[key] = round(value.timestamp() * 1000)
+        metadata = record.get("metadata")
+        record["metadata"] = copy.deepcopy(metadata) if isinstance(metadata, dict) else {}
+        return record
+
+    def _task_patches(
+        self, task_id: str, task: dict, author: str, overwrite_opened: bool, kwargs: dict
+    ) -> List[Tuple[str, dict]]:
+        """
+        Record provenance for `patch_task` and build one (endpoint, body) pair
+        per field to patch.
+        """
         valid_kwargs = self.dtype_columns("task")
-        task = self.get_task(task_id)
 
         # If status or assignee is designated, patch metadata to include provenance too
         if 'assignee' in kwargs.keys() or 'status' in kwargs.keys():
@@ -933,9 +2424,10 @@ class NeuvueQueue:
             else:
                 kwargs['metadata'] = {"provenance": utils.update_provenance(task, author, {k: v for k, v in kwargs.items() if k in ['assignee', 'status']})}
 
+        patches = []
         for key, value in kwargs.items():
             if key not in valid_kwargs:
-                print("WARNING: Key {key} does not exist in task attributes.")
+                print(f"WARNING: Key {key} does not exist in task attributes.")
             # Append metadata to existing entries
             if key == 'metadata':
                 old_metadata = task['metadata']
@@ -949,17 +2441,8 @@ class NeuvueQueue:
                 data = {key:value, "overwrite_opened": True}
             else:
                 data = {key:value}
-
-            res = self._try_request( 
-                lambda: requests.patch(
-                    self.url(stri), 
-                    data=json.dumps(data),
-                    headers=self._headers)
-            )
-            try:
-                self._raise_for_status(res)
-            except Exception as e:
-                raise RuntimeError(f"Unable to patch task {task_id}") from e
+            patches.append((stri, data))
+        return patches
 
     def copy_task(self, task_id:str, author:str = None, **kwargs):
         """Copy a task based on its original task ID and replaces any attributes through 
@@ -1007,6 +2490,7 @@ class NeuvueQueue:
         limit: int = None,
         sort: str = "",
         active_default: bool = True,
+        select: List[str] = None,
         **kwargs
     ):
         """
@@ -1018,32 +2502,59 @@ class NeuvueQueue:
             sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
                         sort in descending order.
             active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            select (List[str]: None): Fields to return, projected server-side
             pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+            use_store (bool: True): Answer from the local store, if any, when it can
         Returns:
             pd.DataFrame
         """
 
-        if sieve is None:
-            sieve = {"active": active_default}
-        if "active" not in sieve:
-            sieve["active"] = active_default
+        sieve = self._prepare_sieve(sieve, active_default)
 
         try:
-            depaginated_differ_stacks = self.depaginate(
-                "differstacks", sieve, limit=limit, sort=[sort], **kwargs
+            depaginated_differ_stacks = self._query(
+                "differstacks", sieve, limit=limit, sort=[sort], select=select, **kwargs
             )
         except Exception as e:
             raise RuntimeError("Unable to get differ stacks") from e
         else:
-            res = pd.DataFrame(depaginated_differ_stacks)
+            return self._build_frame("differ_stack", depaginated_differ_stacks, select)
 
-            # If an empty response, then return an empty dataframe:
-            if len(res) == 0:
-                return pd.DataFrame([], columns=self.dtype_columns("differ_stack"))
-
-            res.set_index("_id", inplace=True)
-            return res
+    def iter_differ_stacks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ) -> Iterator:
+        """
+        Iterate over differ stacks as their pages arrive.
 
+        Arguments:
+            sieve (dict): See sieve documentation.
+            limit (int: None): The maximum number of items to return.
+            sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
+                        sort in descending order.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            as_frames (bool: False): Yield one DataFrame per page instead of one dict at a time
+            select (List[str]: None): Fields to return, projected server-side
+            pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+        Returns:
+            Iterator[dict] or Iterator[pd.DataFrame]
+        """
+        sieve = self._prepare_sieve(sieve, active_default)
+        yield from self._iter_results(
+            "differstacks", "differ_stack", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        )
 
     def get_differ_stack(self, differ_stack_id: str) -> dict:
         """
@@ -1055,18 +2566,9 @@ class NeuvueQueue:
             dict
 
         """
-        res = self._try_request(
-            lambda: requests.get(
-                self.url(f"/differstacks/{differ_stack_id}"), 
-                headers=self._headers
-            )
+        return self._get_entity(
+            "differstacks", differ_stack_id, f"Unable to get differ stack {differ_stack_id}"
         )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError(f"Unable to get differ stack {differ_stack_id}") from e
-
-        return res.json()
 
     def post_differ_stack(
         self,
@@ -1091,15 +2593,17 @@ class NeuvueQueue:
             "differ_stack": differ_stack
         }
         res = self._try_request(
-            lambda: requests.post(
-                self.url("/differstacks"), data=json.dumps(differ_stack_object), headers=self._headers
+            lambda: self._session.post(
+                self.url("/differstacks"), data=self._codec.dumps(differ_stack_object), headers=self._headers
             )
         )
         try:
             self._raise_for_status(res)
         except Exception as e:
             raise RuntimeError("Failed to post differ stack") from e
-        return res.json()
+        inserted = self._codec.loads(res.content)
+        self._store_documents("differstacks", [inserted])
+        return inserted
 
 
     """
@@ -1148,15 +2652,17 @@ class NeuvueQueue:
                 agent_task['namespace'] = namespace 
                 
             res = self._try_request(
-                lambda: requests.post(
-                    self.url("/agents"), data=json.dumps(agent_task), headers=self._headers
+                lambda: self._session.post(
+                    self.url("/agents"), data=self._codec.dumps(agent_task), headers=self._headers
                 )
             )
             try:
                 self._raise_for_status(res)
             except Exception as e:
                 raise RuntimeError("Failed to post task") from e
-            return res.json()
+            inserted = self._codec.loads(res.content)
+            self._store_documents("agents", [inserted])
+            return inserted
 
     def get_agent_job(self, agent_job_id: str) -> dict:
         """
@@ -1168,18 +2674,7 @@ class NeuvueQueue:
             dict
 
         """
-        res = self._try_request(
-            lambda: requests.get(
-                self.url(f"/agents/{agent_job_id}"), 
-                headers=self._headers
-            )
-        )
-        try:
-            self._raise_for_status(res)
-        except Exception as e:
-            raise RuntimeError(f"Unable to get agent job {agent_job_id}") from e
-
-        return res.json()
+        return self._get_entity("agents", agent_job_id, f"Unable to get agent job {agent_job_id}")
 
     def get_agent_jobs(
         self, 
@@ -1187,6 +2682,7 @@ class NeuvueQueue:
         limit: int = None, 
         sort: str = "",
         active_default: bool = True,
+        select: List[str] = None,
         **kwargs
     ):
         """
@@ -1198,31 +2694,59 @@ class NeuvueQueue:
             sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
                         sort in descending order.
             active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            select (List[str]: None): Fields to return, projected server-side
             pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+            use_store (bool: True): Answer from the local store, if any, when it can
         Returns:
             pd.DataFrame
         """
 
-        if sieve is None:
-            sieve = {"active": active_default}
-        if "active" not in sieve:
-            sieve["active"] = active_default
+        sieve = self._prepare_sieve(sieve, active_default)
 
         try:
-            depaginated_agent_jobs = self.depaginate(
-                "agents", sieve, limit=limit, sort=[sort], **kwargs
+            depaginated_agent_jobs = self._query(
+                "agents", sieve, limit=limit, sort=[sort], select=select, **kwargs
             )
         except Exception as e:
             raise RuntimeError("Unable to get agent jobs") from e
         else:
-            res = pd.DataFrame(depaginated_agent_jobs)
+            return self._build_frame("agents", depaginated_agent_jobs, select)
 
-            # If an empty response, then return an empty dataframe:
-            if len(res) == 0:
-                return pd.DataFrame([], columns=self.dtype_columns("agents"))
+    def iter_agent_jobs(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ) -> Iterator:
+        """
+        Iterate over agent job outputs as their pages arrive.
 
-            res.set_index("_id", inplace=True)
-            return res
+        Arguments:
+            sieve (dict): See sieve documentation.
+            limit (int: None): The maximum number of items to return.
+            sort (str): attribute to sort by, default is _id. Add `-` to the beginning of the attribute name to
+                        sort in descending order.
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+            as_frames (bool: False): Yield one DataFrame per page instead of one dict at a time
+            select (List[str]: None): Fields to return, projected server-side
+            pageSize (int: 500): Number of entries to return per page
+            max_workers (int: None): Number of pages to fetch concurrently
+            pagination (str: "offset"): "offset" or "cursor"; see `depaginate`
+            stream (bool: False): Parse records off the socket as they arrive; see `depaginate`
+        Returns:
+            Iterator[dict] or Iterator[pd.DataFrame]
+        """
+        sieve = self._prepare_sieve(sieve, active_default)
+        yield from self._iter_results(
+            "agents", "agents", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        )
 
     def delete_agent(self, agent_job_id: str) -> str:
         """
@@ -1236,7 +2760,7 @@ class NeuvueQueue:
 
         """
         res = self._try_request(
-            lambda: requests.delete(
+            lambda: self._session.delete(
                 self.url(f"/agents/{agent_job_id}"), headers=self._headers
             )
         )
@@ -1244,4 +2768,40 @@ class NeuvueQueue:
             self._raise_for_status(res)
         except Exception as e:
             raise RuntimeError(f"Unable to delete task {agent_job_id}") from e
+        self._invalidate_documents("agents", [agent_job_id])
         return agent_job_id
+
+
+    def delete_agents(
+        self,
+        agent_job_ids: Any = None,
+        sieve: dict = None,
+        bulk: bool = False,
+        chunk_size: int = 1000,
+        max_workers: int = 8,
+        active_default: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Delete many agent jobs concurrently.
+
+        Arguments:
+            agent_job_ids (List[str] or pd.Index or pd.DataFrame: None): The agent jobs to
+                delete. A DataFrame from `get_agent_jobs` is deleted by its index.
+            sieve (dict: None): Delete every agent job matching this sieve instead
+            bulk (bool: False): Delete `chunk_size` agent jobs per request. See `delete_tasks`
+            chunk_size (int: 1000): Number of agent jobs per bulk request
+            max_workers (int: 8): Number of requests in flight at once
+            active_default (bool: True): If `active` is not a key included in sieve, set it to this
+
+        Returns:
+            pd.DataFrame: One row per agent job ID with `success` and `error` columns
+
+        """
+        if sieve is not None:
+            sieve = self._prepare_sieve(sieve, active_default)
+        report = self._bulk_delete("agents", agent_job_ids, sieve, bulk, chunk_size, max_workers)
+        self._invalidate_documents("agents", list(report.index))
+        return report
+
+# Imported last: the async client wraps NeuvueQueue for credentials and formatting.
+from .aio import AsyncNeuvueQueue
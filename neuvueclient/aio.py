@@ -0,0 +1,1289 @@
+"""
+# neuvueclient.AsyncNeuvueQueue
+
+An asyncio counterpart to `neuvueclient.NeuvueQueue`. Every method of the
+synchronous client has a coroutine (or async generator) of the same name and
+signature here, so thousands of operations can be multiplexed from a single
+event loop over one pool of kept-alive connections:
+
+```python
+async with AsyncNeuvueQueue("https://queue.neuvue.io", max_concurrency=64) as C:
+    tasks = await asyncio.gather(*[C.get_task(i) for i in task_ids])
+```
+
+Requires `aiohttp` (`pip install neuvueclient[async]`).
+
+Credentials, validation and DataFrame formatting are shared with a wrapped
+`NeuvueQueue` instance, so both clients authenticate from the same sources and
+return identically shaped results.
+"""
+
+import asyncio
+import collections
+import copy
+import json
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import backoff
+import pandas as pd
+
+from . import NeuvueQueue
+from . import arrow
+from . import metrics
+from . import utils
+from .cache import EntityCache
+from .codec import JSONCodec
+from .paging import PageSizer
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class _Response:
+    """
+    A fully read HTTP response, so that it can outlive its aiohttp context.
+    """
+    def __init__(self, status_code: int, content: bytes, headers: Any, codec: JSONCodec) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.codec = codec
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self) -> Any:
+        return self.codec.loads(self.content)
+
+
+class AsyncNeuvueQueue:
+    """
+    neuvueclient.AsyncNeuvueQueue is the asyncio interface to NeuvueQueue.
+
+    See neuvueclient/aio.py for more documentation.
+
+    """
+    def __init__(
+        self,
+        url: str,
+        max_concurrency: int = 32,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        **kwargs
+    ) -> None:
+        """
+        Create a new asynchronous neuvuequeue client.
+
+        Arguments:
+            url (str): The qualified location (including protocol) of the server.
+            max_concurrency (int: 32): Maximum number of requests in flight at once,
+                which is also the size of the connection pool
+            limit_per_host (int: 0): Maximum number of connections per host (0 for no
+                limit beyond `max_concurrency`)
+            keepalive_timeout (float: 15): Seconds an idle connection is kept alive
+            kwargs: Passed on to `NeuvueQueue` (authentication, state server, headers)
+
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncNeuvueQueue requires aiohttp: pip install aiohttp")
+        self._client = NeuvueQueue(url, **kwargs)
+        # Shared with the wrapped client, which emits the events
+        self.metrics = self._client.metrics
+        self._max_concurrency = max_concurrency
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        # Created lazily so that they bind to the running event loop
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._max_concurrency,
+                limit_per_host=self._limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close every pooled connection held by this client.
+        """
+        if self._session is not None:
+            await self._session.close()
+        self._client.close()
+
+    async def __aenter__(self) -> "AsyncNeuvueQueue":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def url(self, suffix: str = "") -> str:
+        """
+        Construct a FQ URL.
+
+        Arguments:
+            suffix (str): The endpoint to access.
+
+        Returns:
+            str: The fully qualified URL.
+
+        """
+        return self._client.url(suffix)
+
+    def dtype_columns(self, datatype: str) -> List[str]:
+        """
+        Get a list of columns for a datatype.
+        """
+        return self._client.dtype_columns(datatype)
+
+    async def _send(self, method: str, url: str, **kwargs) -> _Response:
+        session = self._get_session()
+        if kwargs.get("params"):
+            # aiohttp rejects None values, which requests silently drops
+            kwargs["params"] = {k: v for k, v in kwargs["params"].items() if v is not None}
+        async with self._semaphore:
+            async with session.request(method, url, **kwargs) as resp:
+                return _Response(resp.status, await resp.read(), resp.headers, self._client._codec)
+
+    async def _try_request(self, method: str, suffix: str, headers: dict = None, **kwargs) -> _Response:
+        started = time.perf_counter() if self._client._hooks else None
+        refreshes = retries = 0
+        if self._client._token_expiring():
+            refreshes += await self._refresh_authorization_token(self._client._access_token)
+        token = getattr(self._client, "_access_token", None)
+        res = await self._send(method, self.url(suffix), headers=dict(self._client._headers, **(headers or {})), **kwargs)
+        if self._client._refresh_on(res.status_code):
+            refreshes += await self._refresh_authorization_token(token)
+            res = await self._send(method, self.url(suffix), headers=dict(self._client._headers, **(headers or {})), **kwargs)
+            retries = 1
+        if started is not None:
+            self._client._emit({
+                "kind": "request",
+                "endpoint": metrics.endpoint_of(self.url(suffix)),
+                "method": method,
+                "status": res.status_code,
+                "seconds": time.perf_counter() - started,
+                "bytes_in": len(res.content),
+                "bytes_out": len(kwargs.get("data") or b""),
+                "retries": retries,
+                "refreshes": refreshes,
+            })
+        return res
+
+    async def _refresh_authorization_token(self, stale_token: str) -> bool:
+        """
+        Use the refresh token to generate a new one. Refreshes go through the
+        wrapped client (in a worker thread, since they also write the config
+        file), so that sync and async callers that saw the same stale token
+        share a single refresh.
+
+        Returns:
+            bool: Whether this call refreshed the token
+        """
+        return await asyncio.to_thread(
+            self._client._refresh_authorization_token, self._client._refresh_token, stale_token
+        )
+
+    def _raise_for_status(self, res: _Response) -> None:
+        if res.status_code < 400:
+            return
+        try:
+            body = res.json()
+        except Exception:
+            body = {}
+        if isinstance(body, dict) and "message" in body:
+            raise RuntimeError(body["message"])
+        raise RuntimeError(f"HTTP {res.status_code}")
+
+    async def depaginate(
+        self,
+        datatype: str,
+        sieve: dict,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        max_workers: int = None,
+        pagination: str = "offset",
+        page_bytes: int = None,
+        page_seconds: float = None,
+        **kwargs
+    ) -> list:
+        """
+        Collect every page of results for a query into a single list.
+
+        See `NeuvueQueue.depaginate`; `max_workers` is the number of pages kept in
+        flight at once. Streaming (`stream=True`) is not supported: pages are read
+        whole.
+
+        """
+        depaginated: list = []
+        async for new in self._iter_pages(
+            datatype, sieve, populate=populate, select=select, sort=sort,
+            limit=limit, max_workers=max_workers, pagination=pagination,
+            page_bytes=page_bytes, page_seconds=page_seconds, **kwargs
+        ):
+            depaginated += new
+            if limit and len(depaginated) >= limit:
+                return depaginated[:limit]
+        return depaginated
+
+    async def _iter_pages(
+        self,
+        datatype: str,
+        sieve: dict,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        max_workers: int = None,
+        pagination: str = "offset",
+        page_bytes: int = None,
+        page_seconds: float = None,
+        **kwargs
+    ):
+        if kwargs.pop("stream", False):
+            raise TypeError("AsyncNeuvueQueue does not support stream=True; use NeuvueQueue to stream records")
+        cursor = self._client._check_pagination(pagination, sort, max_workers) == "cursor"
+        if cursor or not max_workers or max_workers <= 1:
+            sizer = PageSizer(
+                kwargs.pop("pageSize", 15000), limit, page_bytes, page_seconds, offset=not cursor
+            )
+            last_id = None
+            while True:
+                page, size = sizer.next_page()
+                started = time.monotonic()
+                res = await self._request_page(
+                    datatype, self._client._after(sieve, last_id) if cursor else sieve, page,
+                    populate=populate, select=select, sort=["_id"] if cursor else sort,
+                    pageSize=size, **kwargs
+                )
+                new = self._decode_page(datatype, res)
+                if not new:
+                    return
+                yield new
+                sizer.observe(len(new), len(res.content), time.monotonic() - started)
+                if sizer.done:
+                    return
+                last_id = new[-1]["_id"] if cursor else None
+
+        if limit:
+            kwargs["pageSize"] = min(kwargs.get("pageSize", 15000), limit)
+        received = 0
+        window = max_workers
+        expected_page_size = kwargs.get("pageSize", 15000)
+        observed = False
+        pending: Deque[asyncio.Future] = collections.deque()
+        next_page = 0
+
+        def fill() -> None:
+            nonlocal next_page
+            while len(pending) < window and (
+                not limit or received + len(pending) * expected_page_size < limit
+            ):
+                pending.append(asyncio.ensure_future(self._get_data_by_page(
+                    datatype, sieve, next_page, populate=populate, select=select, sort=sort, **kwargs
+                )))
+                next_page += 1
+
+        try:
+            fill()
+            while pending:
+                new = await pending.popleft()
+                if not new:
+                    return
+                yield new
+                received += len(new)
+                if limit and received >= limit:
+                    return
+                if observed:
+                    expected_page_size = max(expected_page_size, len(new))
+                else:
+                    expected_page_size, observed = len(new), True
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _get_data_by_page(
+        self,
+        datatype: str,
+        sieve: dict,
+        page: int = 0,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        **kwargs
+    ):
+        return self._decode_page(datatype, await self._request_page(
+            datatype, sieve, page, populate=populate, select=select, sort=sort, **kwargs
+        ))
+
+    def _decode_page(self, datatype: str, res: _Response) -> list:
+        with self._client._timed("decode", datatype, bytes_in=len(res.content)):
+            return res.json()
+
+    async def _request_page(
+        self,
+        datatype: str,
+        sieve: dict,
+        page: int = 0,
+        populate: List[str] = None,
+        select: List[str] = None,
+        sort: List[str] = None,
+        **kwargs
+    ) -> _Response:
+        params = {
+            "p": page,
+            "q": json.dumps(sieve),
+            "populate": ",".join(populate) if populate else None,
+            "select": ",".join(select) if select else None,
+            "sort": ",".join(sort) if sort else None,
+            "pageSize": kwargs.get("pageSize", 15000)
+        }
+        res = await self._try_request("GET", datatype, params=params)
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError(
+                f"Unable to retrieve from page {page} of type {datatype}"
+            ) from e
+        return res
+
+    async def _iter_results(
+        self,
+        endpoint: str,
+        datatype: str,
+        sieve: dict,
+        limit: int = None,
+        as_frames: bool = False,
+        **kwargs
+    ):
+        remaining = limit or None
+        async for page in self._iter_pages(endpoint, sieve, limit=limit, **kwargs):
+            if remaining is not None:
+                page = page[:remaining]
+                remaining -= len(page)
+            if as_frames:
+                yield self._client._build_frame(datatype, page, kwargs.get("select"))
+            else:
+                for record in page:
+                    yield record
+
+    async def _query(
+        self,
+        endpoint: str,
+        sieve: dict,
+        populate: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        select: List[str] = None,
+        use_store: bool = True,
+        **kwargs
+    ) -> List[dict]:
+        store = self._client.local_store if use_store else None
+        # SQLite calls block, so they run off the event loop
+        if store is not None and not populate:
+            local = await asyncio.to_thread(store.query, endpoint, sieve, select=select, sort=sort, limit=limit)
+            if local is not None:
+                return local
+
+        records = await self.depaginate(
+            endpoint, sieve, populate=populate, select=select, sort=sort, limit=limit, **kwargs
+        )
+        if store is not None and not populate and not limit and not select:
+            await asyncio.to_thread(store.load, endpoint, sieve, records)
+        return records
+
+    async def _export(
+        self,
+        endpoint: str,
+        datatype: str,
+        path: str,
+        sieve: dict,
+        partition_by: List[str],
+        convert_states: bool = False,
+        state_workers: int = 8,
+        **kwargs
+    ) -> int:
+        arrow.require_pyarrow()
+        schema = arrow.export_schema(
+            datatype, kwargs.get("select") or self._client.dtype_columns(datatype), kwargs.get("populate")
+        )
+        written = 0
+        async for page in self._iter_pages(endpoint, sieve, **kwargs):
+            if convert_states:
+                page = await self._convert_record_states(page, state_workers)
+            await asyncio.to_thread(self._write_parquet, page, schema, path, partition_by)
+            written += len(page)
+        return written
+
+    @staticmethod
+    def _write_parquet(page: list, schema, path: str, partition_by: List[str]) -> None:
+        table = arrow.records_to_table(page, schema=schema)
+        arrow.write_parquet_dataset(arrow.add_date_column(table), path, list(partition_by or []))
+
+    async def _get(self, suffix: str, error: str, **kwargs) -> Any:
+        res = await self._try_request("GET", suffix, **kwargs)
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError(error) from e
+        return res.json()
+
+    async def _get_entity(self, endpoint: str, _id: str, error: str, populate: str = None) -> dict:
+        """
+        Get a single document through the entity cache. See `NeuvueQueue._get_entity`.
+        """
+        cache = self._client.entity_cache
+        key = (endpoint, _id, populate)
+        entry = None
+        if cache is not None:
+            doc, entry = cache.get(key)
+            if doc is not None:
+                return doc
+        res = await self._try_request(
+            "GET", f"/{endpoint}/{_id}", params={"populate": populate},
+            headers=EntityCache.conditional_headers(entry),
+        )
+        if res.status_code == 304 and entry is not None:
+            return cache.revalidated(key, entry)
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError(error) from e
+        doc = res.json()
+        if cache is not None:
+            cache.put(key, doc, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+        return doc
+
+    async def _write(self, method: str, suffix: str, body: Any, error: str, parse: bool = True) -> Any:
+        res = await self._try_request(method, suffix, data=self._client._codec.dumps(body) if body is not None else None)
+        try:
+            self._raise_for_status(res)
+        except Exception as e:
+            raise RuntimeError(error) from e
+        return res.json() if parse else None
+
+    # State server
+
+    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
+    async def post_to_state_server(self, state: str, public: bool = False) -> str:
+        """
+        Post a JSON state string to the state server. See `utils.post_to_state_server`.
+
+        Returns:
+            str: url string
+
+        """
+        headers = {'content-type': 'application/json'}
+        if not public:
+            if self._client._json_state_server_token:
+                headers['Authorization'] = f"Bearer {self._client._json_state_server_token}"
+            else:
+                print(f"Unable to post private neuroglancer state to {self._client._json_state_server} without `json_state_server_token` defined")
+
+        resp = await self._send("POST", self._client._json_state_server, data=state, headers=headers)
+        if resp.status_code != 200:
+            print(f"Unable to post neuroglancer state to {self._client._json_state_server}. Error code: {resp.status_code}")
+            return
+        if public:
+            url = str(resp.json()['url'])
+        else:
+            url = str(resp.json())
+        if self._client.state_cache is not None:
+            await asyncio.to_thread(self._client.state_cache.put, url, state)
+        return url
+
+    @backoff.on_exception(backoff.expo, Exception, max_tries=3)
+    async def get_from_state_server(self, url: str, public: bool = False) -> str:
+        """
+        Get a JSON state string from the state server. See `utils.get_from_state_server`.
+
+        Returns:
+            str: JSON String, or `url` if it could not be retrieved
+
+        """
+        cache = self._client.state_cache
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, url)
+            if cached is not None:
+                return cached
+
+        headers = {'content-type': 'application/json'}
+        if (not public) and ("bossdb-neuvue-datalake" not in url):
+            if self._client._json_state_server_token:
+                headers['Authorization'] = f"Bearer {self._client._json_state_server_token}"
+            else:
+                print(f"Unable to get private neuroglancer state at {url} without `json_state_server_token` defined")
+
+        resp = await self._send("GET", url, headers=headers)
+        if resp.status_code != 200:
+            print(f"Unable to get neuroglancer state from {url}. Error code: {resp.status_code}")
+            return url
+        state = resp.text.strip()
+        if cache is not None:
+            await asyncio.to_thread(cache.put, url, state)
+        return state
+
+    async def _convert_state(self, state: Any) -> Any:
+        try:
+            return await self.get_from_state_server(state)
+        except:
+            return state
+
+    async def _convert_states(self, states: pd.Series, max_workers: int = 8) -> pd.Series:
+        # Rows frequently share a state, so fetch each distinct URL only once
+        unique = list({s for s in states if isinstance(s, str)})
+        limiter = asyncio.Semaphore(max(max_workers or 1, 1))
+
+        async def convert(state: str) -> Any:
+            async with limiter:
+                return await self._convert_state(state)
+
+        with self._client._timed("states", records=len(unique)):
+            converted = dict(zip(unique, await asyncio.gather(*[convert(s) for s in unique])))
+        return states.map(lambda s: converted.get(s, s) if isinstance(s, str) else s)
+
+    async def _convert_record_states(self, records: List[dict], max_workers: int = 8) -> List[dict]:
+        if not any("ng_state" in r for r in records):
+            return records
+        states = await self._convert_states(pd.Series([r.get("ng_state") for r in records], dtype=object), max_workers)
+        return [dict(r, ng_state=s) if "ng_state" in r else r for r, s in zip(records, states)]
+
+    async def _post_state(self, post_state: bool, ng_state: str) -> str:
+        if not self._client._should_post_state(post_state, ng_state):
+            return None
+        index = self._client.state_upload_index
+        if index is not None:
+            ng_state_url = await asyncio.to_thread(index.get, ng_state, self._client._json_state_server)
+            if ng_state_url:
+                return ng_state_url
+        ng_state_url = await self.post_to_state_server(ng_state)
+        if ng_state_url and index is not None:
+            await asyncio.to_thread(index.put, ng_state, ng_state_url, self._client._json_state_server)
+        return ng_state_url
+
+    """
+    ██████╗  ██████╗ ██╗███╗   ██╗████████╗███████╗
+    ██╔══██╗██╔═══██╗██║████╗  ██║╚══██╔══╝██╔════╝
+    ██████╔╝██║   ██║██║██╔██╗ ██║   ██║   ███████╗
+    ██╔═══╝ ██║   ██║██║██║╚██╗██║   ██║   ╚════██║
+    ██║     ╚██████╔╝██║██║ ╚████║   ██║   ███████║
+    ╚═╝      ╚═════╝ ╚═╝╚═╝  ╚═══╝   ╚═╝   ╚══════╝
+    """
+
+    async def get_point(self, point_id: str) -> dict:
+        """
+        Get a single point by its ID. See `NeuvueQueue.get_point`.
+        """
+        return await self._get_entity("points", point_id, f"Failed to get point {point_id}")
+
+    async def get_points(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
+        **kwargs
+    ) -> Any:
+        """
+        Get a list of points. See `NeuvueQueue.get_points`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        try:
+            depaginated_points = await self._query(
+                "points", sieve, limit=limit, sort=[sort], select=select, **kwargs
+            )
+        except Exception as e:
+            raise RuntimeError("Failed to get points") from e
+        return self._client._build_output("point", depaginated_points, select, output, dtype_backend)
+
+    async def iter_points(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ):
+        """
+        Iterate over points as their pages arrive. See `NeuvueQueue.iter_points`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        async for item in self._iter_results(
+            "points", "point", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        ):
+            yield item
+
+    async def export_points(
+        self,
+        path: str,
+        sieve: dict = None,
+        partition_by: List[str] = ("namespace", "date"),
+        active_default: bool = True,
+        **kwargs
+    ) -> int:
+        """
+        Stream points into a Parquet dataset. See `NeuvueQueue.export_points`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        return await self._export("points", "point", path, sieve, partition_by, **kwargs)
+
+    async def post_point(
+        self,
+        coordinate: List[int],
+        author: str,
+        namespace: str,
+        type: str,
+        resolution: int = 0,
+        metadata: dict = None,
+    ) -> dict:
+        """
+        Post a new point to the database. See `NeuvueQueue.post_point`.
+        """
+        point = {
+            "active": True,
+            "coordinate": coordinate,
+            "author": author,
+            "namespace": namespace,
+            "type": type,
+            "resolution": resolution,
+            "metadata": metadata if metadata is not None else {},
+            "created": utils.date_to_ms(),
+            "__v": 1,
+        }
+        inserted = await self._write("POST", "/points", point, "Unable to post point")
+        await asyncio.to_thread(self._client._store_documents, "points", [inserted])
+        return inserted
+
+    async def post_points(
+        self,
+        coordinates: Any,
+        author: str = None,
+        namespace: str = None,
+        type: str = None,
+        resolution: int = 0,
+        metadata: dict = None,
+        chunk_size: int = 1000,
+        max_workers: int = 4,
+    ) -> pd.Series:
+        """
+        Post many points at once, in concurrent chunks. See `NeuvueQueue.post_points`.
+        """
+        index, points = self._client._new_points(coordinates, author, namespace, type, resolution, metadata)
+        chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+        limiter = asyncio.Semaphore(max(max_workers or 1, 1))
+
+        async def post(chunk: list) -> list:
+            async with limiter:
+                try:
+                    inserted = await self._write("POST", "/points", chunk, "Unable to post points")
+                    if not isinstance(inserted, list) or len(inserted) != len(chunk):
+                        raise RuntimeError(f"Expected {len(chunk)} inserted points in the response")
+                    await asyncio.to_thread(self._client._store_documents, "points", inserted)
+                    return [p.get("_id") for p in inserted]
+                except Exception as e:
+                    print(f"WARNING: Unable to post {len(chunk)} points: {self._client._describe_error(e)}")
+                    return [None] * len(chunk)
+
+        ids = [i for chunk_ids in await asyncio.gather(*[post(c) for c in chunks]) for i in chunk_ids]
+        return pd.Series(ids, index=index, name="_id", dtype=object)
+
+    async def patch_point(self, point_id: str, **kwargs) -> None:
+        """
+        Patch a single point. See `NeuvueQueue.patch_point`.
+        """
+        if not kwargs:
+            print("WARNING: No valid kwargs provided in patch_task().")
+            return
+        try:
+            for key, value in kwargs.items():
+                if key not in ['agents_status']:
+                    print(f"WARNING: Key {key} does not exist in point attributes.")
+                await self._write(
+                    "PATCH", f"/points/{point_id}/{key}", {key: value}, f"Unable to patch point {point_id}", parse=False
+                )
+        finally:
+            await asyncio.to_thread(self._client._invalidate_documents, "points", [point_id])
+
+    """
+    ████████╗ █████╗ ███████╗██╗  ██╗███████╗
+    ╚══██╔══╝██╔══██╗██╔════╝██║ ██╔╝██╔════╝
+       ██║   ███████║███████╗█████╔╝ ███████╗
+       ██║   ██╔══██║╚════██║██╔═██╗ ╚════██║
+       ██║   ██║  ██║███████║██║  ██╗███████║
+       ╚═╝   ╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝╚══════╝
+    """
+
+    async def get_task(self, task_id: str, populate_points: bool = False, convert_states_to_json: bool = False) -> dict:
+        """
+        Get a single task by its ID. See `NeuvueQueue.get_task`.
+        """
+        task = await self._get_entity(
+            "tasks", task_id, f"Unable to get task {task_id}",
+            populate="points" if populate_points else None
+        )
+        if convert_states_to_json:
+            task['ng_state'] = await self.get_from_state_server(task['ng_state'])
+        return task
+
+    async def get_next_task(self, assignee: str, namespace: str) -> dict:
+        """
+        Get the next task for a user. See `NeuvueQueue.get_next_task`.
+        """
+        for status in ["open", "pending"]:
+            query = {
+                "assignee": assignee,
+                "namespace": namespace,
+                "active": True,
+                "status": status,
+            }
+            try:
+                res = await self.depaginate("tasks", query, sort=['-priority'], limit=1)
+            except Exception as e:
+                raise RuntimeError("Unable to get opened tasks") from e
+            if len(res):
+                return res[0]
+        return None
+
+    async def delete_task(self, task_id: str) -> str:
+        """
+        Delete a single task. See `NeuvueQueue.delete_task`.
+        """
+        await self._write("DELETE", f"/tasks/{task_id}", None, f"Unable to delete task {task_id}", parse=False)
+        await asyncio.to_thread(self._client._invalidate_documents, "tasks", [task_id])
+        return task_id
+
+    async def delete_tasks(
+        self,
+        task_ids: Any = None,
+        sieve: dict = None,
+        bulk: bool = False,
+        chunk_size: int = 1000,
+        max_workers: int = 8,
+        active_default: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Delete many tasks concurrently. See `NeuvueQueue.delete_tasks`.
+        """
+        if sieve is not None:
+            sieve = self._client._prepare_time_queries(self._client._prepare_sieve(sieve, active_default))
+        report = await self._bulk_delete("tasks", task_ids, sieve, bulk, chunk_size, max_workers)
+        await asyncio.to_thread(self._client._invalidate_documents, "tasks", list(report.index))
+        return report
+
+    async def _bulk_delete(
+        self,
+        endpoint: str,
+        ids: Any,
+        sieve: dict,
+        bulk: bool,
+        chunk_size: int,
+        max_workers: int,
+    ) -> pd.DataFrame:
+        if ids is None and sieve is None:
+            raise ValueError("Either IDs or a sieve of documents to delete is required.")
+        if ids is None:
+            try:
+                ids = [d["_id"] for d in await self.depaginate(endpoint, sieve, select=["_id"])]
+            except Exception as e:
+                raise RuntimeError(f"Unable to find {endpoint} to delete") from e
+        elif isinstance(ids, pd.DataFrame):
+            ids = ids.index
+        ids = list(ids)
+
+        async def delete_one(_id: str) -> None:
+            await self._write("DELETE", f"/{endpoint}/{_id}", None, f"Unable to delete {endpoint} {_id}", parse=False)
+
+        supported = self._client._bulk_delete_supported
+        if not bulk or supported.get(endpoint) is False or not ids:
+            return await self._run_bulk(delete_one, ids, ids, max_workers)
+
+        async def delete_chunk(chunk: list) -> Tuple[Optional[pd.DataFrame], list]:
+            error = None
+            try:
+                res = await self._try_request(
+                    "DELETE", endpoint, params={"q": json.dumps({"_id": {"$in": chunk}})}
+                )
+                if res.status_code in self._client._unsupported_statuses:
+                    return None, chunk
+                self._raise_for_status(res)
+            except Exception as e:
+                error = f"Unable to delete {len(chunk)} {endpoint}: {e}"
+            if error is None and not self._client._check_bulk_delete(endpoint, chunk, res.content):
+                # Deleted, but without a count: whatever is left is deleted one by one
+                left = [d["_id"] for d in await self.depaginate(endpoint, {"_id": {"$in": chunk}}, select=["_id"])]
+                return self._client._bulk_report(chunk), left
+            return self._client._bulk_report(chunk, error=error), []
+
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        # Probe with the first chunk before sending the rest concurrently
+        results = [await delete_chunk(chunks[0])]
+        if results[0][0] is None:
+            supported[endpoint] = False
+        if supported.get(endpoint):
+            limiter = asyncio.Semaphore(max(max_workers or 1, 1))
+
+            async def delete_rest(chunk: list) -> Tuple[Optional[pd.DataFrame], list]:
+                async with limiter:
+                    return await delete_chunk(chunk)
+
+            results += await asyncio.gather(*[delete_rest(c) for c in chunks[1:]])
+        else:
+            results += [(None, chunk) for chunk in chunks[1:]]
+        left = [_id for _, chunk_left in results for _id in chunk_left]
+        return self._client._chunk_reports(chunks, results, await self._run_bulk(delete_one, left, left, max_workers))
+
+    async def get_tasks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        active_default: bool = True,
+        populate_points: bool = False,
+        sort: str = '',
+        convert_states_to_json: bool = True,
+        state_workers: int = 8,
+        select: List[str] = None,
+        output: str = "pandas",
+        dtype_backend: str = None,
+        **kwargs
+    ) -> Any:
+        """
+        Get a list of tasks. See `NeuvueQueue.get_tasks`.
+
+        States are fetched concurrently, once per distinct URL.
+        """
+        sieve = self._client._prepare_time_queries(self._client._prepare_sieve(sieve, active_default))
+        populate = ["points"] if populate_points else None
+        try:
+            depaginated_tasks = await self._query(
+                "tasks", sieve, populate=populate, limit=limit, sort=[sort], select=select, **kwargs
+            )
+        except Exception as e:
+            raise RuntimeError("Unable to get tasks") from e
+        if convert_states_to_json:
+            depaginated_tasks = await self._convert_record_states(depaginated_tasks, state_workers)
+        return self._client._build_output("task", depaginated_tasks, select, output, dtype_backend)
+
+    async def iter_tasks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        active_default: bool = True,
+        populate_points: bool = False,
+        sort: str = '',
+        convert_states_to_json: bool = True,
+        as_frames: bool = False,
+        state_workers: int = 8,
+        select: List[str] = None,
+        **kwargs
+    ):
+        """
+        Iterate over tasks as their pages arrive. See `NeuvueQueue.iter_tasks`.
+        """
+        sieve = self._client._prepare_time_queries(self._client._prepare_sieve(sieve, active_default))
+        populate = ["points"] if populate_points else None
+        async for item in self._iter_results(
+            "tasks", "task", sieve, limit=limit, as_frames=as_frames, populate=populate, sort=[sort], select=select, **kwargs
+        ):
+            if convert_states_to_json:
+                if as_frames and len(item) and 'ng_state' in item.columns:
+                    item['ng_state'] = await self._convert_states(item['ng_state'], max_workers=state_workers)
+                elif not as_frames and 'ng_state' in item:
+                    item['ng_state'] = await self._convert_state(item['ng_state'])
+            yield item
+
+    async def export_tasks(
+        self,
+        path: str,
+        sieve: dict = None,
+        partition_by: List[str] = ("namespace", "date"),
+        active_default: bool = True,
+        convert_states_to_json: bool = False,
+        state_workers: int = 8,
+        **kwargs
+    ) -> int:
+        """
+        Stream tasks into a Parquet dataset. See `NeuvueQueue.export_tasks`.
+        """
+        sieve = self._client._prepare_time_queries(self._client._prepare_sieve(sieve, active_default))
+        return await self._export(
+            "tasks", "task", path, sieve, partition_by,
+            convert_states=convert_states_to_json, state_workers=state_workers, **kwargs
+        )
+
+    async def post_task(
+        self,
+        author: str,
+        assignee: str,
+        priority: int,
+        namespace: str,
+        instructions: dict,
+        points: List[str] = None,
+        duration: int = 0,
+        metadata: dict = None,
+        seg_id: str = None,
+        ng_state: str = None,
+        version: int = 1,
+        post_state: bool = True,
+        **kwargs
+    ) -> dict:
+        """
+        Post a new task to the database. See `NeuvueQueue.post_task`.
+        """
+        task = self._client._new_task(
+            author, assignee, priority, namespace, instructions, points=points,
+            duration=duration, metadata=metadata, seg_id=seg_id, ng_state=ng_state, version=version
+        )
+        if self._client._should_post_state(post_state, ng_state):
+            ng_state_url = await self._post_state(post_state, ng_state)
+            task['metadata']['base_state'] = ng_state_url
+            if ng_state_url:
+                task['ng_state'] = ng_state_url
+        inserted = await self._write("POST", "/tasks", task, "Failed to post task")
+        await asyncio.to_thread(self._client._store_documents, "tasks", [inserted])
+        return inserted
+
+    async def post_task_broadcast(
+        self,
+        author: str,
+        assignees: List[str],
+        priority: int,
+        namespace: str,
+        instructions: dict,
+        points: List[str] = None,
+        duration: int = 0,
+        metadata: dict = None,
+        seg_id: str = None,
+        ng_state: str = None,
+        post_state: bool = True
+    ) -> List[dict]:
+        """
+        Post a new task for each of a set of assignees. See `NeuvueQueue.post_task_broadcast`.
+        """
+        tasks = self._client._new_broadcast_tasks(
+            author, assignees, priority, namespace, instructions, points=points,
+            duration=duration, metadata=metadata, seg_id=seg_id, ng_state=ng_state, post_state=post_state
+        )
+        ng_state_url = await self._post_state(post_state, ng_state)
+        if ng_state_url:
+            for task in tasks:
+                task["ng_state"] = ng_state_url
+        inserted = await self._write("POST", "/tasks", tasks, "Failed to post task")
+        await asyncio.to_thread(
+            self._client._store_documents, "tasks", inserted if isinstance(inserted, list) else [inserted]
+        )
+        return inserted
+
+    async def patch_task(
+        self,
+        task_id: str,
+        author: str = None,
+        overwrite_opened: bool = True,
+        task: dict = None,
+        combined: bool = False,
+        **kwargs
+    ) -> None:
+        """
+        Patch a single task. See `NeuvueQueue.patch_task`.
+
+        Without `combined`, the fields are patched one at a time once provenance
+        has been recorded.
+        """
+        if not kwargs:
+            print("WARNING: No valid kwargs provided in patch_task().")
+            return
+        task = await self._task_for_patch(task_id, kwargs, task)
+        patches = self._client._task_patches(task_id, task, author, overwrite_opened, kwargs)
+        try:
+            await self._send_task_patches(task_id, patches, combined)
+        finally:
+            await asyncio.to_thread(self._client._invalidate_documents, "tasks", [task_id])
+
+    async def _send_task_patches(self, task_id: str, patches: List[Tuple[str, dict]], combined: bool) -> None:
+        if combined and self._client._combined_patch_supported is not False:
+            body = {}
+            for _, data in patches:
+                body.update(data)
+            res = await self._try_request("PATCH", f"/tasks/{task_id}", data=self._client._codec.dumps(body))
+            if res.status_code not in self._client._unsupported_statuses:
+                try:
+                    self._raise_for_status(res)
+                except Exception as e:
+                    raise RuntimeError(f"Unable to patch task {task_id}") from e
+                self._client._combined_patch_supported = True
+                return
+
+        # In order, like the sync client, so that status, opened and closed land predictably
+        for stri, data in patches:
+            await self._write("PATCH", stri, data, f"Unable to patch task {task_id}", parse=False)
+        if combined and self._client._combined_patch_supported is None:
+            self._client._combined_patch_supported = False
+
+    async def patch_tasks(
+        self,
+        tasks: Any,
+        author: str = None,
+        overwrite_opened: bool = True,
+        combined: bool = False,
+        max_workers: int = 8,
+        **kwargs
+    ) -> pd.DataFrame:
+        """
+        Apply the same patch to many tasks concurrently. See `NeuvueQueue.patch_tasks`.
+        """
+        if isinstance(tasks, pd.DataFrame):
+            items = [(task_id, row) for task_id, row in tasks.iterrows()]
+        else:
+            items = [(task_id, None) for task_id in tasks]
+
+        async def patch(item):
+            task_id, task = item
+            await self.patch_task(
+                task_id, author=author, overwrite_opened=overwrite_opened, task=task,
+                combined=combined, **copy.deepcopy(kwargs)
+            )
+
+        return await self._run_bulk(patch, items, [task_id for task_id, _ in items], max_workers)
+
+    async def _run_bulk(self, func, items: list, ids: list, max_workers: int) -> pd.DataFrame:
+        limiter = asyncio.Semaphore(max(max_workers or 1, 1))
+
+        async def run(item):
+            async with limiter:
+                try:
+                    await func(item)
+                except Exception as e:
+                    return False, self._client._describe_error(e)
+            return True, None
+
+        results = await asyncio.gather(*[run(item) for item in items])
+        return pd.DataFrame(
+            list(results), index=pd.Index(ids, name="_id"), columns=["success", "error"]
+        )
+
+    async def _task_for_patch(self, task_id: str, kwargs: dict, task: Any = None) -> dict:
+        fields = self._client._patch_fields(kwargs)
+        if task is not None:
+            task = self._client._task_record(task)
+            if fields.issubset(task.keys()):
+                return task
+        if not fields:
+            return {"_id": task_id, "metadata": {}}
+
+        try:
+            found = await self.depaginate("tasks", {"_id": task_id}, select=sorted(fields), limit=1, pageSize=1)
+        except Exception:
+            found = []
+        task = found[0] if found else await self.get_task(task_id)
+        task.setdefault("metadata", {})
+        return task
+
+    async def copy_task(self, task_id: str, author: str = None, **kwargs) -> dict:
+        """
+        Copy a task, replacing any attributes passed through kwargs. See `NeuvueQueue.copy_task`.
+        """
+        if kwargs.get('namespace'):
+            raise ValueError("Cannot copy a task and replace its namespace.")
+
+        task = await self.get_task(task_id)
+        task.update(kwargs)
+        if author:
+            task.update({"author": author})
+        else:
+            print("WARNING: No author has been designated in copy_task() kwargs. Original author of task will be used to record this change.")
+
+        task['metadata']['provenance'] = utils.create_new_provenance(task, copy=True)
+        return await self.post_task(**task, post_state=False)
+
+    '''
+    ██████╗ ██╗███████╗███████╗███████╗██████╗     ███████╗████████╗ █████╗  ██████╗██╗  ██╗███████╗
+    ██╔══██╗██║██╔════╝██╔════╝██╔════╝██╔══██╗    ██╔════╝╚══██╔══╝██╔══██╗██╔════╝██║ ██╔╝██╔════╝
+    ██║  ██║██║█████╗  █████╗  █████╗  ██████╔╝    ███████╗   ██║   ███████║██║     █████╔╝ ███████╗
+    ██║  ██║██║██╔══╝  ██╔══╝  ██╔══╝  ██╔══██╗    ╚════██║   ██║   ██╔══██║██║     ██╔═██╗ ╚════██║
+    ██████╔╝██║██║     ██║     ███████╗██║  ██║    ███████║   ██║   ██║  ██║╚██████╗██║  ██╗███████║
+    ╚═════╝ ╚═╝╚═╝     ╚═╝     ╚══════╝╚═╝  ╚═╝    ╚══════╝   ╚═╝   ╚═╝  ╚═╝ ╚═════╝╚═╝  ╚═╝╚══════╝
+    '''
+
+    async def get_differ_stacks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        select: List[str] = None,
+        **kwargs
+    ) -> pd.DataFrame:
+        """
+        Get all differ stacks. See `NeuvueQueue.get_differ_stacks`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        try:
+            depaginated_differ_stacks = await self._query(
+                "differstacks", sieve, limit=limit, sort=[sort], select=select, **kwargs
+            )
+        except Exception as e:
+            raise RuntimeError("Unable to get differ stacks") from e
+        return self._client._build_frame("differ_stack", depaginated_differ_stacks, select)
+
+    async def iter_differ_stacks(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ):
+        """
+        Iterate over differ stacks as their pages arrive. See `NeuvueQueue.iter_differ_stacks`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        async for item in self._iter_results(
+            "differstacks", "differ_stack", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        ):
+            yield item
+
+    async def get_differ_stack(self, differ_stack_id: str) -> dict:
+        """
+        Get a single differ stack by its ID. See `NeuvueQueue.get_differ_stack`.
+        """
+        return await self._get_entity(
+            "differstacks", differ_stack_id, f"Unable to get differ stack {differ_stack_id}"
+        )
+
+    async def post_differ_stack(self, task_id: str, differ_stack: List[Dict]) -> dict:
+        """
+        Post a new differ stack to the database. See `NeuvueQueue.post_differ_stack`.
+        """
+        differ_stack_object = {
+            "active": True,
+            "task_id": task_id,
+            "differ_stack": differ_stack
+        }
+        inserted = await self._write("POST", "/differstacks", differ_stack_object, "Failed to post differ stack")
+        await asyncio.to_thread(self._client._store_documents, "differstacks", [inserted])
+        return inserted
+
+    """
+    █████╗  ██████╗ ███████╗███╗   ██╗████████╗███████╗
+    ██╔══██╗██╔════╝ ██╔════╝████╗  ██║╚══██╔══╝██╔════╝
+    ███████║██║  ███╗█████╗  ██╔██╗ ██║   ██║   ███████╗
+    ██╔══██║██║   ██║██╔══╝  ██║╚██╗██║   ██║   ╚════██║
+    ██║  ██║╚██████╔╝███████╗██║ ╚████║   ██║   ███████║
+    ╚═╝  ╚═╝ ╚═════╝ ╚══════╝╚═╝  ╚═══╝   ╚═╝   ╚══════╝
+    """
+
+    async def post_agent(
+        self,
+        seg_id: str,
+        nucleus_id: str,
+        endpoint: tuple,
+        merges: dict,
+        metadata: dict = {},
+        namespace: str = None
+    ) -> dict:
+        """
+        Post a new agent job to the database. See `NeuvueQueue.post_agent`.
+        """
+        agent_task = {
+            "active": True,
+            "seg_id": seg_id,
+            "nucleus_id": nucleus_id,
+            "endpoint": endpoint,
+            "merges": merges,
+            "metadata": metadata,
+            "created": utils.date_to_ms()
+        }
+        if namespace:
+            agent_task['namespace'] = namespace
+        inserted = await self._write("POST", "/agents", agent_task, "Failed to post task")
+        await asyncio.to_thread(self._client._store_documents, "agents", [inserted])
+        return inserted
+
+    async def get_agent_job(self, agent_job_id: str) -> dict:
+        """
+        Get a single agents_job by its ID. See `NeuvueQueue.get_agent_job`.
+        """
+        return await self._get_entity("agents", agent_job_id, f"Unable to get agent job {agent_job_id}")
+
+    async def get_agent_jobs(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        select: List[str] = None,
+        **kwargs
+    ) -> pd.DataFrame:
+        """
+        Get several agent job outputs. See `NeuvueQueue.get_agent_jobs`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        try:
+            depaginated_agent_jobs = await self._query(
+                "agents", sieve, limit=limit, sort=[sort], select=select, **kwargs
+            )
+        except Exception as e:
+            raise RuntimeError("Unable to get agent jobs") from e
+        return self._client._build_frame("agents", depaginated_agent_jobs, select)
+
+    async def iter_agent_jobs(
+        self,
+        sieve: dict = None,
+        limit: int = None,
+        sort: str = "",
+        active_default: bool = True,
+        as_frames: bool = False,
+        select: List[str] = None,
+        **kwargs
+    ):
+        """
+        Iterate over agent job outputs as their pages arrive. See `NeuvueQueue.iter_agent_jobs`.
+        """
+        sieve = self._client._prepare_sieve(sieve, active_default)
+        async for item in self._iter_results(
+            "agents", "agents", sieve, limit=limit, as_frames=as_frames, sort=[sort], select=select, **kwargs
+        ):
+            yield item
+
+    async def delete_agent(self, agent_job_id: str) -> str:
+        """
+        Delete a single agent job. See `NeuvueQueue.delete_agent`.
+        """
+        await self._write("DELETE", f"/agents/{agent_job_id}", None, f"Unable to delete task {agent_job_id}", parse=False)
+        await asyncio.to_thread(self._client._invalidate_documents, "agents", [agent_job_id])
+        return agent_job_id
+
+    async def delete_agents(
+        self,
+        agent_job_ids: Any = None,
+        sieve: dict = None,
+        bulk: bool = False,
+        chunk_size: int = 1000,
+        max_workers: int = 8,
+        active_default: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Delete many agent jobs concurrently. See `NeuvueQueue.delete_agents`.
+        """
+        if sieve is not None:
+            sieve = self._client._prepare_sieve(sieve, active_default)
+        report = await self._bulk_delete("agents", agent_job_ids, sieve, bulk, chunk_size, max_workers)
+        await asyncio.to_thread(self._client._invalidate_documents, "agents", list(report.index))
+        return report
@@ -0,0 +1,190 @@
+"""
+# neuvueclient.arrow
+
+Columnar output for query results, for handing them to Arrow-native tools
+(Spark, DuckDB, Polars) without re-serializing pandas objects row by row.
+
+`records_to_table` turns a page of records into a `pyarrow.Table`. Nested
+fields such as `coordinate`, `points` and `metadata` become list and struct
+columns; a field whose values Arrow cannot unify into one type (e.g.
+`metadata` dicts whose values change type from task to task) is stored as
+JSON text instead. Timestamps in milliseconds become `timestamp[ms]` columns.
+
+`write_parquet_dataset` appends tables to a (Hive-partitioned) Parquet
+dataset, so that `NeuvueQueue.export_tasks` can stream one page at a time.
+Every page of an export is built with the same `export_schema`, with
+explicit types for the datatype's columns and JSON text for free-form
+fields (`metadata`, `instructions`, populated references), so that the
+files of one dataset can be read back together. Fields outside the
+datatype's columns are not exported unless selected.
+
+Requires `pyarrow` (`pip install neuvueclient[arrow]`).
+"""
+
+import json
+from typing import Dict, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Arrow output requires pyarrow: pip install pyarrow")
+
+
+def _field_types() -> Dict[str, Dict[str, "pa.DataType"]]:
+    """
+    Arrow types of the exported fields of each datatype. Fields not listed
+    (including free-form dicts) are stored as JSON text.
+    """
+    timestamp = pa.timestamp("ms")
+    strings = pa.list_(pa.string())
+    return {
+        "task": {
+            "_id": pa.string(),
+            "__v": pa.int64(),
+            "active": pa.bool_(),
+            "assignee": pa.string(),
+            "author": pa.string(),
+            "closed": timestamp,
+            "created": timestamp,
+            "namespace": pa.string(),
+            "opened": timestamp,
+            "priority": pa.int64(),
+            "duration": pa.float64(),
+            "points": strings,
+            "status": pa.string(),
+            "seg_id": pa.string(),
+            "tags": strings,
+            "ng_state": pa.string(),
+        },
+        "point": {
+            "_id": pa.string(),
+            "__v": pa.int64(),
+            "active": pa.bool_(),
+            "author": pa.string(),
+            "coordinate": pa.list_(pa.int64()),
+            "resolution": pa.int64(),
+            "created": timestamp,
+            "namespace": pa.string(),
+            "submitted": timestamp,
+            "type": pa.string(),
+            "agents_status": pa.string(),
+        },
+    }
+
+
+def export_schema(datatype: str, columns: List[str], json_columns: List[str] = None) -> "pa.Schema":
+    """
+    Build the schema shared by every page of an export.
+
+    Arguments:
+        datatype (str): "task" or "point"
+        columns (List[str]): Fields to export, e.g. `NeuvueQueue.dtype_columns(datatype)`
+        json_columns (List[str]: None): Fields to store as JSON text regardless of
+            their usual type (e.g. populated references)
+
+    Returns:
+        pyarrow.Schema
+
+    """
+    require_pyarrow()
+    types = _field_types().get(datatype, {})
+    json_columns = {json_columns} if isinstance(json_columns, str) else set(json_columns or [])
+    columns = ["_id"] + [c for c in columns if c != "_id"]
+    return pa.schema([
+        (c, pa.string() if c in json_columns else types.get(c, pa.string())) for c in columns
+    ])
+
+
+def _coerce(value, type: "pa.DataType"):
+    if value is None:
+        return None
+    if pa.types.is_string(type) and not isinstance(value, str):
+        return json.dumps(value)
+    if pa.types.is_timestamp(type):
+        return int(value)
+    return value
+
+
+def _column(values: list) -> "pa.Array":
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.array([None if v is None else json.dumps(v) for v in values], type=pa.string())
+
+
+def records_to_table(
+    records: List[dict],
+    datetime_columns: List[str] = None,
+    columns: List[str] = None,
+    schema: "pa.Schema" = None,
+) -> "pa.Table":
+    """
+    Build an Arrow table from query results.
+
+    Arguments:
+        records (List[dict]): Documents, as returned by `depaginate`
+        datetime_columns (List[str]: None): Fields holding timestamps in milliseconds
+        columns (List[str]: None): Columns for an empty table
+        schema (pyarrow.Schema: None): Use this schema (see `export_schema`) instead
+            of inferring one from the records
+
+    Returns:
+        pyarrow.Table
+
+    """
+    require_pyarrow()
+    if schema is not None:
+        return pa.Table.from_pylist(
+            [{f.name: _coerce(record.get(f.name), f.type) for f in schema} for record in records],
+            schema=schema,
+        )
+    keys: dict = {}
+    for record in records:
+        keys.update(dict.fromkeys(record))
+    if not records:
+        keys = dict.fromkeys(columns or [])
+
+    arrays = {}
+    for key in keys:
+        values = [record.get(key) for record in records]
+        if key in (datetime_columns or []):
+            arrays[key] = pa.array(
+                [None if v is None else int(v) for v in values], type=pa.int64()
+            ).cast(pa.timestamp("ms"))
+        else:
+            arrays[key] = _column(values) if records else pa.array([], type=pa.null())
+    return pa.table(arrays)
+
+
+def add_date_column(table: "pa.Table", source: str = "created", name: str = "date") -> "pa.Table":
+    """
+    Add a `YYYY-MM-DD` string column derived from a timestamp column, to
+    partition exports by day.
+    """
+    require_pyarrow()
+    if source not in table.column_names or name in table.column_names:
+        return table
+    dates = table.column(source).cast(pa.date32()).cast(pa.string())
+    return table.append_column(name, dates)
+
+
+def write_parquet_dataset(table: "pa.Table", path: str, partition_by: List[str] = None) -> None:
+    """
+    Append a table to a Parquet dataset.
+
+    Arguments:
+        table (pyarrow.Table): Rows to write
+        path (str): Root directory of the dataset
+        partition_by (List[str]: None): Columns to partition the dataset by
+
+    """
+    require_pyarrow()
+    partition_by = [c for c in partition_by or [] if c in table.column_names]
+    pq.write_to_dataset(table, root_path=path, partition_cols=partition_by or None)
@@ -0,0 +1,460 @@
+"""
+# neuvueclient.cache
+
+Local caches that let the client skip network round trips.
+
+States posted to a neuroglancer state server are immutable: the document
+behind a state URL never changes once it has been posted. `StateCache` keeps
+recently used states in memory and, optionally, on disk so that repeated
+`get_task(convert_states_to_json=True)` and `get_tasks` calls do not download
+them again. For the same reason, `StateUploadIndex` remembers the URL that a
+given state was uploaded to, so that posting identical content again can
+reuse it instead of uploading it a second time.
+
+Documents, unlike states, do change. `EntityCache` serves repeated
+`get_task`/`get_point`/`get_differ_stack`/`get_agent_job` calls from memory
+for `ttl` seconds, then revalidates them with `If-None-Match` (or
+`If-Modified-Since`) when the server sent an `ETag` (or `Last-Modified`),
+so that an unchanged document costs a `304 Not Modified` instead of a
+download. The client drops documents it patches or deletes itself; changes
+made by others are seen once `ttl` has passed.
+"""
+
+import collections
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+
+class StateCache:
+    """
+    A size-capped, two-level (memory and disk) LRU cache of neuroglancer
+    states, keyed by state URL.
+
+    """
+    def __init__(
+        self,
+        directory: Optional[str] = "~/.neuvuequeue/state_cache",
+        max_disk_bytes: int = 1024 ** 3,
+        max_memory_bytes: int = 128 * 1024 ** 2,
+    ) -> None:
+        """
+        Create a new state cache.
+
+        Arguments:
+            directory (str: "~/.neuvuequeue/state_cache"): Where to persist states.
+                Pass None to keep them in memory only.
+            max_disk_bytes (int: 1 GiB): Size above which the least recently used
+                states are evicted from disk
+            max_memory_bytes (int: 128 MiB): Size above which the least recently
+                used states are evicted from memory
+
+        """
+        self.directory = os.path.expanduser(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        # Serializes replacing files on disk with the size accounting and eviction they cause
+        self._disk_lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, self._key(url) + ".json")
+
+    def _disk_entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        Get a cached state.
+
+        Arguments:
+            url (str): The state URL
+
+        Returns:
+            str: The state, or None if it is not cached
+
+        """
+        with self._lock:
+            if url in self._memory:
+                self._memory.move_to_end(url)
+                self.hits += 1
+                return self._memory[url]
+
+        state = None
+        if self.directory:
+            path = self._path(url)
+            try:
+                with open(path, "r") as f:
+                    state = f.read()
+                # Bump the modification time so that disk eviction is LRU
+                os.utime(path)
+            except OSError:
+                state = None
+
+        with self._lock:
+            if state is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(url, state)
+        return state
+
+    def put(self, url: str, state: str) -> None:
+        """
+        Cache a state.
+
+        Arguments:
+            url (str): The state URL
+            state (str): The state behind `url`
+
+        """
+        with self._lock:
+            self._remember(url, state)
+        if not self.directory:
+            return
+
+        path = self._path(url)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(state)
+            size = os.path.getsize(tmp)
+            with self._disk_lock:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp, path)
+                self._disk_bytes += size - previous
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _remember(self, url: str, state: str) -> None:
+        if url in self._memory:
+            self._memory_bytes -= len(self._memory.pop(url))
+        if len(state) > self.max_memory_bytes:
+            return
+        self._memory[url] = state
+        self._memory_bytes += len(state)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self) -> None:
+        for _, name, size in sorted(self._disk_entries()):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            self._disk_bytes -= size
+
+    def clear(self) -> None:
+        """
+        Remove every cached state from memory and disk.
+        """
+        with self._lock, self._disk_lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.directory:
+                for _, name, _ in self._disk_entries():
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss counters and current cache sizes.
+
+        Returns:
+            dict
+
+        """
+        with self._lock, self._disk_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+class StateUploadIndex:
+    """
+    A persistent index from the content of an uploaded state to the URL it
+    was stored at, so that identical states are only uploaded once.
+
+    States are hashed after canonicalizing their JSON, so formatting and key
+    order do not defeat deduplication.
+
+    """
+    def __init__(self, path: Optional[str] = "~/.neuvuequeue/state_uploads.sqlite", ttl: float = None) -> None:
+        """
+        Create or open an upload index.
+
+        Arguments:
+            path (str: "~/.neuvuequeue/state_uploads.sqlite"): Database file. Pass None
+                to keep the index in memory only.
+            ttl (float: None): Seconds after which an upload is no longer reused
+
+        """
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path or ":memory:"
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS uploads "
+                "(digest TEXT PRIMARY KEY, url TEXT NOT NULL, uploaded REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def digest(state: str, server: str = "") -> str:
+        """
+        Hash a state (and the server it is uploaded to) by its canonical JSON.
+
+        Arguments:
+            state (str): JSON state string
+            server (str): The state server the state is uploaded to
+
+        Returns:
+            str: hex digest
+
+        """
+        try:
+            canonical = json.dumps(json.loads(state), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            canonical = state
+        return hashlib.sha256((server + "\n" + canonical).encode("utf-8")).hexdigest()
+
+    def get(self, state: str, server: str = "") -> Optional[str]:
+        """
+        Get the URL a previous upload of identical content was stored at.
+
+        Arguments:
+            state (str): JSON state string
+            server (str): The state server the state is uploaded to
+
+        Returns:
+            str: The URL, or None if there is no (unexpired) upload
+
+        """
+        digest = self.digest(state, server)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, uploaded FROM uploads WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and time.time() - row[1] > self.ttl:
+                with self._db:
+                    self._db.execute("DELETE FROM uploads WHERE digest = ?", (digest,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, state: str, url: str, server: str = "") -> None:
+        """
+        Record that a state was uploaded to `url`.
+
+        Arguments:
+            state (str): JSON state string
+            url (str): The URL returned by the state server
+            server (str): The state server the state was uploaded to
+
+        """
+        digest = self.digest(state, server)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads (digest, url, uploaded) VALUES (?, ?, ?)",
+                (digest, url, time.time()),
+            )
+
+    def clear(self) -> None:
+        """
+        Forget every recorded upload.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM uploads")
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss counters and the number of recorded uploads.
+
+        Returns:
+            dict
+
+        """
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM uploads").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+class EntityCache:
+    """
+    A bounded, in-memory LRU cache of single documents with a time to live,
+    keyed by (endpoint, ID, variant), e.g. ("tasks", task_id, "points").
+
+    """
+    _Entry = collections.namedtuple("_Entry", "doc etag last_modified fetched")
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60) -> None:
+        """
+        Create a new entity cache.
+
+        Arguments:
+            max_entries (int: 10000): Number of documents above which the least
+                recently used are evicted
+            ttl (float: 60): Seconds for which a document is served without contacting
+                the server. 0 revalidates every read (when the server supports it).
+
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries: "collections.OrderedDict[tuple, EntityCache._Entry]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Tuple[Optional[dict], Optional["EntityCache._Entry"]]:
+        """
+        Look up a document.
+
+        Arguments:
+            key (tuple): (endpoint, ID, variant)
+
+        Returns:
+            Tuple[dict, _Entry]: A copy of the document if it is fresh (else None), and
+                the entry to revalidate if it is stale but has validators (else None)
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.fetched < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry.doc), entry
+            self.misses += 1
+            if entry is not None and not (entry.etag or entry.last_modified):
+                del self._entries[key]
+                entry = None
+        return None, entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional["EntityCache._Entry"]) -> dict:
+        """
+        Headers asking the server to answer 304 if `entry` is still current.
+        """
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidated(self, key: tuple, entry: "EntityCache._Entry") -> dict:
+        """
+        Record that the server confirmed `entry` is current (a 304).
+
+        Returns:
+            dict: A copy of the document
+
+        """
+        with self._lock:
+            self.revalidations += 1
+            self._store(key, entry._replace(fetched=time.time()))
+        return copy.deepcopy(entry.doc)
+
+    def put(self, key: tuple, doc: Any, etag: str = None, last_modified: str = None) -> None:
+        """
+        Store a document downloaded from the server, with its validators.
+        """
+        with self._lock:
+            self._store(key, self._Entry(copy.deepcopy(doc), etag, last_modified, time.time()))
+
+    def _store(self, key: tuple, entry: "EntityCache._Entry") -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint: str, ids: List[str] = None) -> None:
+        """
+        Forget documents (in every variant) that were changed on the server.
+
+        Arguments:
+            endpoint (str): The collection, e.g. "tasks"
+            ids (List[str]: None): Documents to drop. None drops the whole collection.
+
+        """
+        ids = None if ids is None else set(ids)
+        with self._lock:
+            for key in [
+                k for k in self._entries if k[0] == endpoint and (ids is None or k[1] in ids)
+            ]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+        Remove every document.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss/revalidation counters and the number of cached documents.
+
+        Returns:
+            dict
+
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,156 @@
+"""
+# neuvueclient.codec
+
+The JSON encoder/decoder used for request bodies and responses.
+
+Decoding pages of thousands of tasks (with embedded states) dominates the
+cost of large queries, so the fastest available library is used: `msgspec`,
+then `orjson`, then the standard library (see benchmarks/bench_codec.py).
+Responses are decoded straight from their bytes, without first building a
+text copy.
+
+```python
+C = NeuvueQueue(url, json_codec="json")  # force the standard library
+```
+
+Every codec encodes and decodes the same documents to the same values, and
+refuses the same ones, as the standard library does. Before a document is
+encoded with a fast library it is scanned once: only documents made of
+plain dicts, lists, tuples, strings, integers, booleans, None and finite
+floats are handed to it, and anything else (NaN and Infinity, which the
+fast libraries write as `null`; datetimes, dataclasses, numpy values and
+subclasses, which they would encode differently) goes to the standard
+library, which writes `NaN` and `Infinity` and raises TypeError for the
+rest. Hashes of canonical JSON (see `StateUploadIndex`) always use the
+standard library so that they do not depend on which codec is installed.
+(One difference remains: `orjson` decodes integers beyond 64 bits to
+floats.)
+"""
+
+import json
+import math
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _plain(obj: Any) -> bool:
+    """
+    Whether a document holds only values every codec encodes alike.
+    """
+    isfinite = math.isfinite
+    stack = [obj]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        value = pop()
+        kind = type(value)
+        if kind is str or kind is int or kind is bool or value is None:
+            continue
+        if kind is dict:
+            # Keys the fast libraries cannot encode like the standard library make them raise TypeError
+            extend(value.values())
+        elif kind is list or kind is tuple:
+            extend(value)
+        elif kind is float:
+            if not isfinite(value):
+                return False
+        else:
+            return False
+    return True
+
+
+class JSONCodec:
+    """
+    The standard library codec, and the interface of the others.
+
+    """
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        """
+        Encode a document as UTF-8 JSON bytes.
+        """
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Decode a document from JSON bytes or text.
+        """
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        if not _plain(obj):
+            return super().dumps(obj)
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Integers beyond 64 bits and non-string keys
+            return super().dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return super().loads(data)
+
+
+class MsgspecCodec(JSONCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        if not _plain(obj):
+            return super().dumps(obj)
+        try:
+            return self._encoder.encode(obj)
+        except TypeError:
+            # Keys that are neither strings nor numbers
+            return super().dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError:
+            return super().loads(data)
+
+
+CODECS = {"msgspec": MsgspecCodec, "orjson": OrjsonCodec, "json": JSONCodec}
+_LIBRARIES = {"msgspec": msgspec, "orjson": orjson, "json": json}
+
+
+def get_codec(codec: Union[str, JSONCodec] = "auto") -> JSONCodec:
+    """
+    Get a JSON codec by name.
+
+    Arguments:
+        codec (str or JSONCodec: "auto"): "msgspec", "orjson", "json", "auto" for the
+            fastest one installed, or a codec instance to use as is
+
+    Returns:
+        JSONCodec
+
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec == "auto":
+        codec = next(name for name in CODECS if _LIBRARIES[name] is not None)
+    if codec not in CODECS:
+        raise ValueError(f"Unknown JSON codec [{codec}]; expected one of {list(CODECS)} or 'auto'.")
+    if _LIBRARIES[codec] is None:
+        raise ImportError(f"The {codec} JSON codec requires {codec}: pip install {codec}")
+    return CODECS[codec]()
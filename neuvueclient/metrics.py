@@ -0,0 +1,200 @@
+"""
+# neuvueclient.metrics
+
+Timing events emitted by `NeuvueQueue`, and two consumers for them.
+
+A hook is any callable taking one event dict. Pass hooks as `on_event`, or
+pass `metrics=True` to collect events in a `MetricsAggregator`:
+
+```python
+C = NeuvueQueue(url, metrics=True)
+C.get_tasks({"namespace": "split"})
+C.metrics.summary()      # percentiles per (kind, endpoint, method)
+C.metrics.prometheus()   # Prometheus text exposition format
+```
+
+Every event has a `kind` and `seconds`:
+
+- `request`: one HTTP request (including any token refresh and retry), with
+  `endpoint` (IDs replaced by `{id}`), `method`, `status`, `elapsed` (seconds
+  until the response headers arrived), `bytes_in` (None for a streamed body
+  sent without a Content-Length), `bytes_out`, `retries` and `refreshes`
+- `refresh`: an access token refresh
+- `decode`: decoding a page of results, with `endpoint` and `bytes_in`
+  (streamed pages are decoded while they download, and emit no `decode` event)
+- `states`: resolving distinct `ng_state` URLs, with `records`
+- `frame`: building a DataFrame (or Arrow table), with `endpoint` and `records`
+
+With no hooks installed nothing is timed, so instrumentation costs nothing.
+"""
+
+import collections
+import re
+import threading
+import urllib.parse
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F]{24}|\d+)$")
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+def endpoint_of(url: str) -> str:
+    """
+    Reduce a request URL to its path, with document IDs replaced by `{id}`, so
+    that requests for different documents are aggregated together.
+    """
+    path = urllib.parse.urlsplit(url).path
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class MetricsAggregator:
+    """
+    An in-memory aggregator of events, keyed by (kind, endpoint, method).
+
+    Percentiles are computed over the most recent `window` samples of each key;
+    counts, bytes, retries and refreshes are totals since the last `reset`.
+
+    """
+    def __init__(self, window: int = 10000) -> None:
+        """
+        Create a new aggregator.
+
+        Arguments:
+            window (int: 10000): Number of recent samples per key to take
+                percentiles over
+
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str, str], Deque[float]] = {}
+        self._totals: Dict[Tuple[str, str, str], collections.Counter] = {}
+
+    def __call__(self, event: dict) -> None:
+        key = (event["kind"], event.get("endpoint") or "", event.get("method") or "")
+        with self._lock:
+            if key not in self._samples:
+                self._samples[key] = collections.deque(maxlen=self.window)
+                self._totals[key] = collections.Counter()
+            self._samples[key].append(event["seconds"])
+            totals = self._totals[key]
+            totals["count"] += 1
+            totals["seconds"] += event["seconds"]
+            if (event.get("status") or 0) >= 400:
+                totals["errors"] += 1
+            for field in ("bytes_in", "bytes_out", "retries", "refreshes", "records"):
+                totals[field] += event.get(field) or 0
+
+    def reset(self) -> None:
+        """
+        Forget every sample.
+        """
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def summary(self) -> Dict[Tuple[str, str, str], dict]:
+        """
+        Get counts, totals and latency percentiles.
+
+        Returns:
+            Dict[Tuple[str, str, str], dict]: Keyed by (kind, endpoint, method), with
+                `count`, `seconds` (total), `p50`, `p90`, `p99`, `max`, `errors`,
+                `bytes_in`, `bytes_out`, `retries`, `refreshes` and `records`
+
+        """
+        with self._lock:
+            snapshot = {key: (sorted(self._samples[key]), dict(self._totals[key])) for key in self._samples}
+        summary = {}
+        for key, (ordered, totals) in snapshot.items():
+            entry = {"count": 0, "seconds": 0.0, "errors": 0, "bytes_in": 0, "bytes_out": 0,
+                     "retries": 0, "refreshes": 0, "records": 0}
+            entry.update(totals)
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = _quantile(ordered, q)
+            entry["max"] = ordered[-1] if ordered else 0.0
+            summary[key] = entry
+        return summary
+
+    def prometheus(self, prefix: str = "neuvueclient") -> str:
+        """
+        Render the aggregated metrics in the Prometheus text exposition format
+        (also accepted by OpenTelemetry collectors' Prometheus receiver).
+
+        Arguments:
+            prefix (str: "neuvueclient"): Metric name prefix
+
+        Returns:
+            str
+
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_seconds Time spent per event, by kind, endpoint and method.",
+            f"# TYPE {prefix}_seconds summary",
+        ]
+        for (kind, endpoint, method), entry in sorted(summary.items()):
+            labels = f'kind="{kind}",endpoint="{_escape(endpoint)}",method="{method}"'
+            for q in QUANTILES:
+                lines.append(f'{prefix}_seconds{{{labels},quantile="{q}"}} {entry[f"p{int(q * 100)}"]}')
+            lines.append(f"{prefix}_seconds_sum{{{labels}}} {entry['seconds']}")
+            lines.append(f"{prefix}_seconds_count{{{labels}}} {entry['count']}")
+        for field, help_text in [
+            ("errors", "Responses with an HTTP error status."),
+            ("bytes_in", "Response body bytes received."),
+            ("bytes_out", "Request body bytes sent."),
+            ("retries", "Requests sent again after a token refresh."),
+            ("refreshes", "Access token refreshes triggered by requests."),
+            ("records", "Records decoded, converted or framed."),
+        ]:
+            name = f"{prefix}_{field}_total"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (kind, endpoint, method), entry in sorted(summary.items()):
+                if entry[field]:
+                    labels = f'kind="{kind}",endpoint="{_escape(endpoint)}",method="{method}"'
+                    lines.append(f"{name}{{{labels}}} {entry[field]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class OpenTelemetryHook:
+    """
+    Record events as OpenTelemetry histograms and counters through a meter,
+    e.g. `OpenTelemetryHook(opentelemetry.metrics.get_meter("neuvueclient"))`.
+
+    """
+    def __init__(self, meter: Any, prefix: str = "neuvueclient") -> None:
+        self._duration = meter.create_histogram(f"{prefix}.duration", unit="s")
+        self._bytes_in = meter.create_counter(f"{prefix}.bytes_in", unit="By")
+        self._bytes_out = meter.create_counter(f"{prefix}.bytes_out", unit="By")
+
+    def __call__(self, event: dict) -> None:
+        attributes = {
+            key: event[key] for key in ("kind", "endpoint", "method", "status") if event.get(key) is not None
+        }
+        self._duration.record(event["seconds"], attributes)
+        if event.get("bytes_in"):
+            self._bytes_in.add(event["bytes_in"], attributes)
+        if event.get("bytes_out"):
+            self._bytes_out.add(event["bytes_out"], attributes)
+
+
+def make_hooks(on_event: Any = None, metrics: Any = None) -> Tuple[List[Callable[[dict], None]], MetricsAggregator]:
+    """
+    Build the hook list of a client from its `on_event` and `metrics` options.
+    """
+    hooks = list(on_event) if isinstance(on_event, (list, tuple)) else ([on_event] if on_event else [])
+    if metrics is True:
+        metrics = MetricsAggregator()
+    if metrics:
+        hooks.append(metrics)
+    return hooks, metrics or None
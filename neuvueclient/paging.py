@@ -0,0 +1,136 @@
+"""
+# neuvueclient.paging
+
+Chooses the `pageSize` of each request while depaginating a query.
+
+With a `limit`, a page never asks for (many) more records than are still
+wanted, so `get_next_task` downloads one task rather than a full page.
+
+Given a `page_bytes` budget (and optionally a `page_seconds` budget), page
+sizes follow the bytes and seconds per record observed so far, so that wide
+documents are fetched in smaller pages and narrow ones in larger pages.
+
+In offset mode the server skips `p * pageSize` records, so a new size can only
+be used once the number of records already requested is a multiple of it; the
+sizer picks the divisor of that offset nearest to the size it wants. Cursor
+pages carry no offset and can take any size.
+"""
+
+import math
+from typing import List, Tuple
+
+
+def _divisors(n: int) -> List[int]:
+    small, large = [], []
+    for i in range(1, math.isqrt(n) + 1):
+        if n % i == 0:
+            small.append(i)
+            if i != n // i:
+                large.append(n // i)
+    return small + large[::-1]
+
+
+class PageSizer:
+    """
+    Tracks the pages received for one query and sizes the next request.
+
+    """
+    min_page_size = 100
+    max_page_size = 100000
+
+    def __init__(
+        self,
+        page_size: int = 15000,
+        limit: int = None,
+        page_bytes: int = None,
+        page_seconds: float = None,
+        offset: bool = True,
+    ) -> None:
+        """
+        Create a new page sizer.
+
+        Arguments:
+            page_size (int: 15000): The page size to start from (and keep, unless
+                `page_bytes` or `page_seconds` is given)
+            limit (int: None): The maximum number of records wanted
+            page_bytes (int: None): Target response size per page
+            page_seconds (float: None): Target response time per page
+            offset (bool: True): Whether pages are addressed by page number
+
+        """
+        self.page_size = page_size
+        self.limit = limit
+        self.page_bytes = page_bytes
+        self.page_seconds = page_seconds
+        self.offset = offset
+        self.received = 0
+        self.total_bytes = 0
+        self.total_seconds = 0.0
+        # The page number and size of the last request, once sizes are frozen
+        self._frozen: Tuple[int, int] = None
+        self._requested: Tuple[int, int] = (0, page_size)
+
+    @property
+    def done(self) -> bool:
+        return bool(self.limit) and self.received >= self.limit
+
+    def _target(self) -> int:
+        target = self.page_size
+        if self.received and (self.page_bytes or self.page_seconds):
+            targets = []
+            if self.page_bytes:
+                targets.append(self.page_bytes * self.received / max(self.total_bytes, 1))
+            if self.page_seconds:
+                targets.append(self.page_seconds * self.received / max(self.total_seconds, 1e-6))
+            target = int(min(max(min(targets), self.min_page_size), self.max_page_size))
+        return target
+
+    def next_page(self) -> Tuple[int, int]:
+        """
+        Choose the next request.
+
+        Returns:
+            Tuple[int, int]: The page number (always 0 for cursor pages) and pageSize
+
+        """
+        if self._frozen is not None:
+            page, size = self._frozen
+            self._frozen = (page + 1, size)
+            return page + 1, size
+
+        size = self._target()
+        remaining = self.limit - self.received if self.limit else None
+        limited = remaining is not None and remaining < size
+        if limited:
+            size = remaining
+        if not self.offset:
+            return 0, size
+
+        if self.received:
+            candidates = _divisors(self.received)
+            if limited:
+                # Fetch every remaining record in one request, as few extra as possible
+                size = min(d for d in candidates if d >= size)
+            else:
+                size = min(candidates, key=lambda d: (abs(math.log(d / size)), -d))
+        self._requested = (self.received // size, size)
+        return self._requested
+
+    def observe(self, records: int, nbytes: int, seconds: float) -> None:
+        """
+        Record a non-empty page.
+
+        Arguments:
+            records (int): Number of records in the page
+            nbytes (int): Size of the response body
+            seconds (float): Time the request took
+
+        """
+        self.received += records
+        self.total_bytes += nbytes
+        self.total_seconds += seconds
+        page, size = self._requested
+        if self.offset and self._frozen is None and records < size:
+            # The server capped the page size (or this is the last page); its
+            # offsets are no longer known, so keep requesting this size in order
+            self._frozen = (page, size)
@@ -0,0 +1,211 @@
+"""
+# neuvueclient.TaskQueue
+
+A buffer of the next tasks for one assignee in one namespace, refilled in
+the background, so that an annotation tool gets its next task from memory
+instead of waiting on the two queries `get_next_task` makes:
+
+```python
+queue = C.task_queue("jdoe", "split", size=5)
+task = queue.next()    # open tasks first, then pending, by -priority
+...                    # the annotator works on (and closes) the task
+task = queue.next()    # already prefetched, with its ng_state resolved
+```
+
+Tasks are ordered exactly as `get_next_task` orders them: every open task,
+highest priority first, then every pending task, highest priority first.
+`next` hands a task out and removes it from the queue: unlike
+`get_next_task`, it will not return the same task again while the caller is
+still working on it. A refill runs once fewer than `low_water` tasks are
+buffered, and replaces the whole buffer with fresh query results (minus the
+tasks already handed out), so tasks opened, reprioritized, reassigned or
+closed elsewhere are reflected within one refill; a buffer older than
+`max_age` seconds is refilled before it is used.
+
+Handed-out tasks are filtered out locally rather than in the sieve, by asking
+for as many more tasks as are outstanding; a handed-out task is forgotten
+once a refill no longer returns it (because it was closed, say), so neither
+the queries nor the set of outstanding tasks grow over a session.
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, List, Optional, Set
+
+
+class TaskQueue:
+    """
+    neuvueclient.TaskQueue prefetches the next tasks of an assignee.
+
+    See neuvueclient/prefetch.py for more documentation.
+
+    """
+    statuses = ["open", "pending"]
+
+    def __init__(
+        self,
+        client,
+        assignee: str,
+        namespace: str,
+        size: int = 5,
+        convert_states_to_json: bool = True,
+        state_workers: int = 8,
+        max_age: float = 60,
+        low_water: int = None,
+    ) -> None:
+        """
+        Create a new task queue and start filling it.
+
+        Arguments:
+            client (NeuvueQueue): The client to query through
+            assignee (str): The username of the assignee
+            namespace (str): The app/sprint for which the tasks were assigned
+            size (int: 5): Number of tasks to keep prefetched
+            convert_states_to_json (bool: True): Resolve the tasks' ng_state URLs while
+                prefetching
+            state_workers (int: 8): Number of distinct states to fetch concurrently
+            max_age (float: 60): Seconds after which buffered tasks are refreshed from
+                the server before one is handed out
+            low_water (int: None): Refill in the background once fewer tasks than this
+                are buffered. Defaults to half of `size` (at least 1).
+
+        """
+        self.client = client
+        self.assignee = assignee
+        self.namespace = namespace
+        self.size = size
+        self.convert_states_to_json = convert_states_to_json
+        self.state_workers = state_workers
+        self.max_age = max_age
+        self.low_water = low_water if low_water is not None else max(1, size // 2)
+        self._buffer: Deque[dict] = collections.deque()
+        self._handed_out: Set[str] = set()
+        self._filled: float = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._refill: Optional[Future] = None
+        self._closed = False
+        self.refill()
+
+    def _fetch(self, wanted: int) -> List[dict]:
+        tasks: List[dict] = []
+        for status in self.statuses:
+            sieve = {
+                "assignee": self.assignee,
+                "namespace": self.namespace,
+                "active": True,
+                "status": status,
+            }
+            tasks += self.client.depaginate(
+                "tasks", sieve, sort=["-priority"], limit=wanted - len(tasks)
+            )
+            if len(tasks) >= wanted:
+                break
+        return tasks
+
+    def _run_refill(self) -> None:
+        with self._lock:
+            handed_out = set(self._handed_out)
+        tasks = self._fetch(self.size + len(handed_out))
+        returned = {t["_id"] for t in tasks}
+        tasks = [t for t in tasks if t["_id"] not in handed_out][:self.size]
+        if self.convert_states_to_json:
+            tasks = self.client._convert_record_states(tasks, self.state_workers)
+        with self._lock:
+            # Forget tasks that are no longer open or pending; keep those handed out meanwhile
+            self._handed_out -= handed_out - returned
+            self._buffer = collections.deque(t for t in tasks if t["_id"] not in self._handed_out)
+            self._filled = time.time()
+
+    def refill(self) -> Future:
+        """
+        Refresh the buffer in the background, unless a refill is already running.
+
+        Returns:
+            Future: Completes when the buffer has been refilled
+
+        Raises:
+            RuntimeError: If the queue was closed
+
+        """
+        refill = self._schedule()
+        if refill is None:
+            raise RuntimeError("Task queue is closed")
+        return refill
+
+    def _schedule(self) -> Optional[Future]:
+        with self._lock:
+            if self._closed:
+                return None
+            if self._refill is None or self._refill.done():
+                self._refill = self._executor.submit(self._run_refill)
+            return self._refill
+
+    def next(self) -> Optional[dict]:
+        """
+        Hand out the next task, waiting for a refill only if none is buffered
+        (or the buffer is older than `max_age`). Once the queue is closed, only
+        the tasks still buffered are handed out.
+
+        Returns:
+            dict: The task, or None if the assignee has no open or pending tasks
+
+        Raises:
+            RuntimeError: If the refill failed, or the queue was closed and is empty
+
+        """
+        with self._lock:
+            closed = self._closed
+            stale = self._filled is None or time.time() - self._filled > self.max_age
+            empty = not self._buffer
+            refill = self._refill
+        if closed and empty:
+            raise RuntimeError("Task queue is closed")
+        if not closed and (stale or empty):
+            if refill is None or refill.done():
+                refill = self.refill()
+            try:
+                refill.result()
+            except Exception as e:
+                raise RuntimeError("Unable to get next task") from e
+        with self._lock:
+            task = self._buffer.popleft() if self._buffer else None
+            if task is not None:
+                self._handed_out.add(task["_id"])
+            low = len(self._buffer) < self.low_water
+        if low:
+            self._schedule()
+        return task
+
+    def peek(self) -> List[dict]:
+        """
+        Get the tasks currently buffered, in the order `next` will hand them out.
+        """
+        with self._lock:
+            return list(self._buffer)
+
+    def reset(self) -> None:
+        """
+        Forget which tasks were handed out (so they can be handed out again if
+        they are still open or pending) and refill.
+        """
+        with self._lock:
+            self._handed_out.clear()
+            self._filled = None
+        self.refill()
+
+    def close(self) -> None:
+        """
+        Stop prefetching. Tasks already buffered can still be handed out.
+        """
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "TaskQueue":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
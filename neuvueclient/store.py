@@ -0,0 +1,396 @@
+"""
+# neuvueclient.LocalStore
+
+A persistent SQLite mirror of `tasks`, `points`, `differstacks` and `agents`
+documents that can answer common sieves without contacting the server.
+
+Every document is stored whole (as JSON) next to indexed copies of its
+`namespace`, `assignee`, `status`, `seg_id`, `created` and `active` fields.
+Conditions on those fields become indexed SQL; anything else in the sieve is
+checked against the stored document.
+
+The store only answers a query when it is known to hold every matching
+document: a query is answered locally if a previously loaded sieve for the
+same collection is no more specific than it (each of its conditions appears,
+identically, in the query) and was loaded less than `max_age` seconds ago.
+`NeuvueQueue` loads the results of the getters into its store, upserts the
+documents returned by `post_*`, and invalidates documents it patches or
+deletes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+
+COLLECTIONS = ["tasks", "points", "differstacks", "agents"]
+INDEXED_FIELDS = ["namespace", "assignee", "status", "seg_id", "created", "active"]
+
+_COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_OPERATORS = {"$eq", "$ne", "$in", "$nin", "$exists", *_COMPARISONS}
+
+
+class UnsupportedSieve(Exception):
+    """
+    Raised when a sieve uses operators the local store cannot evaluate.
+    """
+
+
+def _resolve(doc: dict, key: str) -> Any:
+    value = doc
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op not in _OPERATORS:
+        raise UnsupportedSieve(op)
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return (any(v in operand for v in value) if isinstance(value, list) else value in operand)
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+
+def matches(doc: dict, sieve: dict) -> bool:
+    """
+    Evaluate a mongoose-style sieve against a document.
+
+    Supports equality, `$in`, `$nin`, `$gt`, `$gte`, `$lt`, `$lte`, `$ne`,
+    `$eq`, `$exists`, `$and`, `$or` and dotted keys.
+
+    Arguments:
+        doc (dict): The document
+        sieve (dict): See sieve documentation.
+
+    Returns:
+        bool
+
+    Raises:
+        UnsupportedSieve: If the sieve uses any other operator
+
+    """
+    for key, condition in sieve.items():
+        if key == "$and":
+            if not all(matches(doc, s) for s in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, s) for s in condition):
+                return False
+        elif key.startswith("$"):
+            raise UnsupportedSieve(key)
+        else:
+            value = _resolve(doc, key)
+            if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+                if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                    return False
+            elif isinstance(value, list) and not isinstance(condition, list):
+                if condition not in value:
+                    return False
+            elif value != condition:
+                return False
+    return True
+
+
+def sort_documents(docs: List[dict], sort: List[str]) -> List[dict]:
+    """
+    Sort documents like the server, given a list such as `["-priority", "created"]`.
+    """
+    for field in reversed([s for s in sort or [] if s]):
+        descending = field.startswith("-")
+        key = field.lstrip("-+")
+        # None sorts before everything else, as null does in MongoDB
+        docs.sort(
+            key=lambda d: (_resolve(d, key) is not None, _resolve(d, key)),
+            reverse=descending,
+        )
+    return docs
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class LocalStore:
+    """
+    neuvueclient.LocalStore is an offline, queryable SQLite mirror of
+    NeuvueQueue documents.
+
+    See neuvueclient/store.py for more documentation.
+
+    """
+    def __init__(self, path: Optional[str] = "~/.neuvuequeue/store.sqlite", max_age: float = 300) -> None:
+        """
+        Create or open a local store.
+
+        Arguments:
+            path (str: "~/.neuvuequeue/store.sqlite"): Database file. Pass None to keep
+                the store in memory only.
+            max_age (float: 300): Seconds for which loaded sieves are answered locally.
+                None never expires them.
+
+        """
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path or ":memory:"
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            for collection in COLLECTIONS:
+                columns = ", ".join(INDEXED_FIELDS)
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} "
+                    f"(_id TEXT PRIMARY KEY, {columns}, doc TEXT NOT NULL)"
+                )
+                for field in INDEXED_FIELDS:
+                    self._db.execute(
+                        f"CREATE INDEX IF NOT EXISTS {collection}_{field} ON {collection} ({field})"
+                    )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS coverage "
+                "(collection TEXT, sieve TEXT, loaded REAL, PRIMARY KEY (collection, sieve))"
+            )
+
+    @staticmethod
+    def _check(collection: str) -> None:
+        if collection not in COLLECTIONS:
+            raise ValueError(f"Unknown collection [{collection}]; expected one of {COLLECTIONS}.")
+
+    @staticmethod
+    def _row(doc: dict) -> tuple:
+        values = []
+        for field in INDEXED_FIELDS:
+            value = doc.get(field)
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, (dict, list)):
+                value = None
+            values.append(value)
+        return (doc["_id"], *values, json.dumps(doc))
+
+    def upsert(self, collection: str, docs: List[dict]) -> None:
+        """
+        Insert or replace documents without changing which sieves are covered.
+
+        Arguments:
+            collection (str): One of "tasks", "points", "differstacks", "agents"
+            docs (List[dict]): Documents with an `_id`
+
+        """
+        self._check(collection)
+        with self._lock, self._db:
+            self._insert(collection, docs)
+
+    def _insert(self, collection: str, docs: List[dict]) -> None:
+        placeholders = ", ".join(["?"] * (len(INDEXED_FIELDS) + 2))
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO {collection} VALUES ({placeholders})",
+            [self._row(d) for d in docs if isinstance(d, dict) and "_id" in d],
+        )
+
+    def load(self, collection: str, sieve: dict, docs: List[dict]) -> None:
+        """
+        Store every document matching `sieve`, so that the store can answer
+        that sieve (and narrower ones) until it expires.
+
+        Stored documents that matched `sieve` but are missing from `docs` (e.g.
+        tasks closed or deleted on the server since) are removed.
+
+        Arguments:
+            collection (str): One of "tasks", "points", "differstacks", "agents"
+            sieve (dict): The sieve `docs` is the complete result of
+            docs (List[dict]): Complete documents
+
+        """
+        self._check(collection)
+        where, params = self._where(sieve)
+        with self._lock, self._db:
+            rows = self._db.execute(f"SELECT _id, doc FROM {collection}{where}", params).fetchall()
+            try:
+                stale = [(_id,) for _id, doc in rows if matches(json.loads(doc), sieve)]
+            except UnsupportedSieve:
+                # The store cannot evaluate (or answer) this sieve, so it keeps what it has
+                stale = []
+            self._db.executemany(f"DELETE FROM {collection} WHERE _id = ?", stale)
+            self._insert(collection, docs)
+            self._db.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                (collection, _canonical(sieve), time.time()),
+            )
+
+    def covers(self, collection: str, sieve: dict, max_age: float = None) -> bool:
+        """
+        Whether every document matching `sieve` is known to be in the store.
+
+        Arguments:
+            collection (str): The collection
+            sieve (dict): See sieve documentation.
+            max_age (float: None): Override the store's `max_age`
+
+        Returns:
+            bool
+
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sieve, loaded FROM coverage WHERE collection = ?", (collection,)
+            ).fetchall()
+        for loaded_sieve, loaded in rows:
+            if max_age is not None and time.time() - loaded > max_age:
+                continue
+            loaded_sieve = json.loads(loaded_sieve)
+            if all(
+                key in sieve and _canonical(sieve[key]) == _canonical(value)
+                for key, value in loaded_sieve.items()
+            ):
+                return True
+        return False
+
+    def _where(self, sieve: dict) -> tuple:
+        """
+        Translate the indexed top-level conditions of a sieve into SQL.
+        """
+        clauses, params = [], []
+        for key, condition in sieve.items():
+            if key not in INDEXED_FIELDS:
+                continue
+            if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+                for op, operand in condition.items():
+                    if op in ("$in", "$nin") and isinstance(operand, list) and operand:
+                        operand = [int(v) if isinstance(v, bool) else v for v in operand]
+                        placeholders = ", ".join(["?"] * len(operand))
+                        if op == "$nin":
+                            # Documents without the field match $nin, as in MongoDB
+                            clauses.append(f"({key} IS NULL OR {key} NOT IN ({placeholders}))")
+                        else:
+                            clauses.append(f"{key} IN ({placeholders})")
+                        params += operand
+                    elif op in ("$gt", "$gte", "$lt", "$lte") and not isinstance(operand, (dict, list)):
+                        clauses.append(f"{key} {_COMPARISONS[op]} ?")
+                        params.append(operand)
+            elif not isinstance(condition, (dict, list)):
+                if condition is None:
+                    clauses.append(f"{key} IS NULL")
+                else:
+                    clauses.append(f"{key} = ?")
+                    params.append(int(condition) if isinstance(condition, bool) else condition)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(
+        self,
+        collection: str,
+        sieve: dict,
+        select: List[str] = None,
+        sort: List[str] = None,
+        limit: int = None,
+        max_age: float = None,
+    ) -> Optional[List[dict]]:
+        """
+        Answer a query locally.
+
+        Arguments:
+            collection (str): The collection
+            sieve (dict): See sieve documentation.
+            select (List[str]: None): Fields to return
+            sort (List[str]: None): Fields to sort by
+            limit (int: None): The maximum number of items to return.
+            max_age (float: None): Override the store's `max_age`
+
+        Returns:
+            List[dict]: The matching documents, or None if the store cannot answer
+                the query (so the server must be asked instead)
+
+        """
+        self._check(collection)
+        if not self.covers(collection, sieve, max_age):
+            self.misses += 1
+            return None
+
+        where, params = self._where(sieve)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT doc FROM {collection}{where} ORDER BY _id", params
+            ).fetchall()
+        try:
+            docs = [d for d in (json.loads(r[0]) for r in rows) if matches(d, sieve)]
+        except UnsupportedSieve:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        docs = sort_documents(docs, sort)
+        if limit:
+            docs = docs[:limit]
+        if select:
+            docs = [{k: v for k, v in d.items() if k in select or k == "_id"} for d in docs]
+        return docs
+
+    def invalidate(self, collection: str, ids: List[str] = None) -> None:
+        """
+        Forget documents that were changed on the server.
+
+        Since a changed document may now match different sieves, this also
+        stops the store from answering any query on the collection until it
+        is loaded again.
+
+        Arguments:
+            collection (str): The collection
+            ids (List[str]: None): Documents to drop. None drops them all.
+
+        """
+        self._check(collection)
+        with self._lock, self._db:
+            if ids is None:
+                self._db.execute(f"DELETE FROM {collection}")
+            else:
+                self._db.executemany(f"DELETE FROM {collection} WHERE _id = ?", [(i,) for i in ids])
+            self._db.execute("DELETE FROM coverage WHERE collection = ?", (collection,))
+
+    def clear(self) -> None:
+        """
+        Remove every document and covered sieve.
+        """
+        for collection in COLLECTIONS:
+            self.invalidate(collection)
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss counters and document counts per collection.
+
+        Returns:
+            dict
+
+        """
+        with self._lock:
+            counts = {
+                c: self._db.execute(f"SELECT COUNT(*) FROM {c}").fetchone()[0] for c in COLLECTIONS
+            }
+            (covered,) = self._db.execute("SELECT COUNT(*) FROM coverage").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "documents": counts, "sieves": covered}
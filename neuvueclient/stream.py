@@ -0,0 +1,187 @@
+"""
+# neuvueclient.stream
+
+Incremental parsing of JSON array responses, so that records can be handed
+on as the body arrives instead of after the whole page has been read and
+decoded. Peak memory is one network chunk plus the record being parsed,
+rather than the full body plus every decoded record.
+
+```python
+parser = JSONArrayParser()
+for chunk in res.iter_content(65536):
+    for record in parser.feed(chunk):
+        ...
+parser.close()
+```
+
+`ijson` (`pip install neuvueclient[stream]`) is used when installed, with
+its C backend where available. Otherwise records are decoded one at a time
+with the standard library's `JSONDecoder.raw_decode`.
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, List, Union
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONArrayParser:
+    """
+    A push parser for a top-level JSON array.
+
+    """
+    def __init__(self, parser: str = "auto") -> None:
+        """
+        Create a new parser.
+
+        Arguments:
+            parser (str: "auto"): "ijson", "json", or "auto" for ijson when installed
+
+        """
+        if parser == "auto":
+            parser = "ijson" if ijson is not None else "json"
+        if parser not in ("ijson", "json"):
+            raise ValueError(f"Unknown JSON parser [{parser}]; expected 'ijson', 'json' or 'auto'.")
+        if parser == "ijson" and ijson is None:
+            raise ImportError("Streaming with ijson requires ijson: pip install ijson")
+        self.parser = parser
+        self.nbytes = 0
+        self._state = "start"
+        if parser == "ijson":
+            self._records = ijson.sendable_list()
+            self._coro = ijson.items_coro(self._records, "item", use_float=True)
+        else:
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+            self._scanner = json.JSONDecoder()
+            self._buffer = ""
+            self._pos = 0
+            # Unread text needed before retrying a record that was cut off
+            self._wanted = 0
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        Parse the next piece of the body.
+
+        Arguments:
+            data (bytes): The next chunk of the response body
+
+        Returns:
+            List[Any]: The records completed by this chunk
+
+        """
+        self.nbytes += len(data)
+        if self.parser == "ijson":
+            if self._state == "start" and data.strip():
+                if not data.lstrip().startswith(b"["):
+                    raise ValueError(f"Expected a JSON array, found {data.lstrip()[:1]!r}")
+                self._state = "first"
+            try:
+                self._coro.send(data)
+            except ijson.JSONError as e:
+                raise ValueError(f"Invalid JSON array: {e}") from e
+            return self._take()
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(data)
+        self._pos = 0
+        if len(self._buffer) < self._wanted:
+            return []
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """
+        Finish parsing.
+
+        Returns:
+            List[Any]: Any records completed by the end of the body
+
+        Raises:
+            ValueError: If the body was not a complete JSON array
+
+        """
+        if self.parser == "ijson":
+            try:
+                self._coro.close()
+            except ijson.JSONError as e:
+                raise ValueError(f"Incomplete JSON array: {e}") from e
+            if self._state == "start":
+                raise ValueError("Incomplete JSON array")
+            return self._take()
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(b"", final=True)
+        self._pos = 0
+        records = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Incomplete JSON array")
+        return records
+
+    def _take(self) -> List[Any]:
+        records = list(self._records)
+        del self._records[:]
+        return records
+
+    def _skip_whitespace(self) -> str:
+        """
+        Move past whitespace and return the next character ("" if none is buffered).
+        """
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._buffer[self._pos:self._pos + 1]
+
+    def _parse(self, final: bool) -> List[Any]:
+        records = []
+        while self._state != "done":
+            char = self._skip_whitespace()
+            if not char:
+                break
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError(f"Expected a JSON array, found {char!r}")
+                self._state = "first"
+                self._pos += 1
+            elif self._state == "separator":
+                if char not in ",]":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, found {char!r}")
+                self._state = "value" if char == "," else "done"
+                self._pos += 1
+            elif char == "]" and self._state == "first":
+                self._state = "done"
+                self._pos += 1
+            else:
+                try:
+                    record, end = self._scanner.raw_decode(self._buffer, self._pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    end = None
+                # A value that ends the buffer (e.g. a number) may continue in the next chunk
+                if end is None or (end == len(self._buffer) and not final):
+                    self._wanted = 2 * (len(self._buffer) - self._pos)
+                    break
+                records.append(record)
+                self._pos = end
+                self._wanted = 0
+                self._state = "separator"
+        return records
+
+
+def iter_json_array(chunks: Iterable[bytes], parser: Union[str, JSONArrayParser] = "auto") -> Iterator[Any]:
+    """
+    Yield the records of a JSON array as its body arrives.
+
+    Arguments:
+        chunks (Iterable[bytes]): Pieces of the body, e.g. `res.iter_content(65536)`
+        parser (str or JSONArrayParser: "auto"): "ijson", "json", "auto" for ijson when
+            installed, or a new parser to use (e.g. to read its `nbytes` afterwards)
+
+    Returns:
+        Iterator[Any]
+
+    """
+    array = parser if isinstance(parser, JSONArrayParser) else JSONArrayParser(parser)
+    for chunk in chunks:
+        yield from array.feed(chunk)
+    yield from array.close()
@@ -0,0 +1,247 @@
+"""
+# neuvueclient.TaskMirror
+
+A local copy of the tasks matching a sieve that is kept up to date
+incrementally. The first refresh downloads every matching task; later
+refreshes only ask the server for tasks created, opened or closed since the
+newest of those timestamps already mirrored, and merge them in place:
+
+```python
+mirror = TaskMirror(C, {"namespace": "split"}, path="split.pkl")
+tasks = mirror.refresh()   # full download the first time
+tasks = mirror.refresh()   # only what changed since
+```
+
+Tasks that leave the sieve are dropped. An incremental refresh also lists
+(projected to the fields the sieve tests) the tasks whose timestamps moved
+and drops mirrored tasks that no longer match the sieve, such as tasks closed
+while the mirror holds open ones. That listing is scoped by the sieve's plain
+equality conditions (`namespace`, `assignee`, ...) other than `status` and
+`active`, or, when it has none, by the IDs already mirrored. Changes that do not move
+`created`, `opened` or `closed` (a reassignment or deactivation while a task
+stays pending) and deletions are only seen by a reconciliation, which lists
+the IDs of every matching task and drops the rest, or by a full refresh:
+
+```python
+tasks = mirror.refresh(reconcile=True)
+```
+
+`reconcile_interval` and `full_refresh_interval` bound how stale those can get.
+"""
+
+import copy
+import json
+import os
+import time
+from typing import Set
+
+import pandas as pd
+
+from .store import UnsupportedSieve, matches
+
+
+# Fields a timestamp move changes (or that usually change with it), which cannot scope the leavers
+_UNSCOPED = {"status", "active", "created", "opened", "closed"}
+
+
+def _fields(sieve: dict) -> Set[str]:
+    """
+    Get the top-level document fields a sieve tests.
+    """
+    fields = set()
+    for key, condition in sieve.items():
+        if key in ("$and", "$or"):
+            for clause in condition:
+                fields |= _fields(clause)
+        elif not key.startswith("$"):
+            fields.add(key.split(".")[0])
+    return fields
+
+
+class TaskMirror:
+    """
+    neuvueclient.TaskMirror keeps a DataFrame of the tasks matching a sieve
+    in sync with the server.
+
+    See neuvueclient/sync.py for more documentation.
+
+    """
+    time_columns = ["created", "opened", "closed"]
+    # Mirrored IDs per query when the leavers cannot be scoped by the sieve
+    id_chunk_size = 1000
+
+    def __init__(
+        self,
+        client,
+        sieve: dict = None,
+        path: str = None,
+        overlap: float = 60,
+        full_refresh_interval: float = None,
+        reconcile_interval: float = None,
+        **kwargs
+    ) -> None:
+        """
+        Create a new task mirror.
+
+        Arguments:
+            client (NeuvueQueue): The client to query through
+            sieve (dict): See sieve documentation.
+            path (str: None): File to persist the mirror to between sessions
+            overlap (float: 60): Seconds before the high-water mark to re-query, to
+                catch writes that were committed out of timestamp order
+            full_refresh_interval (float: None): Seconds after which the next refresh
+                downloads every task again
+            reconcile_interval (float: None): Seconds after which the next incremental
+                refresh also reconciles the mirrored IDs with the server
+            kwargs: Passed on to `get_tasks` (e.g. `convert_states_to_json`, `select`)
+
+        """
+        self.client = client
+        self.sieve = sieve if sieve is not None else {}
+        self.path = os.path.expanduser(path) if path else None
+        self.overlap = overlap
+        self.full_refresh_interval = full_refresh_interval
+        self.reconcile_interval = reconcile_interval
+        # The mirror polls the server itself, so it should not be answered from a local store
+        self.kwargs = dict({"use_store": False}, **kwargs)
+        self.frame: pd.DataFrame = None
+        self.high_water_mark: int = None
+        self.last_full_refresh: float = None
+        self.last_reconcile: float = None
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _key(self) -> str:
+        return json.dumps(self.sieve, sort_keys=True, default=str)
+
+    def _load(self) -> None:
+        stored = pd.read_pickle(self.path)
+        if stored.get("sieve") != self._key():
+            print(f"WARNING: Mirror at {self.path} was built for another sieve and will be rebuilt.")
+            return
+        self.frame = stored["frame"]
+        self.high_water_mark = stored["high_water_mark"]
+        self.last_full_refresh = stored["last_full_refresh"]
+        self.last_reconcile = stored.get("last_reconcile", self.last_full_refresh)
+
+    def _save(self) -> None:
+        tmp = self.path + ".tmp"
+        pd.to_pickle(
+            {
+                "sieve": self._key(),
+                "frame": self.frame,
+                "high_water_mark": self.high_water_mark,
+                "last_full_refresh": self.last_full_refresh,
+                "last_reconcile": self.last_reconcile,
+            },
+            tmp,
+        )
+        os.replace(tmp, self.path)
+
+    def _newest_timestamp(self, frame: pd.DataFrame) -> int:
+        newest = None
+        for column in self.time_columns:
+            if column in frame.columns and len(frame):
+                value = pd.to_datetime(frame[column]).max()
+                if not pd.isna(value):
+                    ms = round(value.timestamp() * 1000)
+                    newest = ms if newest is None else max(newest, ms)
+        return newest
+
+    def _changed(self) -> list:
+        since = self.high_water_mark - int(self.overlap * 1000)
+        return [{column: {"$gt": since}} for column in self.time_columns]
+
+    def _server_sieve(self) -> dict:
+        """
+        The sieve as `get_tasks` sends it (with `active` defaulted and times in ms).
+        """
+        sieve = self.client._prepare_sieve(copy.deepcopy(self.sieve), self.kwargs.get("active_default", True))
+        return self.client._prepare_time_queries(sieve)
+
+    def _delta_sieve(self) -> dict:
+        changed = self._changed()
+        sieve = copy.deepcopy(self.sieve)
+        if "$or" in sieve:
+            sieve["$and"] = sieve.get("$and", []) + [{"$or": sieve.pop("$or")}, {"$or": changed}]
+        else:
+            sieve["$or"] = changed
+        return sieve
+
+    def _drop(self, ids) -> None:
+        self.frame = self.frame[~self.frame.index.isin(ids)]
+
+    def _drop_leavers(self) -> None:
+        """
+        Drop mirrored tasks whose timestamps moved and that no longer match the sieve.
+        """
+        sieve = self._server_sieve()
+        scope = {
+            key: condition for key, condition in sieve.items()
+            if not key.startswith("$") and key not in _UNSCOPED and not isinstance(condition, (dict, list))
+        }
+        if scope:
+            queries = [dict(scope, **{"$or": self._changed()})]
+        else:
+            ids = list(self.frame.index)
+            queries = [
+                {"_id": {"$in": ids[i:i + self.id_chunk_size]}, "$or": self._changed()}
+                for i in range(0, len(ids), self.id_chunk_size)
+            ]
+        select = sorted(_fields(sieve) | {"_id"})
+        changed = [task for query in queries for task in self.client.depaginate("tasks", query, select=select)]
+        try:
+            self._drop([task["_id"] for task in changed if not matches(task, sieve)])
+        except UnsupportedSieve:
+            # Only a reconciliation (or full refresh) can tell for this sieve
+            pass
+
+    def _reconcile(self) -> None:
+        """
+        Drop mirrored tasks the server no longer returns for the sieve.
+        """
+        listed = self.client.depaginate("tasks", self._server_sieve(), select=["_id"])
+        current = {task["_id"] for task in listed}
+        self._drop([_id for _id in self.frame.index if _id not in current])
+        self.last_reconcile = time.time()
+
+    def refresh(self, full: bool = False, reconcile: bool = False) -> pd.DataFrame:
+        """
+        Bring the mirror up to date.
+
+        Arguments:
+            full (bool: False): Download every task instead of only recent changes
+            reconcile (bool: False): Also list the IDs of every matching task, to drop
+                mirrored tasks that were deleted or left the sieve unseen
+
+        Returns:
+            pd.DataFrame: Every mirrored task, formatted like `get_tasks`
+
+        """
+        now = time.time()
+        stale = (
+            self.full_refresh_interval is not None
+            and self.last_full_refresh is not None
+            and now - self.last_full_refresh > self.full_refresh_interval
+        )
+        if full or stale or self.frame is None or self.high_water_mark is None:
+            self.frame = self.client.get_tasks(copy.deepcopy(self.sieve), **self.kwargs)
+            self.last_full_refresh = self.last_reconcile = now
+        else:
+            if reconcile or (
+                self.reconcile_interval is not None
+                and now - (self.last_reconcile or 0) > self.reconcile_interval
+            ):
+                self._reconcile()
+            self._drop_leavers()
+            delta = self.client.get_tasks(self._delta_sieve(), **self.kwargs)
+            if len(delta):
+                kept = self.frame[~self.frame.index.isin(delta.index)]
+                self.frame = pd.concat([kept, delta]) if len(kept) else delta
+
+        newest = self._newest_timestamp(self.frame)
+        if newest is not None:
+            self.high_water_mark = max(newest, self.high_water_mark or newest)
+        if self.path:
+            self._save()
+        return self.frame
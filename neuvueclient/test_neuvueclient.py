@@ -1,60 +1,1146 @@
 import neuvueclient
-from neuvueclient import NeuvueQueue
-from networkx import Graph
+from neuvueclient import AsyncNeuvueQueue, NeuvueQueue
+from neuvueclient.testing import FakeNeuvueQueue
+import numpy as np
+import pandas as pd
 
+import asyncio
+import base64
+import configparser
+import datetime
+import http.server
+import json
+import os
 import random
+import tempfile
+import threading
+import time
 import unittest
+import urllib.parse
 
-NVQ_URL = "https://neuvuequeue.thebossdev.io"
+class _EmptyListHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
 
+    def do_GET(self):
+        body = json.dumps([]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-class TestNeuvueClientGraphs(unittest.TestCase):
-    def test_converts_graph(self):
-        C = NeuvueQueue(NVQ_URL)
+    def log_message(self, *args):
+        pass
 
-        result = C.get_graphs({"author": "j6m8", "active": True})
 
-        self.assertEqual(type(result.iloc[0].structure), dict)
-        self.assertEqual(type(result.iloc[0].graph), Graph)
+def _paged_handler(records):
+    class _PagedHandler(_EmptyListHandler):
+        requested_pages: list = []
+        requested_sizes: list = []
+        requested_states: list = []
+        posted_states: list = []
 
-    def test_empty_list(self):
-        C = NeuvueQueue(NVQ_URL)
+        def _reply(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
 
-        result = C.get_graphs(
-            {"author": f"random-user-{random.randint(1000, 2000)}", "active": False}
-        )
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path == "/nglstate/post":
+                self.posted_states.append(body)
+                host = self.headers["Host"]
+                return self._reply(f"http://{host}/state/{len(self.posted_states)}")
+            if isinstance(body, list):
+                body = [dict(doc, _id=f"id-{doc['coordinate'][0]}") for doc in body]
+            self._reply(body)
 
-        self.assertListEqual(list(result.columns), C.dtype_columns("graph"))
+        patches: list = []
+        combined_patch = True
+        deletes: list = []
+        bulk_delete = True
+        deleted_count = True
 
+        def do_DELETE(self):
+            if "?" in self.path and not self.bulk_delete:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.path.endswith("/missing"):
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.deletes.append(urllib.parse.unquote(self.path))
+            if "?" in self.path and self.deleted_count:
+                sieve = json.loads(urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)["q"][0])
+                return self._reply({"deletedCount": len(sieve["_id"]["$in"])})
+            self._reply({})
 
-class TestNeuvueClientVolumes(unittest.TestCase):
-    def test_empty_list(self):
-        C = NeuvueQueue(NVQ_URL)
+        def do_PATCH(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.count("/") == 2 and not self.combined_patch:
+                self.send_response(405)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.patches.append((self.path, body))
+            self._reply(body)
 
-        result = C.get_volumes(
-            {"author": f"random-user-{random.randint(1000, 2000)}", "active": False}
-        )
+        def do_GET(self):
+            if self.path.startswith("/state/"):
+                self.requested_states.append(self.path)
+                body = json.dumps({"state": self.path}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            page = int(params.get("p", ["0"])[0])
+            size = int(params.get("pageSize", ["15000"])[0])
+            self.requested_pages.append(page)
+            self.requested_sizes.append(size)
+            _id = json.loads(params.get("q", ["{}"])[0]).get("_id")
+            after = _id.get("$gt") if isinstance(_id, dict) else None
+            matches = [r for r in records if after is None or r["_id"] > after]
+            if "select" in params:
+                fields = params["select"][0].split(",") + ["_id"]
+                matches = [{k: v for k, v in r.items() if k in fields} for r in matches]
+            body = json.dumps(matches[page * size:(page + 1) * size]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return _PagedHandler
 
-        self.assertListEqual(list(result.columns), C.dtype_columns("volume"))
 
+def _serve(handler=_EmptyListHandler):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class TestNeuvueClientFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNeuvueQueue().start()
+        self.server.populate(tasks=30, points_per_task=2, states=3, state_bytes=10)
+        self.C = NeuvueQueue(self.server.url, local=True, json_state_server=self.server.state_server)
+
+    def tearDown(self):
+        self.server.stop()
 
-class TestNeuvueClientQuestions(unittest.TestCase):
     def test_empty_list(self):
-        C = NeuvueQueue(NVQ_URL)
+        sieve = {"author": f"random-user-{random.randint(1000, 2000)}"}
+        for getter, datatype in [
+            (self.C.get_points, "point"),
+            (self.C.get_tasks, "task"),
+            (self.C.get_differ_stacks, "differ_stack"),
+            (self.C.get_agent_jobs, "agents"),
+        ]:
+            result = getter(dict(sieve))
+            self.assertListEqual(list(result.columns), self.C.dtype_columns(datatype))
+
+    def test_sieve_and_sort(self):
+        result = self.C.get_tasks({"namespace": "split", "status": "pending"}, sort="-priority", pageSize=4)
+        expected = self.server.query("tasks", {"namespace": "split", "status": "pending", "active": True}, ["-priority"])
+        self.assertListEqual(list(result.index), [t["_id"] for t in expected])
+
+    def test_populate_and_states(self):
+        result = self.C.get_tasks(populate_points=True)
+        self.assertEqual(len(result), 30)
+        self.assertEqual(result.iloc[0].points[0]["coordinate"], [0, 0, 0])
+        self.assertIn("precomputed://", result.iloc[0].ng_state)
+
+    def test_write_round_trip(self):
+        task = self.C.post_task("me", "you", 1, "split", {"prompt": "hi"}, post_state=False)
+        self.C.patch_task(task["_id"], author="me", status="open")
+        self.assertEqual(self.C.get_task(task["_id"])["status"], "open")
+        self.C.delete_task(task["_id"])
+        self.assertNotIn(task["_id"], self.server.collections["tasks"])
+
+    def test_auth_and_errors(self):
+        with FakeNeuvueQueue(require_auth=True) as server:
+            token = server.issue_token(ttl=-1)
+            C = NeuvueQueue(server.url, token=True, refresh_token="r", access_token=token)
+            self.assertEqual(len(C.get_tasks()), 0)
+            self.assertEqual(server.refreshes, 1)
+        with FakeNeuvueQueue(error_rate=1) as server:
+            with self.assertRaises(RuntimeError):
+                NeuvueQueue(server.url, local=True).get_tasks()
+
+
+class TestNeuvueClientTaskQueue(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNeuvueQueue().start()
+        self.server.populate(tasks=20, states=2, state_bytes=10, namespaces=["split"], assignees=1)
+        self.C = NeuvueQueue(self.server.url, local=True, json_state_server=self.server.state_server)
+
+    def tearDown(self):
+        self.C.close()
+        self.server.stop()
+
+    def test_order_and_refill(self):
+        expected = [
+            t["_id"]
+            for status in ["open", "pending"]
+            for t in self.server.query("tasks", {"assignee": "user0", "namespace": "split", "status": status}, ["-priority"])
+        ]
+        self.assertEqual(self.C.get_next_task("user0", "split")["_id"], expected[0])
+        queue = self.C.task_queue("user0", "split", size=3)
+        self.assertIs(self.C.task_queue("user0", "split"), queue)
+
+        task = queue.next()
+        self.assertIn("precomputed://", task["ng_state"])
+        handed_out = [task["_id"]]
+        while task is not None:
+            task = queue.next()
+            if task is not None:
+                handed_out.append(task["_id"])
+        self.assertListEqual(handed_out, expected)
+
+        queue.reset()
+        self.assertEqual(queue.next()["_id"], expected[0])
+
+    def test_refills_below_low_water(self):
+        queue = self.C.task_queue("user0", "split", size=4, convert_states_to_json=False)
+        first = queue.next()
+        queue.refill().result()
+        fetched = self.server.requests[("GET", "tasks")]
+        queue.next()
+        self.assertEqual(self.server.requests[("GET", "tasks")], fetched)
+
+        # A handed-out task is forgotten once it is closed
+        self.C.patch_task(first["_id"], author="me", status="closed")
+        queue.refill().result()
+        self.assertNotIn(first["_id"], queue._handed_out)
+        self.assertEqual(len(queue._handed_out), 1)
+
+    def test_closed_queue_hands_out_buffered_tasks(self):
+        queue = self.C.task_queue("user0", "split", size=2, low_water=0, convert_states_to_json=False)
+        queue.refill().result()
+        queue.close()
+        self.assertIsNotNone(queue.next())
+        self.assertIsNotNone(queue.next())
+        with self.assertRaises(RuntimeError):
+            queue.next()
+
+
+class TestNeuvueClientEntityCache(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeNeuvueQueue().start()
+        self.server.populate(tasks=3, points_per_task=1)
+        self.task_id = next(iter(self.server.collections["tasks"]))
+        self.cache = neuvueclient.cache.EntityCache(ttl=60)
+        self.C = NeuvueQueue(self.server.url, local=True, entity_cache=self.cache)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _gets(self):
+        return self.server.requests[("GET", "tasks")]
+
+    def test_serves_repeat_reads(self):
+        task = self.C.get_task(self.task_id)
+        task["status"] = "mutated"
+        self.assertNotEqual(self.C.get_task(self.task_id)["status"], "mutated")
+        self.assertEqual(self._gets(), 1)
+        self.C.get_task(self.task_id, populate_points=True)
+        self.assertEqual(self._gets(), 2)
+
+    def test_revalidates_when_stale(self):
+        self.cache.ttl = 0
+        self.C.get_task(self.task_id)
+        self.C.get_task(self.task_id)
+        self.assertEqual(self.server.not_modified, 1)
+        self.assertEqual(self.cache.stats()["revalidations"], 1)
+
+    def test_invalidated_by_writes(self):
+        self.C.get_task(self.task_id)
+        self.C.patch_task(self.task_id, author="me", priority=99)
+        self.assertEqual(self.C.get_task(self.task_id)["priority"], 99)
+        self.C.delete_task(self.task_id)
+        with self.assertRaises(RuntimeError):
+            self.C.get_task(self.task_id)
+
+
+class TestNeuvueClientSession(unittest.TestCase):
+    def test_reuses_connections(self):
+        server, url = _serve()
+        try:
+            C = NeuvueQueue(url, local=True)
+            for _ in range(5):
+                C.get_tasks({"namespace": "split"})
+            stats = C.pool_stats()[f"http://127.0.0.1:{server.server_address[1]}"]
+            self.assertEqual(stats["requests"], 5)
+            self.assertEqual(stats["connections"], 1)
+            self.assertEqual(stats["reused"], 4)
+            C.close()
+        finally:
+            server.shutdown()
+
+
+class TestNeuvueClientDepaginate(unittest.TestCase):
+    def setUp(self):
+        self.records = [{"_id": f"{i:03d}"} for i in range(95)]
+        self.handler = _paged_handler(self.records)
+        self.server, url = _serve(self.handler)
+        self.C = NeuvueQueue(url, local=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_parallel_keeps_page_order(self):
+        result = self.C.depaginate("tasks", {}, pageSize=10, max_workers=4)
+        self.assertListEqual(result, self.records)
+
+    def test_parallel_honors_limit(self):
+        result = self.C.depaginate("tasks", {}, pageSize=10, max_workers=4, limit=25)
+        self.assertListEqual(result, self.records[:25])
+        self.assertLessEqual(max(self.handler.requested_pages), 3)
+
+    def test_limit_sizes_pages(self):
+        self.handler.requested_sizes = []
+        self.assertListEqual(self.C.depaginate("tasks", {}, limit=3), self.records[:3])
+        self.assertListEqual(self.handler.requested_sizes, [3])
+        self.handler.requested_sizes = []
+        self.assertListEqual(self.C.depaginate("tasks", {}, limit=23, pageSize=10), self.records[:23])
+        self.assertListEqual(self.handler.requested_sizes, [10, 10, 4])
+
+    def test_adaptive_page_size(self):
+        records = [{"_id": f"{i:05d}"} for i in range(3000)]
+        handler = _paged_handler(records)
+        handler.requested_sizes = []
+        server, url = _serve(handler)
+        try:
+            C = NeuvueQueue(url, local=True)
+            for pagination in ["offset", "cursor"]:
+                result = C.depaginate("tasks", {}, pageSize=100, page_bytes=8000, pagination=pagination)
+                self.assertListEqual(result, records)
+            self.assertGreater(max(handler.requested_sizes), 100)
+        finally:
+            server.shutdown()
+
+    def test_cursor(self):
+        self.handler.requested_pages = []
+        result = self.C.depaginate("tasks", {}, pageSize=10, pagination="cursor")
+        self.assertListEqual(result, self.records)
+        self.assertSetEqual(set(self.handler.requested_pages), {0})
+        result = self.C.depaginate("tasks", {}, pageSize=10, pagination="cursor", stream=True)
+        self.assertListEqual(result, self.records)
+        with self.assertRaises(ValueError):
+            self.C.depaginate("tasks", {}, pagination="cursor", max_workers=4)
 
-        result = C.get_questions(
-            {"author": f"random-user-{random.randint(1000, 2000)}", "active": False}
+
+class TestNeuvueClientIterators(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            {"_id": str(i), "created": 1600000000000 + i, "opened": None, "closed": None}
+            for i in range(25)
+        ]
+        self.server, url = _serve(_paged_handler(self.records))
+        self.C = NeuvueQueue(url, local=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_iter_records(self):
+        result = list(self.C.iter_tasks(pageSize=10, limit=12))
+        self.assertListEqual(result, self.records[:12])
+
+    def test_iter_frames(self):
+        frames = list(self.C.iter_tasks(pageSize=10, as_frames=True))
+        self.assertListEqual([len(f) for f in frames], [10, 10, 5])
+        self.assertEqual(str(frames[0].created.dtype)[:10], "datetime64")
+
+    def test_stream(self):
+        result = self.C.depaginate("tasks", {}, pageSize=10, stream=True)
+        self.assertListEqual(result, self.records)
+        self.assertListEqual(list(self.C.iter_tasks(pageSize=10, limit=12, stream=True)), self.records[:12])
+        frames = list(self.C.iter_tasks(pageSize=10, as_frames=True, stream=True))
+        self.assertListEqual([len(f) for f in frames], [10, 10, 5])
+        with self.assertRaises(ValueError):
+            self.C.depaginate("tasks", {}, stream=True, max_workers=4)
+
+    def test_json_array_parser(self):
+        body = json.dumps(self.records + [1.5, "é", [], 12345]).encode()
+        parsers = ["json"] + (["ijson"] if neuvueclient.stream.ijson is not None else [])
+        for parser in parsers:
+            for size in [1, 7, len(body)]:
+                chunks = [body[i:i + size] for i in range(0, len(body), size)]
+                self.assertListEqual(
+                    list(neuvueclient.stream.iter_json_array(chunks, parser)),
+                    self.records + [1.5, "é", [], 12345],
+                )
+            for bad in [b"[1, 2", b"{}", b"[1 2]"]:
+                with self.assertRaises(ValueError):
+                    list(neuvueclient.stream.iter_json_array([bad], parser))
+
+
+class TestNeuvueClientAsync(unittest.TestCase):
+    def setUp(self):
+        self.records = [{"_id": str(i), "created": 1600000000000 + i} for i in range(25)]
+        self.server, self.url = _serve(_paged_handler(self.records))
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_get_tasks(self):
+        async def run():
+            async with AsyncNeuvueQueue(self.url, local=True, max_concurrency=4) as C:
+                return await C.get_tasks(pageSize=10, max_workers=3, convert_states_to_json=False)
+
+        result = asyncio.run(run())
+        self.assertListEqual(list(result.index), [r["_id"] for r in self.records])
+
+    def test_rejects_stream(self):
+        async def run():
+            async with AsyncNeuvueQueue(self.url, local=True) as C:
+                await C.depaginate("tasks", {}, stream=True)
+
+        with self.assertRaises(TypeError):
+            asyncio.run(run())
+
+
+class TestNeuvueClientMetrics(unittest.TestCase):
+    def setUp(self):
+        self.records = [{"_id": str(i), "created": 1600000000000 + i} for i in range(25)]
+        self.server, self.url = _serve(_paged_handler(self.records))
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_aggregates_events(self):
+        events = []
+        C = NeuvueQueue(self.url, local=True, metrics=True, on_event=events.append)
+        C.get_tasks(pageSize=10)
+        summary = C.metrics.summary()
+        requests = summary[("request", "/tasks", "GET")]
+        self.assertEqual(requests["count"], 4)
+        self.assertGreater(requests["bytes_in"], 0)
+        self.assertEqual(summary[("decode", "tasks", "")]["count"], 4)
+        self.assertEqual(summary[("frame", "task", "")]["records"], 25)
+        self.assertEqual(len(events), 9)
+        text = C.metrics.prometheus()
+        self.assertIn('neuvueclient_seconds_count{kind="request",endpoint="/tasks",method="GET"} 4', text)
+
+    def test_bytes_in_without_content_length(self):
+        class _Unsized(_paged_handler(self.records)):
+            # Without a Content-Length, the end of the body is marked by closing the connection
+            protocol_version = "HTTP/1.0"
+
+            def send_header(self, keyword, value):
+                if keyword != "Content-Length":
+                    super().send_header(keyword, value)
+
+        server, url = _serve(_Unsized)
+        try:
+            events = []
+            C = NeuvueQueue(url, local=True, on_event=events.append)
+            C.get_tasks(pageSize=10)
+            C.get_tasks(pageSize=10, stream=True)
+        finally:
+            server.shutdown()
+        read, streamed = [
+            [e["bytes_in"] for e in events if e["kind"] == "request"][i:i + 4] for i in (0, 4)
+        ]
+        self.assertTrue(all(n > 0 for n in read))
+        self.assertEqual(streamed, [None] * 4)
+
+    def test_failing_hook(self):
+        def hook(event):
+            raise ValueError("broken")
+
+        C = NeuvueQueue(self.url, local=True, on_event=hook)
+        self.assertEqual(len(C.get_tasks(pageSize=10)), 25)
+
+    def test_endpoint_of(self):
+        self.assertEqual(
+            neuvueclient.metrics.endpoint_of("http://h/tasks/5f1d7f0e9b1e8a3c2d4b6a7f/status?x=1"),
+            "/tasks/{id}/status",
         )
 
-        self.assertListEqual(list(result.columns), C.dtype_columns("question"))
 
+class TestNeuvueClientStates(unittest.TestCase):
+    def test_fetches_each_state_once(self):
+        records = [{"_id": str(i), "ng_state": None} for i in range(20)]
+        handler = _paged_handler(records)
+        server, url = _serve(handler)
+        try:
+            for i, record in enumerate(records):
+                record["ng_state"] = f"{url}/state/{i % 3}"
+            C = NeuvueQueue(url, local=True, json_state_server_token="token")
+            result = C.get_tasks(state_workers=3)
+            self.assertEqual(len(handler.requested_states), 3)
+            self.assertEqual(json.loads(result.loc["4"].ng_state), {"state": "/state/1"})
+        finally:
+            server.shutdown()
 
-class TestNeuvueClientNodes(unittest.TestCase):
-    def test_empty_list(self):
-        C = NeuvueQueue(NVQ_URL)
 
-        result = C.get_nodes(
-            {"author": f"random-user-{random.randint(1000, 2000)}", "active": False}
+class TestNeuvueClientSelect(unittest.TestCase):
+    def test_projects_and_skips_states(self):
+        records = [
+            {"_id": str(i), "status": "open", "ng_state": f"/state/{i}", "created": 1600000000000}
+            for i in range(4)
+        ]
+        handler = _paged_handler(records)
+        handler.requested_states = []
+        server, url = _serve(handler)
+        try:
+            C = NeuvueQueue(url, local=True)
+            tasks = C.get_tasks(select=["status"])
+            self.assertListEqual(list(tasks.columns), ["status"])
+            self.assertListEqual(handler.requested_states, [])
+            frames = list(C.iter_tasks(select=["status", "created"], as_frames=True))
+            self.assertEqual(str(frames[0].created.dtype)[:10], "datetime64")
+            empty = C._build_frame("task", [], ["_id", "status", "assignee"])
+            self.assertListEqual(list(empty.columns), ["status", "assignee"])
+        finally:
+            server.shutdown()
+
+
+class TestNeuvueClientCompactFrames(unittest.TestCase):
+    def test_matches_default_frame(self):
+        records = [
+            {"_id": str(i), "status": ["open", "closed"][i % 2], "assignee": "you", "seg_id": str(10 ** 17 + i),
+             "priority": i % 3, "created": 1600000000000 + i, "opened": None if i % 2 else 1600000000000}
+            for i in range(100)
+        ]
+        default = NeuvueQueue("http://localhost", local=True)._build_frame("task", records)
+        compact = NeuvueQueue("http://localhost", local=True, compact_frames=True)._build_frame("task", records)
+        self.assertEqual(str(compact.status.dtype), "category")
+        self.assertEqual(str(compact.priority.dtype), "int8")
+        self.assertGreater(compact.attrs["memory_saved"], 0)
+        self.assertListEqual(list(compact.columns), list(default.columns))
+        for column in default.columns:
+            self.assertListEqual(
+                compact[column].astype(object).tolist(), default[column].astype(object).tolist(), column
+            )
+
+    def test_keeps_integer_ids_numeric(self):
+        records = [
+            {"_id": str(i), "seg_id": 864691135000000000 + i, "nucleus_id": i, "namespace": "ns"}
+            for i in range(10)
+        ]
+        default = NeuvueQueue("http://localhost", local=True)._build_frame("agents", records)
+        compact = NeuvueQueue("http://localhost", local=True, compact_frames=True)._build_frame("agents", records)
+        self.assertEqual(str(compact.seg_id.dtype), "int64")
+        self.assertEqual(str(compact.nucleus_id.dtype), "int8")
+        for column in ["seg_id", "nucleus_id"]:
+            self.assertListEqual(compact[column].tolist(), default[column].tolist(), column)
+
+
+@unittest.skipIf(neuvueclient.arrow.pa is None, "pyarrow is not installed")
+class TestNeuvueClientArrow(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            {"_id": str(i), "namespace": "ns", "status": "open", "points": [f"p{i}"],
+             "metadata": {"note": "x", "depth": i}, "created": 1600000000000 + i * 86400000}
+            for i in range(5)
+        ]
+        self.server, url = _serve(_paged_handler(self.records))
+        self.C = NeuvueQueue(url, local=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_table_keeps_nested_fields(self):
+        table = self.C.get_tasks(output="arrow", convert_states_to_json=False)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(str(table.schema.field("points").type), "list<item: string>")
+        self.assertEqual(str(table.schema.field("created").type), "timestamp[ms]")
+        frame = self.C.get_tasks(dtype_backend="pyarrow", convert_states_to_json=False)
+        self.assertEqual(str(frame.status.dtype), "string[pyarrow]")
+        self.assertListEqual(list(frame.index), [r["_id"] for r in self.records])
+
+    def test_export_partitions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(self.C.export_tasks(directory, pageSize=2), 5)
+            dataset = neuvueclient.arrow.pq.read_table(directory)
+            self.assertEqual(dataset.num_rows, 5)
+            self.assertIn("date", dataset.column_names)
+
+    def test_export_pages_share_a_schema(self):
+        records = [
+            {"_id": "a", "namespace": "ns", "priority": None, "metadata": None, "tags": None, "created": 1600000000000},
+            {"_id": "b", "namespace": "ns", "priority": 3, "metadata": {"n": 3}, "tags": ["x"], "created": 1600000000000},
+            {"_id": "c", "namespace": "ns", "priority": 1, "metadata": {"n": "three"}, "seg_id": 7, "created": 1600000000000},
+        ]
+        server, url = _serve(_paged_handler(records))
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                self.assertEqual(NeuvueQueue(url, local=True).export_tasks(directory, pageSize=1), 3)
+                dataset = neuvueclient.arrow.pq.read_table(directory).sort_by("_id")
+                self.assertEqual(str(dataset.schema.field("priority").type), "int64")
+                self.assertListEqual(dataset.column("metadata").to_pylist(), [None, '{"n": 3}', '{"n": "three"}'])
+                self.assertListEqual(dataset.column("seg_id").to_pylist(), [None, None, "7"])
+        finally:
+            server.shutdown()
+
+
+class TestNeuvueClientCodec(unittest.TestCase):
+    def test_codecs_agree(self):
+        doc = {"_id": "a", "big": 2 ** 70, "nested": [{"x": 1.5, "y": None}], "text": "\u00e9"}
+        for name in neuvueclient.codec.CODECS:
+            try:
+                codec = neuvueclient.codec.get_codec(name)
+            except ImportError:
+                continue
+            encoded = codec.dumps(doc)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(codec.loads(encoded), doc, name)
+            self.assertEqual(codec.loads(json.dumps(doc)), doc, name)
+        with self.assertRaises(ValueError):
+            neuvueclient.codec.get_codec("yaml")
+
+    def test_codecs_match_standard_library(self):
+        class Label(str):
+            pass
+
+        stdlib = neuvueclient.codec.JSONCodec()
+        payloads = [
+            {"a": float("nan"), "b": [float("inf"), None]},
+            {"opened": None, "label": Label("x"), "keys": {"1": (1, 2)}},
+            [{"coordinate": [1, 2, 3], "created": 1600000000000, "metadata": {}}] * 3,
+            {1: "int", 2.5: "float", False: "bool", None: "none"},
+        ]
+        refused = [{"when": datetime.datetime(2022, 1, 1)}, {"n": np.int64(3)}, {"d": datetime.date(2022, 1, 1)}]
+        for name in neuvueclient.codec.CODECS:
+            try:
+                codec = neuvueclient.codec.get_codec(name)
+            except ImportError:
+                continue
+            for payload in payloads:
+                self.assertEqual(
+                    json.dumps(json.loads(codec.dumps(payload))), json.dumps(json.loads(stdlib.dumps(payload))), name
+                )
+                self.assertEqual(
+                    json.dumps(codec.loads(stdlib.dumps(payload))), json.dumps(stdlib.loads(stdlib.dumps(payload))), name
+                )
+            for payload in refused:
+                with self.assertRaises(TypeError, msg=name):
+                    codec.dumps(payload)
+            if name != "json":
+                # Documents with None but no NaN stay with the fast library
+                self.assertEqual(codec.dumps({"opened": None, "note": "null"}), b'{"opened":null,"note":"null"}', name)
+
+    def test_client_uses_codec(self):
+        server, url = _serve(_paged_handler([{"_id": "1"}]))
+        try:
+            C = NeuvueQueue(url, local=True, json_codec="json")
+            self.assertEqual(C._codec.name, "json")
+            self.assertListEqual(C.depaginate("tasks", {}), [{"_id": "1"}])
+        finally:
+            server.shutdown()
+
+
+class TestNeuvueClientStateCache(unittest.TestCase):
+    def test_persists_across_clients(self):
+        records = [{"_id": str(i), "ng_state": None} for i in range(4)]
+        handler = _paged_handler(records)
+        server, url = _serve(handler)
+        try:
+            for i, record in enumerate(records):
+                record["ng_state"] = f"{url}/state/{i % 2}"
+            with tempfile.TemporaryDirectory() as directory:
+                for _ in range(2):
+                    C = NeuvueQueue(url, local=True, json_state_server_token="token", state_cache=directory)
+                    C.get_tasks()
+                self.assertEqual(len(handler.requested_states), 2)
+                self.assertEqual(C.state_cache.stats()["hits"], 2)
+        finally:
+            server.shutdown()
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = neuvueclient.StateCache(directory, max_disk_bytes=25, max_memory_bytes=0)
+            cache.put("a", "x" * 10)
+            cache.put("b", "x" * 10)
+            cache.get("a")
+            cache.put("c", "x" * 10)
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("a"))
+
+    def test_concurrent_puts_stay_within_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = neuvueclient.StateCache(directory, max_disk_bytes=500, max_memory_bytes=0)
+            threads = [
+                threading.Thread(target=lambda i=i: [cache.put(f"{i}-{j % 5}", "x" * 40) for j in range(20)])
+                for i in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            on_disk = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+            self.assertEqual(cache.stats()["disk_bytes"], on_disk)
+            self.assertLessEqual(on_disk, 500)
+
+
+class TestNeuvueClientStateUploads(unittest.TestCase):
+    def test_reuses_identical_uploads(self):
+        handler = _paged_handler([])
+        server, url = _serve(handler)
+        try:
+            C = NeuvueQueue(
+                url, local=True, json_state_server=f"{url}/nglstate/post",
+                json_state_server_token="token",
+                state_upload_index=neuvueclient.StateUploadIndex(None),
+            )
+            first = C.post_task("me", "you", 1, "ns", {}, ng_state='{"a": 1, "b": 2}')
+            second = C.post_task("me", "you", 1, "ns", {}, ng_state='{"b":2,"a":1}')
+            self.assertEqual(len(handler.posted_states), 1)
+            self.assertEqual(first["ng_state"], second["ng_state"])
+        finally:
+            server.shutdown()
+
+
+def _jwt(exp):
+    payload = json.dumps({"exp": exp}).encode()
+    return "e30." + base64.urlsafe_b64encode(payload).decode().rstrip("=") + ".sig"
+
+
+class _AuthHandler(_EmptyListHandler):
+    refreshes = 0
+    token = None
+    status = 200
+
+    def do_GET(self):
+        if self.headers.get("Authorization") != f"Bearer {type(self).token}":
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if type(self).status != 200:
+            self.send_response(type(self).status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.05)
+        type(self).refreshes += 1
+        type(self).token = _jwt(time.time() + 3600)
+        body = json.dumps({"access_token": type(self).token}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestNeuvueClientTokenRefresh(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("Handler", (_AuthHandler,), {})
+        self.server, self.url = _serve(self.handler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_expired_token_refreshed_once(self):
+        self.handler.token = _jwt(time.time() + 3600)
+        C = NeuvueQueue(self.url, token=True, refresh_token="r", access_token=_jwt(time.time() - 10))
+        threads = [threading.Thread(target=C.get_tasks, args=({"namespace": "split"},)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.handler.refreshes, 1)
+        self.assertEqual(C._access_token, self.handler.token)
+
+    def test_sync_and_async_share_refresh(self):
+        self.handler.token = _jwt(time.time() + 3600)
+        A = AsyncNeuvueQueue(self.url, token=True, refresh_token="r", access_token=_jwt(time.time() - 10))
+        threads = [threading.Thread(target=A._client.get_tasks, args=({"namespace": "split"},)) for _ in range(4)]
+
+        async def run():
+            async with A:
+                for t in threads:
+                    t.start()
+                await asyncio.gather(*[A.get_tasks({"namespace": "split"}) for _ in range(4)])
+
+        asyncio.run(run())
+        for t in threads:
+            t.join()
+        self.assertEqual(self.handler.refreshes, 1)
+
+    def test_no_refresh_on_server_error(self):
+        self.handler.token = _jwt(time.time() + 3600)
+        self.handler.status = 500
+        C = NeuvueQueue(self.url, token=True, refresh_token="r", access_token=self.handler.token)
+        with self.assertRaises(Exception):
+            C.get_tasks({"namespace": "split"})
+        self.assertEqual(self.handler.refreshes, 0)
+
+    def test_atomic_config_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "neuvuequeue.cfg")
+            config = configparser.ConfigParser()
+            config["CONFIG"] = {"access_token": "a", "refresh_token": "r"}
+            neuvueclient.utils.write_config(config, path)
+            self.assertEqual(os.listdir(directory), ["neuvuequeue.cfg"])
+            config.read(path)
+            self.assertEqual(config["CONFIG"]["access_token"], "a")
+
+
+class TestNeuvueClientPatch(unittest.TestCase):
+    def setUp(self):
+        self.task = {
+            "_id": "t1", "author": "me", "assignee": "you", "status": "pending",
+            "created": 1600000000000, "metadata": {"keep": 1},
+        }
+        self.handler = _paged_handler([self.task])
+        self.handler.patches = []
+        self.server, url = _serve(self.handler)
+        self.C = NeuvueQueue(url, local=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_combined_single_request(self):
+        self.C.patch_task("t1", author="me", combined=True, status="open", assignee="them", priority=3)
+        self.assertEqual(len(self.handler.patches), 1)
+        path, body = self.handler.patches[0]
+        self.assertEqual(path, "/tasks/t1")
+        self.assertEqual(body["priority"], 3)
+        self.assertTrue(body["overwrite_opened"])
+        self.assertEqual(body["metadata"]["keep"], 1)
+        self.assertEqual(body["metadata"]["provenance"][-1]["status"], "open")
+
+    def test_combined_falls_back_per_field(self):
+        self.handler.combined_patch = False
+        self.C.patch_task("t1", task=self.task, combined=True, status="open", priority=3)
+        self.assertSetEqual(
+            {path for path, _ in self.handler.patches},
+            {"/tasks/t1/status", "/tasks/t1/priority", "/tasks/t1/metadata"},
         )
-        self.assertListEqual(list(result.columns), C.dtype_columns("node"))
+        self.assertFalse(self.C._combined_patch_supported)
+        self.assertNotIn("provenance", self.task["metadata"])
+
+    def test_async_patches_fields_in_sync_order(self):
+        self.C.patch_task("t1", task=self.task, status="open", priority=3, assignee="them")
+        expected = [path for path, _ in self.handler.patches]
+
+        async def run():
+            async with AsyncNeuvueQueue(self.C._url, local=True) as A:
+                for _ in range(3):
+                    await A.patch_task("t1", task=self.task, status="open", priority=3, assignee="them")
+
+        self.handler.patches = []
+        asyncio.run(run())
+        self.assertListEqual([path for path, _ in self.handler.patches], expected * 3)
+
+
+class TestNeuvueClientPatchTasks(unittest.TestCase):
+    def test_reports_per_task(self):
+        tasks = [
+            {"_id": f"t{i}", "author": "me", "assignee": "you", "status": "pending",
+             "created": 1600000000000, "metadata": {}}
+            for i in range(6)
+        ]
+        handler = _paged_handler(tasks)
+        handler.patches = []
+        server, url = _serve(handler)
+        try:
+            C = NeuvueQueue(url, local=True)
+            frame = C._build_frame("task", tasks)
+            metadata = {"reason": "sprint over"}
+            report = C.patch_tasks(frame, "me", combined=True, status="closed", metadata=metadata)
+            self.assertTrue(report.success.all())
+            self.assertEqual(len(handler.patches), 6)
+            self.assertNotIn("provenance", metadata)
+            self.assertEqual(handler.patches[0][1]["metadata"]["provenance"][0]["createdAt"], 1600000000000)
+
+            report = C.patch_tasks(["t1"], "me")
+            self.assertTrue(report.success.all())
+        finally:
+            server.shutdown()
+
+    def test_rows_without_metadata(self):
+        tasks = [
+            {"_id": "t0", "author": "me", "assignee": "you", "status": "pending", "created": 1600000000000, "metadata": {"keep": 1}},
+            {"_id": "t1", "author": "me", "assignee": "you", "status": "pending", "created": 1600000000000},
+        ]
+        handler = _paged_handler(tasks)
+        handler.patches = []
+        server, url = _serve(handler)
+        try:
+            C = NeuvueQueue(url, local=True)
+            frame = C.get_tasks(convert_states_to_json=False)
+            self.assertTrue(frame.metadata.isna().any())
+            report = C.patch_tasks(frame, "me", status="open")
+            self.assertTrue(report.success.all(), report.error.tolist())
+            C.patch_task("t1", author="me", task=frame.loc["t1"], status="closed")
+            self.assertEqual(handler.patches[-1][1]["metadata"]["provenance"][-1]["status"], "closed")
+        finally:
+            server.shutdown()
+
+
+class TestNeuvueClientPostPoints(unittest.TestCase):
+    def test_ids_align_with_rows(self):
+        server, url = _serve(_paged_handler([]))
+        try:
+            C = NeuvueQueue(url, local=True)
+            coordinates = np.column_stack([np.arange(25), np.zeros(25), np.ones(25)]).astype(np.int64)
+            ids = C.post_points(coordinates, "me", "ns", "synapse", chunk_size=10)
+            self.assertListEqual(list(ids), [f"id-{i}" for i in range(25)])
+        finally:
+            server.shutdown()
+
+    def test_rejects_bad_shape(self):
+        C = NeuvueQueue("http://localhost", local=True)
+        with self.assertRaises(ValueError):
+            C.post_points(np.zeros((4, 2)), "me", "ns", "synapse")
+
+    def test_empty_cells_use_shared_arguments(self):
+        C = NeuvueQueue("http://localhost", local=True)
+        frame = pd.DataFrame({
+            "x": [1, 2], "y": [0, 0], "z": [0, 0],
+            "resolution": [4, np.nan], "metadata": [{"a": 1}, np.nan], "type": [None, "soma"],
+        })
+        _, points = C._new_points(frame, "me", "ns", "synapse", 2, {"b": 2})
+        self.assertEqual([p["resolution"] for p in points], [4, 2])
+        self.assertEqual([p["metadata"] for p in points], [{"a": 1}, {"b": 2}])
+        self.assertEqual([p["type"] for p in points], ["synapse", "soma"])
+
+
+class TestNeuvueClientDeleteTasks(unittest.TestCase):
+    def setUp(self):
+        self.handler = _paged_handler([])
+        self.handler.deletes = []
+        self.server, url = _serve(self.handler)
+        self.C = NeuvueQueue(url, local=True)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_reports_partial_failure(self):
+        report = self.C.delete_tasks(["a", "b", "missing", "c"], max_workers=4)
+        self.assertListEqual(list(report.success), [True, True, False, True])
+        self.assertEqual(len(self.handler.deletes), 3)
+
+    def test_bulk_chunks(self):
+        report = self.C.delete_agents([str(i) for i in range(5)], bulk=True, chunk_size=2)
+        self.assertTrue(report.success.all())
+        self.assertEqual(len(report), 5)
+        self.assertEqual(len(self.handler.deletes), 3)
+
+    def test_bulk_falls_back(self):
+        self.handler.bulk_delete = False
+        report = self.C.delete_tasks(["a", "b"], bulk=True)
+        self.assertTrue(report.success.all())
+        self.assertListEqual(sorted(self.handler.deletes), ["/tasks/a", "/tasks/b"])
+        self.assertFalse(self.C._bulk_delete_supported["tasks"])
+
+    def test_bulk_needs_a_deleted_count(self):
+        self.handler.deleted_count = False
+        report = self.C.delete_tasks([str(i) for i in range(5)], bulk=True, chunk_size=2)
+        self.assertTrue(report.success.all())
+        # One unverified bulk request, then one request per remaining task
+        self.assertEqual(len(self.handler.deletes), 4)
+        self.assertFalse(self.C._bulk_delete_supported["tasks"])
+
+        async def run():
+            async with AsyncNeuvueQueue(self.C._url, local=True) as A:
+                return await A.delete_tasks([str(i) for i in range(5)], bulk=True, chunk_size=2)
+
+        self.handler.deletes = []
+        self.assertTrue(asyncio.run(run()).success.all())
+        self.assertEqual(len(self.handler.deletes), 4)
+
+    def test_bulk_leftovers_share_one_pool(self):
+        class _Once(self.handler):
+            # Bulk deletes stop reporting a count after the first, and delete nothing
+            def do_DELETE(self):
+                super().do_DELETE()
+                if "?" in self.path:
+                    type(self).deleted_count = False
+
+            def do_GET(self):
+                params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                chunk = json.loads(params["q"][0])["_id"]["$in"]
+                self._reply([{"_id": _id} for _id in chunk] if params["p"][0] == "0" else [])
+
+        server, url = _serve(_Once)
+        try:
+            C = NeuvueQueue(url, local=True)
+            _map, depth, deepest = C._map, [0], [0]
+
+            def tracking(func, items, max_workers):
+                depth[0] += 1
+                deepest[0] = max(deepest[0], depth[0])
+                try:
+                    return _map(func, items, max_workers)
+                finally:
+                    depth[0] -= 1
+
+            C._map = tracking
+            report = C.delete_tasks([str(i) for i in range(9)], bulk=True, chunk_size=2, max_workers=4)
+        finally:
+            server.shutdown()
+        self.assertListEqual(list(report.index), [str(i) for i in range(9)])
+        self.assertTrue(report.success.all())
+        # Every chunk in bulk, then the seven tasks of the uncounted chunks one by one
+        self.assertEqual(len(self.handler.deletes), 12)
+        self.assertEqual(deepest[0], 1)
+
+    def test_sieve_defaults_to_active(self):
+        with FakeNeuvueQueue() as server:
+            server.insert("tasks", [{"namespace": "ns"}, {"namespace": "ns", "active": False}])
+            C = NeuvueQueue(server.url, local=True)
+            report = C.delete_tasks(sieve={"namespace": "ns"}, bulk=True)
+            self.assertEqual(len(report), 1)
+            self.assertEqual(len(server.collections["tasks"]), 1)
+
+
+class TestNeuvueClientTaskMirror(unittest.TestCase):
+    def test_pulls_only_changes(self):
+        records = [
+            {"_id": str(i), "namespace": "ns", "active": True, "status": "pending",
+             "created": 1600000000000 + i, "opened": None, "closed": None}
+            for i in range(5)
+        ]
+        queries = []
+
+        class Handler(_paged_handler(records)):
+            def do_GET(self):
+                params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                sieve = json.loads(params["q"][0])
+                page = int(params["p"][0])
+                queries.append(sieve)
+                matches = records
+                if "$or" in sieve:
+                    matches = [
+                        r for r in records
+                        if any((r[k] or 0) > cond[k]["$gt"] for cond in sieve["$or"] for k in cond)
+                    ]
+                self._reply(matches if page == 0 else [])
+
+        server, url = _serve(Handler)
+        try:
+            C = NeuvueQueue(url, local=True)
+            with tempfile.TemporaryDirectory() as directory:
+                path = f"{directory}/mirror.pkl"
+                self.assertEqual(len(C.sync_tasks({"namespace": "ns"}, path=path, overlap=0)), 5)
+                records[2] = dict(records[2], status="open", opened=1600000001000)
+                records.append(dict(records[0], _id="5", created=1600000002000))
+
+                result = neuvueclient.TaskMirror(C, {"namespace": "ns"}, path=path, overlap=0).refresh()
+                self.assertEqual(len(result), 6)
+                self.assertEqual(result.loc["2"].status, "open")
+                self.assertIn("$or", queries[-1])
+                self.assertEqual(queries[-1]["namespace"], "ns")
+        finally:
+            server.shutdown()
+
+    def test_drops_tasks_that_left_the_sieve(self):
+        with FakeNeuvueQueue() as server:
+            server.populate(tasks=12, namespaces=["split"], assignees=1)
+            C = NeuvueQueue(server.url, local=True)
+            depaginate, queries = C.depaginate, []
+            C.depaginate = lambda datatype, sieve, **kwargs: queries.append(sieve) or depaginate(datatype, sieve, **kwargs)
+            sieve = {"assignee": "user0", "status": {"$in": ["open", "pending"]}}
+            mirror = neuvueclient.TaskMirror(C, sieve, overlap=0, convert_states_to_json=False)
+            mirrored = list(mirror.refresh().index)
+            closed, reassigned, deleted = mirrored[:3]
+
+            C.patch_task(closed, author="me", status="closed")
+            tasks = server.collections["tasks"]
+            tasks[reassigned] = dict(tasks[reassigned], assignee="user1")
+            del tasks[deleted]
+            server._results.clear()
+
+            self.assertNotIn(closed, mirror.refresh().index)
+            self.assertEqual(len(mirror.frame), len(mirrored) - 1)
+            result = mirror.refresh(reconcile=True)
+            self.assertListEqual(sorted(result.index), sorted(mirrored[3:]))
+            deltas = [query for query in queries if "$or" in query]
+            self.assertTrue(deltas)
+            self.assertTrue(all(query.get("assignee") == "user0" for query in deltas))
+
+            # Without equality conditions to scope by, only the mirrored tasks are listed
+            unscoped = neuvueclient.TaskMirror(C, {"status": "pending"}, overlap=0, convert_states_to_json=False)
+            unscoped.id_chunk_size = 2
+            unscoped.refresh()
+            del queries[:]
+            unscoped.refresh()
+            listed = [query["_id"]["$in"] for query in queries if "_id" in query]
+            self.assertEqual(sorted(sum(listed, [])), sorted(unscoped.frame.index))
+
+    def test_sync_tasks_keys_mirrors_by_arguments(self):
+        with FakeNeuvueQueue() as server:
+            server.populate(tasks=4, namespaces=["split"], assignees=1)
+            C = NeuvueQueue(server.url, local=True)
+            sieve = {"namespace": "split"}
+            self.assertIn("ng_state", C.sync_tasks(sieve, convert_states_to_json=False).columns)
+            selected = C.sync_tasks(sieve, convert_states_to_json=False, select=["status"])
+            self.assertNotIn("ng_state", selected.columns)
+            self.assertEqual(len(C._task_mirrors), 2)
+
+
+class TestNeuvueClientLocalStore(unittest.TestCase):
+    def setUp(self):
+        records = [
+            {"_id": f"p{i}", "namespace": "ns", "type": "ab"[i % 2], "created": 1600000000000 + i, "active": True}
+            for i in range(6)
+        ]
+        self.handler = _paged_handler(records)
+        self.handler.requested_pages = []
+        self.server, url = _serve(self.handler)
+        self.C = NeuvueQueue(url, local=True, local_store=neuvueclient.LocalStore(None))
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_answers_narrower_sieves_locally(self):
+        self.assertEqual(len(self.C.get_points({"namespace": "ns"})), 6)
+        fetched = len(self.handler.requested_pages)
+        points = self.C.get_points({"namespace": "ns", "type": "b", "created": {"$gte": 1600000000003}})
+        self.assertListEqual(list(points.index), ["p3", "p5"])
+        self.assertEqual(len(self.handler.requested_pages), fetched)
+
+        self.C.patch_point("p3", agents_status="done")
+        self.C.get_points({"namespace": "ns", "type": "b"})
+        self.assertGreater(len(self.handler.requested_pages), fetched)
+
+    def test_async_broadcast_stores_a_single_task(self):
+        class _Single(self.handler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                self._reply(dict(body[0], _id="t1"))
+
+        server, url = _serve(_Single)
+
+        async def run():
+            async with AsyncNeuvueQueue(url, local=True, local_store=neuvueclient.LocalStore(None)) as A:
+                await A.post_task_broadcast("me", ["a"], 1, "ns", {"prompt": "x"}, post_state=False)
+                return A._client.local_store.stats()["documents"]["tasks"]
+
+        try:
+            self.assertEqual(asyncio.run(run()), 1)
+        finally:
+            server.shutdown()
+
+    def test_unsupported_operators_go_to_server(self):
+        store = neuvueclient.LocalStore(None)
+        store.load("tasks", {}, [{"_id": "t1", "status": "open", "priority": 2}])
+        self.assertEqual(len(store.query("tasks", {"status": {"$in": ["open"]}, "priority": {"$lt": 3}})), 1)
+        self.assertIsNone(store.query("tasks", {"instructions": {"$regex": "x"}}))
+        self.assertIsNone(store.query("points", {}))
+
+    def test_reload_drops_documents_that_left_the_sieve(self):
+        store = neuvueclient.LocalStore(None)
+        store.load("tasks", {"status": "open"}, [{"_id": "a", "status": "open"}, {"_id": "b", "status": "open"}])
+        store.load("tasks", {"status": "open"}, [{"_id": "b", "status": "open"}])
+        self.assertListEqual([d["_id"] for d in store.query("tasks", {"status": "open"})], ["b"])
 
+        store.load("tasks", {}, [{"_id": "c", "status": "open"}, {"_id": "d"}])
+        found = store.query("tasks", {"status": {"$nin": ["closed"]}})
+        self.assertListEqual([d["_id"] for d in found], ["c", "d"])
@@ -0,0 +1,443 @@
+"""
+# neuvueclient.testing
+
+An in-process stand-in for a NeuvueQueue server, for tests and benchmarks
+that must not depend on a live deployment.
+
+```python
+with FakeNeuvueQueue() as server:
+    server.populate(tasks=1000, points_per_task=2, states=10)
+    C = NeuvueQueue(server.url, local=True, json_state_server=server.state_server)
+    C.get_tasks({"namespace": "split"})
+```
+
+The server holds `tasks`, `points`, `differstacks` and `agents` in memory and
+implements what the client uses:
+
+- `GET /{collection}` with `q` (sieve), `p`, `pageSize`, `sort`, `select`
+  and `populate` (`points` on tasks)
+- `GET` (with `ETag`/`If-None-Match`), `PATCH` and `DELETE /{collection}/{id}`,
+  per-field `PATCH /{collection}/{id}/{field}`, and bulk
+  `DELETE /{collection}?q=...`
+- `POST /{collection}` with one document or a list
+- `POST /auth/tokens`, issuing JWT access tokens that expire after
+  `token_ttl` seconds (enforced when `require_auth` is set)
+- `POST /nglstate/post` and `GET /nglstate/{n}`, a neuroglancer state server
+
+Sieves are evaluated with `neuvueclient.store.matches`. `latency` delays every
+response and `error_rate` answers that fraction of requests with a 500, to
+exercise retries and timeouts. Every request is counted in `requests`.
+
+Run `python -m neuvueclient.testing --tasks 100000` to serve from another
+process (so that the server does not compete with the client for the GIL);
+the URL is printed on the first line.
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+from .store import COLLECTIONS, UnsupportedSieve, matches, sort_documents
+
+# Fields that reference documents of another collection, for `populate`
+POPULATE = {"tasks": {"points": "points"}}
+
+
+def make_token(exp: float, sub: str = "fake-user") -> str:
+    """
+    Create an unsigned JWT with the given `exp` claim.
+    """
+    def encode(claims: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode({'sub': sub, 'exp': int(exp)})}."
+
+
+class FakeNeuvueQueue:
+    """
+    neuvueclient.testing.FakeNeuvueQueue serves NeuvueQueue's REST API from
+    memory on a local port.
+
+    See neuvueclient/testing.py for more documentation.
+
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0,
+        error_rate: float = 0,
+        max_page_size: int = None,
+        require_auth: bool = False,
+        token_ttl: float = 3600,
+        etags: bool = True,
+        seed: int = 0,
+    ) -> None:
+        """
+        Create a new fake server. Call `start` (or use it as a context manager)
+        to begin serving.
+
+        Arguments:
+            host (str: "127.0.0.1"): Interface to listen on
+            port (int: 0): Port to listen on; 0 picks a free one
+            latency (float: 0): Seconds to wait before every response
+            error_rate (float: 0): Fraction of requests answered with a 500
+            max_page_size (int: None): Cap on `pageSize`, like a real deployment's
+            require_auth (bool: False): Answer 401 unless the request carries an
+                unexpired access token issued by `/auth/tokens`
+            token_ttl (float: 3600): Seconds until issued access tokens expire
+            etags (bool: True): Send an `ETag` with single documents and answer a
+                matching `If-None-Match` with 304 Not Modified
+            seed (int: 0): Seed for error injection and generated data
+
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.require_auth = require_auth
+        self.token_ttl = token_ttl
+        self.etags = etags
+        self.collections: Dict[str, Dict[str, dict]] = {c: {} for c in COLLECTIONS}
+        self.states: List[str] = []
+        self.tokens: Dict[str, float] = {}
+        self.refreshes = 0
+        self.not_modified = 0
+        self.requests: collections.Counter = collections.Counter()
+        self._random = random.Random(seed)
+        self._next_id = 0
+        self._lock = threading.RLock()
+        # Filtered and sorted results per (collection, sieve, sort), until the next write
+        self._results: Dict[Tuple[str, str, str], List[dict]] = {}
+        self._server = http.server.ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state_server(self) -> str:
+        """
+        The URL to pass to `NeuvueQueue` as `json_state_server`.
+        """
+        return f"{self.url}/nglstate/post"
+
+    def start(self) -> "FakeNeuvueQueue":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
+
+    def __enter__(self) -> "FakeNeuvueQueue":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def issue_token(self, ttl: float = None) -> str:
+        """
+        Issue an access token accepted until it expires.
+        """
+        exp = time.time() + (self.token_ttl if ttl is None else ttl)
+        token = make_token(exp, sub=f"fake-user-{len(self.tokens)}")
+        with self._lock:
+            self.tokens[token] = exp
+        return token
+
+    def _new_id(self) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f"{self._next_id:024x}"
+
+    def insert(self, collection: str, docs: List[dict]) -> List[dict]:
+        """
+        Add documents, filling in `_id`, `active` and `created` like the server.
+
+        Returns:
+            List[dict]: The stored documents
+
+        """
+        now = int(time.time() * 1000)
+        stored = []
+        with self._lock:
+            for doc in docs:
+                doc = dict(doc)
+                doc.setdefault("_id", self._new_id())
+                doc.setdefault("active", True)
+                doc.setdefault("created", now)
+                doc.setdefault("__v", 0)
+                self.collections[collection][doc["_id"]] = doc
+                stored.append(doc)
+            self._results.clear()
+        return stored
+
+    def add_state(self, state: str) -> str:
+        """
+        Store a neuroglancer state and return its URL.
+        """
+        with self._lock:
+            self.states.append(state)
+            return f"{self.url}/nglstate/{len(self.states)}"
+
+    def populate(
+        self,
+        tasks: int = 0,
+        points_per_task: int = 0,
+        states: int = 0,
+        state_bytes: int = 2000,
+        namespaces: List[str] = ("split", "merge"),
+        assignees: int = 50,
+    ) -> None:
+        """
+        Generate realistic documents: tasks spread over namespaces, assignees
+        and statuses, each with its own points and one of `states` shared states.
+
+        Arguments:
+            tasks (int: 0): Number of tasks to create
+            points_per_task (int: 0): Points created (and referenced) per task
+            states (int: 0): Number of distinct neuroglancer states to share
+            state_bytes (int: 2000): Approximate size of each state
+            namespaces (List[str]: ("split", "merge")): Namespaces to spread tasks over
+            assignees (int: 50): Number of distinct assignees
+
+        """
+        urls = [
+            self.add_state(json.dumps({"layers": [{"source": f"precomputed://{i}/" + "x" * state_bytes}]}))
+            for i in range(states)
+        ]
+        created = 1600000000000
+        points = self.insert("points", [
+            {
+                "coordinate": [i, i, i], "author": "fake", "type": "fake", "namespace": namespaces[0],
+                "submitted": False, "agents_status": None, "metadata": {}, "created": created + i,
+            }
+            for i in range(tasks * points_per_task)
+        ])
+        statuses = ["pending", "pending", "open", "closed"]
+        self.insert("tasks", [
+            {
+                "author": "fake",
+                "assignee": f"user{i % assignees}",
+                "namespace": namespaces[i % len(namespaces)],
+                "status": self._random.choice(statuses),
+                "priority": self._random.randint(0, 10),
+                "duration": 0,
+                "instructions": {"prompt": "Proofread this segment"},
+                "metadata": {"provenance": []},
+                "points": [p["_id"] for p in points[i * points_per_task:(i + 1) * points_per_task]],
+                "seg_id": str(864691135000000000 + i),
+                "ng_state": urls[i % len(urls)] if urls else None,
+                "created": created + i,
+                "opened": None,
+                "closed": None,
+            }
+            for i in range(tasks)
+        ])
+
+    def query(self, collection: str, sieve: dict, sort: List[str] = None) -> List[dict]:
+        """
+        Get every document of a collection matching a sieve, in `sort` order
+        (insertion order by default).
+        """
+        after = None
+        _id = sieve.get("_id")
+        if isinstance(_id, dict) and list(_id) == ["$gt"]:
+            # Cursor pages differ only in their `_id` bound; share the filtered result
+            sieve = {k: v for k, v in sieve.items() if k != "_id"}
+            after = _id["$gt"]
+        key = (collection, json.dumps(sieve, sort_keys=True), json.dumps(sort))
+        with self._lock:
+            results = self._results.get(key)
+            if results is None:
+                docs = [d for d in self.collections[collection].values() if matches(d, sieve)]
+                results = self._results[key] = sort_documents(docs, sort)
+        if after is not None:
+            results = [d for d in results if d["_id"] > after]
+        return results
+
+    def _populate(self, collection: str, docs: List[dict], fields: List[str]) -> List[dict]:
+        references = POPULATE.get(collection, {})
+        populated = []
+        for doc in docs:
+            doc = dict(doc)
+            for field in fields:
+                if field in references and isinstance(doc.get(field), list):
+                    store = self.collections[references[field]]
+                    doc[field] = [store.get(i, i) for i in doc[field]]
+            populated.append(doc)
+        return populated
+
+    def handle(self, method: str, path: str, body: bytes, headers: dict) -> Tuple[int, Any]:
+        """
+        Answer one request.
+
+        Returns:
+            Tuple[int, Any]: The status code and a JSON-serializable body (or a
+                str for state server responses)
+
+        """
+        url = urllib.parse.urlsplit(path)
+        parts = [urllib.parse.unquote(p) for p in url.path.split("/") if p]
+        params = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        self.requests[(method, parts[0] if parts else "")] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return 500, {"message": "Injected error"}
+
+        if parts == ["auth", "tokens"] and method == "POST":
+            with self._lock:
+                self.refreshes += 1
+            return 200, {"access_token": self.issue_token(), "refresh_token": "fake-refresh-token"}
+        if parts[:1] == ["nglstate"]:
+            if method == "POST":
+                return 200, self.add_state(body.decode("utf-8"))
+            index = int(parts[1]) - 1 if len(parts) == 2 and parts[1].isdigit() else -1
+            if not 0 <= index < len(self.states):
+                return 404, {"message": "No such state"}
+            return 200, self.states[index]
+
+        if self.require_auth:
+            token = headers.get("Authorization", "")[len("Bearer "):]
+            if self.tokens.get(token, 0) < time.time():
+                return 401, {"message": "Invalid or expired token"}
+
+        if not parts or parts[0] not in self.collections:
+            return 404, {"message": f"Unknown endpoint {url.path}"}
+        collection = parts[0]
+        docs = self.collections[collection]
+
+        if len(parts) == 1:
+            try:
+                sieve = json.loads(params.get("q") or "{}")
+                if method == "GET":
+                    return 200, self._list(collection, sieve, params)
+                if method == "POST":
+                    payload = json.loads(body)
+                    stored = self.insert(collection, payload if isinstance(payload, list) else [payload])
+                    return 200, stored if isinstance(payload, list) else stored[0]
+                if method == "DELETE":
+                    with self._lock:
+                        deleted = self.query(collection, sieve)
+                        for doc in deleted:
+                            docs.pop(doc["_id"], None)
+                        self._results.clear()
+                    return 200, {"deletedCount": len(deleted)}
+            except UnsupportedSieve as e:
+                return 400, {"message": f"Unsupported sieve operator {e}"}
+            return 405, {"message": f"{method} not allowed"}
+
+        _id = parts[1]
+        if _id not in docs:
+            return 404, {"message": f"No {collection} document with _id {_id}"}
+        if method == "GET":
+            return 200, docs[_id]
+        if method == "DELETE":
+            with self._lock:
+                del docs[_id]
+                self._results.clear()
+            return 200, {}
+        if method == "PATCH":
+            changes = json.loads(body)
+            if len(parts) == 3 and parts[2] not in changes:
+                return 400, {"message": f"Body must set {parts[2]}"}
+            with self._lock:
+                doc = dict(docs[_id])
+                doc.update({k: v for k, v in changes.items() if not k.startswith("overwrite_")})
+                now = int(time.time() * 1000)
+                if changes.get("status") == "open" and (doc.get("opened") is None or changes.get("overwrite_opened")):
+                    doc["opened"] = now
+                if changes.get("status") == "closed":
+                    doc["closed"] = now
+                docs[_id] = doc
+                self._results.clear()
+            return 200, doc
+        return 405, {"message": f"{method} not allowed"}
+
+    def _list(self, collection: str, sieve: dict, params: dict) -> List[dict]:
+        sort = [s for s in (params.get("sort") or "").split(",") if s]
+        page = int(params.get("p", 0))
+        size = int(params.get("pageSize", 15000))
+        if self.max_page_size:
+            size = min(size, self.max_page_size)
+        results = self.query(collection, sieve, sort)[page * size:(page + 1) * size]
+        if params.get("populate"):
+            results = self._populate(collection, results, params["populate"].split(","))
+        if params.get("select"):
+            fields = set(params["select"].split(",")) | {"_id"}
+            results = [{k: v for k, v in d.items() if k in fields} for d in results]
+        return results
+
+
+def _handler(server: FakeNeuvueQueue):
+    class _Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            status, payload = server.handle(self.command, self.path, body, self.headers)
+            if isinstance(payload, str) and self.path.startswith("/nglstate/") and self.command == "GET":
+                data = payload.encode("utf-8")
+            else:
+                data = json.dumps(payload).encode("utf-8")
+            etag = None
+            if server.etags and self.command == "GET" and status == 200 and isinstance(payload, dict):
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    status, data = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _respond
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return _Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake NeuvueQueue until interrupted.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--tasks", type=int, default=0)
+    parser.add_argument("--points-per-task", type=int, default=0)
+    parser.add_argument("--states", type=int, default=0)
+    parser.add_argument("--state-bytes", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakeNeuvueQueue(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    server.populate(args.tasks, args.points_per_task, args.states, args.state_bytes)
+    print(server.url, flush=True)
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
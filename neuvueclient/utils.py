@@ -1,10 +1,14 @@
+import base64
+import configparser
 import datetime
 import requests
 import backoff
 import networkx as nx
 import os
 import json 
+import tempfile
 
+from requests.adapters import HTTPAdapter
 from typing import Optional
 
 
@@ -86,6 +90,113 @@ def is_json(value):
     except:
         return False
 
+def create_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+) -> requests.Session:
+    """
+    Create a session whose connections are pooled and kept alive between requests.
+
+    The underlying urllib3 pools are thread-safe, so a single session can be
+    shared by every thread of a client.
+
+    Arguments:
+        pool_connections (int: 10): Number of per-host connection pools to keep
+        pool_maxsize (int: 10): Maximum number of connections kept alive per host
+        pool_block (bool: False): Block when a host's pool is exhausted instead of
+            opening a connection that is discarded afterwards
+        keep_alive (bool: True): Reuse connections between requests
+
+    Returns:
+        requests.Session
+
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+def session_pool_stats(session: requests.Session) -> dict:
+    """
+    Summarize the connection pools of every adapter mounted on a session.
+
+    Arguments:
+        session (requests.Session): The session to inspect
+
+    Returns:
+        dict: `{"scheme://host:port": {"requests", "connections", "reused", "idle", "maxsize"}}`
+
+    """
+    stats = {}
+    adapters = {id(a): a for a in session.adapters.values()}.values()
+    for adapter in adapters:
+        poolmanager = getattr(adapter, "poolmanager", None)
+        if poolmanager is None:
+            continue
+        for key in poolmanager.pools.keys():
+            try:
+                pool = poolmanager.pools[key]
+            except KeyError:
+                # Evicted between listing and lookup
+                continue
+            stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(pool.num_requests - pool.num_connections, 0),
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+            }
+    return stats
+
+def token_expiry(token: str) -> Optional[float]:
+    """
+    Read the `exp` claim (seconds since the epoch) of a JWT access token.
+
+    The signature is not verified; the claim is only used to schedule refreshes.
+
+    Arguments:
+        token (str): The access token
+
+    Returns:
+        float: The expiry time, or None if the token is not a JWT with an `exp` claim
+
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def write_config(config: configparser.ConfigParser, path: str) -> None:
+    """
+    Write a config file atomically, so that concurrent readers (and other
+    processes sharing the file) never see it half written.
+    """
+    path = os.path.expanduser(path)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as configfile:
+            config.write(configfile)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
 def get_caveclient_token():
     # Get the authorization token from caveclient
     token_file = os.path.expanduser('~/.cloudvolume/secrets/cave-secret.json')
@@ -94,7 +205,7 @@ def get_caveclient_token():
             return json.load(f).get("token")
     
 @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-def post_to_state_server(state: str, json_state_server:str, json_state_server_token:str=None, public:bool=False): 
+def post_to_state_server(state: str, json_state_server:str, json_state_server_token:str=None, public:bool=False, session:requests.Session=None, cache=None, codec=None): 
     """Posts JSON string to state server
 
     Args:
@@ -102,6 +213,9 @@ def post_to_state_server(state: str, json_state_server:str, json_state_server_to
         json_state_server (str): NG State Server string
         json_state_server_token (str): Token for NG State server (optional)
         public (bool): boolean for public access of NG State Server (default:False)
+        session (requests.Session): Session to send the request through (optional)
+        cache (neuvueclient.cache.StateCache): Cache to seed with the posted state (optional)
+        codec (neuvueclient.codec.JSONCodec): Codec to decode the response with (optional)
     
     Returns:
         str: url string
@@ -118,29 +232,40 @@ def post_to_state_server(state: str, json_state_server:str, json_state_server_to
             print(f"Unable to post private neuroglancer state to {json_state_server} without `json_state_server_token` defined")
 
     # Post! 
-    resp = requests.post(json_state_server, data=state, headers=headers)
+    resp = (session or requests).post(json_state_server, data=state, headers=headers)
 
     if resp.status_code != 200:
         print(f"Unable to post neuroglancer state to {json_state_server}. Error code: {resp.status_code}")
         return
     
     # Response will contain the URL for the state you just posted
+    body = codec.loads(resp.content) if codec is not None else resp.json()
     if public:
-        return str(resp.json()['url'])
+        url = str(body['url'])
     else:
-        return str(resp.json())
+        url = str(body)
+    if cache is not None:
+        cache.put(url, state)
+    return url
 
 @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-def get_from_state_server(url:str, json_state_server_token:str=None, public:bool=False):
+def get_from_state_server(url:str, json_state_server_token:str=None, public:bool=False, session:requests.Session=None, cache=None):
     """Gets JSON state string from state server
 
     Args:
         url (str): json state server link
         json_state_server_token (str): Token for NG State server (optional)
         public (bool): boolean for public access of NG State Server (default:False)
+        session (requests.Session): Session to send the request through (optional)
+        cache (neuvueclient.cache.StateCache): Cache consulted before, and filled after, the request (optional)
     Returns:
         (str): JSON String 
     """
+    if cache is not None:
+        cached = cache.get(url)
+        if cached is not None:
+            return cached
+
     headers = {
         'content-type': 'application/json',
     }
@@ -151,13 +276,16 @@ def get_from_state_server(url:str, json_state_server_token:str=None, public:bool
         else:
             print(f"Unable to get private neuroglancer state at {url} without `json_state_server_token` defined")
 
-    resp = requests.get(url, headers=headers)
+    resp = (session or requests).get(url, headers=headers)
     if resp.status_code != 200:
         print(f"Unable to get neuroglancer state from {url}. Error code: {resp.status_code}")
         return url
     
     # TODO: Make sure its JSON String
-    return resp.text.strip()
+    state = resp.text.strip()
+    if cache is not None:
+        cache.put(url, state)
+    return state
 
 def create_new_provenance(task, copy=False):
     if copy:
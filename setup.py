@@ -35,6 +35,7 @@ setup(
     install_requires=[
         "matplotlib",
         "networkx",
+        "numpy",
         "pandas",
         "requests",
         "typing",
@@ -44,7 +45,16 @@ setup(
         "dev": [
             "pylint",
             "mypy",
-        ]
+        ],
+        "async": [
+            "aiohttp",
+        ],
+        "arrow": [
+            "pyarrow",
+        ],
+        "stream": [
+            "ijson",
+        ],
     },
     classifiers=[
         'Development Status :: 3 - Alpha',